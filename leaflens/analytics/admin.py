@@ -0,0 +1,8 @@
+from django.contrib import admin
+from .models import DailyPredictionCount
+
+
+@admin.register(DailyPredictionCount)
+class DailyPredictionCountAdmin(admin.ModelAdmin):
+    list_display = ('day', 'user_id', 'disease_id', 'outcome', 'count')
+    list_filter = ('outcome',)
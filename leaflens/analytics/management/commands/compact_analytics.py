@@ -0,0 +1,38 @@
+"""
+Rebuild the disease-incidence rollups from the predictions table
+usage: python manage.py compact_analytics [--since 2026-01-01] [--until 2026-01-31]
+Needed once after deploying the analytics app (existing predictions) and
+after bulk imports or deletes that bypass the ORM signals. Day ranges are
+replaced in one transaction; empty counters are dropped.
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.rollups import rebuild
+
+
+def parse_day(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"{value!r} is not a YYYY-MM-DD date")
+
+
+class Command(BaseCommand):
+    help = "Recompute the analytics rollups of a day range (all days by default) from the predictions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=parse_day, default=None, help="First day to rebuild (YYYY-MM-DD)")
+        parser.add_argument('--until', type=parse_day, default=None, help="Last day to rebuild (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        since, until = options['since'], options['until']
+        if since and until and since > until:
+            raise CommandError("--since is after --until")
+
+        rows, predictions = rebuild(since, until)
+        period = f"{since or 'the beginning'} to {until or 'today'}"
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {rows} rollup row(s) from {predictions} prediction(s), {period}"
+        ))
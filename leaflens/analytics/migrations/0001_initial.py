@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPredictionCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('user_id', models.PositiveIntegerField(default=0)),
+                ('disease_id', models.PositiveBigIntegerField(default=0)),
+                ('outcome', models.CharField(choices=[('classified', 'Classified'), ('not_maize', 'Not maize'), ('unusable', 'Unusable')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user_id', 'day'], name='analytics_d_user_id_706fa7_idx'), models.Index(fields=['disease_id', 'day'], name='analytics_d_disease_656673_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'user_id', 'disease_id', 'outcome'), name='unique_daily_prediction_count')],
+            },
+        ),
+    ]
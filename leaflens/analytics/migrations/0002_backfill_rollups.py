@@ -0,0 +1,44 @@
+# Count the predictions stored before the rollups existed
+
+from collections import Counter
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def outcome(is_maize):
+    """Same outcomes as analytics.rollups.outcome_of, from the is_maize column."""
+    if is_maize is None:
+        return 'unusable'
+    return 'classified' if is_maize else 'not_maize'
+
+
+def backfill(apps, schema_editor):
+    Prediction = apps.get_model('predictions', 'Prediction')
+    DailyPredictionCount = apps.get_model('analytics', 'DailyPredictionCount')
+
+    # Local days computed here, not with TruncDate: no MySQL time zone tables needed
+    counts = Counter()
+    columns = Prediction.objects.order_by().values_list('created_at', 'user_id', 'predicted_disease_id', 'is_maize')
+    for created_at, user_id, disease_id, is_maize in columns.iterator(chunk_size=2000):
+        counts[(timezone.localdate(created_at), user_id or 0, disease_id or 0, outcome(is_maize))] += 1
+
+    DailyPredictionCount.objects.all().delete()
+    DailyPredictionCount.objects.bulk_create(
+        [DailyPredictionCount(day=day, user_id=user_id, disease_id=disease_id, outcome=result, count=count)
+         for (day, user_id, disease_id, result), count in counts.items()],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        # outcomes come from the is_maize column
+        ('predictions', '0007_backfill_score_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+from django.db import models
+
+
+class DailyPredictionCount(models.Model):
+    """
+    Rollup of predictions per (local) day, user, disease and outcome.
+    Kept up to date as predictions are created and deleted (rollups.py);
+    manage.py compact_analytics rebuilds it from the predictions table.
+
+    Plain integer keys instead of foreign keys: 0 stands for "none"
+    (anonymous upload, no disease) so the unique constraint holds for those
+    rows too. A deleted disease's counts move to disease 0 along with its
+    predictions (SET_NULL); a deleted user's predictions are uncounted (CASCADE).
+    """
+    CLASSIFIED = 'classified'
+    NOT_MAIZE = 'not_maize'
+    UNUSABLE = 'unusable'
+    OUTCOME_CHOICES = [
+        (CLASSIFIED, 'Classified'),   # ran through the classifier
+        (NOT_MAIZE, 'Not maize'),     # rejected by the prefilter
+        (UNUSABLE, 'Unusable'),       # rejected by the quality precheck
+    ]
+
+    day = models.DateField()
+    user_id = models.PositiveIntegerField(default=0)
+    disease_id = models.PositiveBigIntegerField(default=0)
+    outcome = models.CharField(max_length=20, choices=OUTCOME_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # one counter per key; day first: every dashboard query is a day range
+            models.UniqueConstraint(fields=['day', 'user_id', 'disease_id', 'outcome'],
+                                    name='unique_daily_prediction_count'),
+        ]
+        indexes = [
+            # one user's dashboard
+            models.Index(fields=['user_id', 'day']),
+            models.Index(fields=['disease_id', 'day']),
+        ]
+
+    def __str__(self):
+        return f"{self.day} user={self.user_id} disease={self.disease_id} {self.outcome}: {self.count}"
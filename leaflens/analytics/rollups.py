@@ -0,0 +1,136 @@
+"""
+Incremental disease-incidence rollups
+Every inserted prediction adds 1 to its (day, user, disease, outcome) counter
+in DailyPredictionCount, every deleted one subtracts 1, so dashboards sum a
+few rollup rows instead of scanning the predictions table.
+
+Counters are updated in the same transaction as the prediction. If an update
+fails (e.g. the table is not migrated yet) the prediction is still saved and
+the counter drifts: rebuild() (manage.py compact_analytics) recomputes it.
+Counters never go below zero.
+"""
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from diseases.models import Disease
+from predictions.models import Prediction
+
+from .models import DailyPredictionCount
+
+
+def outcome_of(is_maize):
+    """Rollup outcome from the prediction's prefilter decision column."""
+    if is_maize is None:
+        return DailyPredictionCount.UNUSABLE
+    return DailyPredictionCount.CLASSIFIED if is_maize else DailyPredictionCount.NOT_MAIZE
+
+
+def rollup_key(prediction):
+    return (
+        timezone.localdate(prediction.created_at),
+        prediction.user_id or 0,
+        prediction.predicted_disease_id or 0,
+        outcome_of(prediction.is_maize),
+    )
+
+
+def _add(key, delta):
+    day, user_id, disease_id, outcome = key
+    rows = DailyPredictionCount.objects.filter(day=day, user_id=user_id, disease_id=disease_id, outcome=outcome)
+    if delta < 0:
+        if rows.update(count=Greatest(F('count') + delta, 0)):
+            return
+        if disease_id and not Disease.objects.filter(pk=disease_id).exists():
+            # Loaded before its Disease was deleted: the counts were moved by forget_disease()
+            _add((day, user_id, 0, outcome), delta)
+        # Otherwise nothing was counted under this key (drift): nothing to take away
+        return
+    if rows.update(count=F('count') + delta):
+        return
+    try:
+        # First prediction for this key: another request may be inserting it right now
+        with transaction.atomic():
+            DailyPredictionCount.objects.create(day=day, user_id=user_id, disease_id=disease_id,
+                                                outcome=outcome, count=delta)
+    except IntegrityError:
+        rows.update(count=F('count') + delta)
+
+
+def apply(predictions, sign):
+    """Add (sign=1) or subtract (sign=-1) predictions: one UPDATE per distinct key."""
+    deltas = Counter()
+    for prediction in predictions:
+        deltas[rollup_key(prediction)] += sign
+
+    try:
+        with transaction.atomic():
+            for key, delta in deltas.items():
+                if delta:
+                    _add(key, delta)
+    except DatabaseError as e:
+        print("Analytics rollup error:", e)
+
+
+def forget_disease(disease_id):
+    """
+    A Disease was deleted and its predictions now have no disease (SET_NULL):
+    move its counts to the no-disease key, where deleting those predictions
+    will look for them.
+    """
+    try:
+        with transaction.atomic():
+            rows = DailyPredictionCount.objects.select_for_update().filter(disease_id=disease_id)
+            moved = Counter()
+            for row in rows:
+                moved[(row.day, row.user_id, 0, row.outcome)] += row.count
+            rows.delete()
+            for key, count in moved.items():
+                if count > 0:
+                    _add(key, count)
+    except DatabaseError as e:
+        print("Analytics rollup error:", e)
+
+
+def day_bounds(since, until):
+    """Aware datetimes [start of `since`, start of the day after `until`) in the current time zone."""
+    start = timezone.make_aware(datetime.combine(since, time.min)) if since else None
+    end = timezone.make_aware(datetime.combine(until + timedelta(days=1), time.min)) if until else None
+    return start, end
+
+
+def rebuild(since=None, until=None):
+    """
+    Recompute the rollups of days `since`..`until` (inclusive, open-ended when
+    None) from the predictions table. Returns (rows written, predictions counted).
+
+    Rows are streamed and grouped here rather than with TruncDate: a local-day
+    GROUP BY needs the MySQL time zone tables, this only needs Python's.
+    """
+    start, end = day_bounds(since, until)
+    predictions = Prediction.objects.all()
+    rollups = DailyPredictionCount.objects.all()
+    if start:
+        predictions = predictions.filter(created_at__gte=start)
+        rollups = rollups.filter(day__gte=since)
+    if end:
+        predictions = predictions.filter(created_at__lt=end)
+        rollups = rollups.filter(day__lte=until)
+
+    counts = Counter()
+    columns = predictions.order_by().values_list('created_at', 'user_id', 'predicted_disease_id', 'is_maize')
+    for created_at, user_id, disease_id, is_maize in columns.iterator(chunk_size=2000):
+        counts[(timezone.localdate(created_at), user_id or 0, disease_id or 0, outcome_of(is_maize))] += 1
+
+    rows = [
+        DailyPredictionCount(day=day, user_id=user_id, disease_id=disease_id, outcome=outcome, count=count)
+        for (day, user_id, disease_id, outcome), count in counts.items()
+    ]
+    with transaction.atomic():
+        rollups.delete()
+        DailyPredictionCount.objects.bulk_create(rows, batch_size=2000)
+    return len(rows), sum(counts.values())
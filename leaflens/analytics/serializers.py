@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import DailyPredictionCount
+
+# ?group_by= value -> rollup column
+GROUP_FIELDS = {
+    'day': 'day',
+    'disease': 'disease_id',
+    'user': 'user_id',
+    'outcome': 'outcome',
+}
+
+
+class AnalyticsQuerySerializer(serializers.Serializer):
+    """Query parameters of GET /api/analytics/"""
+    # Inclusive day range, in the server time zone; the last 30 days by default
+    since = serializers.DateField(required=False)
+    until = serializers.DateField(required=False)
+    # Comma separated, any of day, disease, user, outcome (nothing: a single total)
+    group_by = serializers.CharField(required=False, allow_blank=True, default='day')
+    disease = serializers.IntegerField(required=False, min_value=0)
+    user = serializers.IntegerField(required=False, min_value=0)
+    outcome = serializers.ChoiceField(choices=DailyPredictionCount.OUTCOME_CHOICES, required=False)
+
+    def validate_group_by(self, value):
+        groups = [group.strip() for group in value.split(',') if group.strip()]
+        unknown = [group for group in groups if group not in GROUP_FIELDS]
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown grouping {', '.join(unknown)}: use {', '.join(GROUP_FIELDS)}"
+            )
+        return list(dict.fromkeys(groups))
+
+    def validate(self, attrs):
+        attrs.setdefault('until', timezone.localdate())
+        attrs.setdefault('since', attrs['until'] - timedelta(days=29))
+        if attrs['since'] > attrs['until']:
+            raise serializers.ValidationError({"since": "Must not be after until."})
+        return attrs
@@ -0,0 +1,36 @@
+"""
+Keep the rollups in step with the predictions table:
+post_save for single inserts, predictions_bulk_created for batches,
+post_delete for deletions (including cascades from a deleted user).
+A deleted Disease leaves its predictions without one: its counts move too.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from diseases.models import Disease
+from predictions.models import Prediction
+from predictions.signals import predictions_bulk_created
+
+from . import rollups
+
+
+@receiver(post_save, sender=Prediction)
+def count_prediction(sender, instance, created, raw=False, **kwargs):
+    # Only inserts: the outcome columns are set at insert time and never change
+    if created and not raw:
+        rollups.apply([instance], 1)
+
+
+@receiver(predictions_bulk_created, sender=Prediction)
+def count_predictions(sender, predictions, **kwargs):
+    rollups.apply(predictions, 1)
+
+
+@receiver(post_delete, sender=Prediction)
+def uncount_prediction(sender, instance, **kwargs):
+    rollups.apply([instance], -1)
+
+
+@receiver(post_delete, sender=Disease)
+def move_disease_counts(sender, instance, **kwargs):
+    rollups.forget_disease(instance.pk)
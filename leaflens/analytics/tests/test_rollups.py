@@ -0,0 +1,145 @@
+# analytics/tests/test_rollups.py
+
+import importlib
+import io
+from datetime import date, timedelta
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from django.contrib.auth.models import User
+from rest_framework import status
+from analytics.models import DailyPredictionCount
+from diseases.models import Disease
+from predictions.models import Prediction
+from predictions.services import build_prediction, bulk_insert, create_prediction
+
+
+class AnalyticsRollupTest(APITestCase):
+    """
+    Tests the disease-incidence rollups and GET /api/analytics/:
+    - counters follow single inserts, bulk inserts and deletes
+    - compact_analytics rebuilds a day range from the predictions
+    - aggregations come from the rollups; non-staff users only see their own
+    """
+
+    def setUp(self):
+        # Throttle counters live in the cache; start every test with a clean slate
+        cache.clear()
+        self.farmer = User.objects.create_user(username="farmer", password="password123")
+        self.admin = User.objects.create_superuser(username="admin", password="password123")
+        self.rust = Disease.objects.create(name="Common Rust")
+        self.blight = Disease.objects.create(name="Blight")
+        self.today = timezone.localdate()
+
+    def predict(self, user, label, name):
+        scores = {label: 0.9} if label else None
+        return create_prediction(user, f"predictions/{name}.jpg", label, scores)
+
+    def counts(self):
+        return {
+            (row.user_id, row.disease_id, row.outcome): row.count
+            for row in DailyPredictionCount.objects.filter(day=self.today)
+        }
+
+    def test_counters_follow_inserts_and_deletes(self):
+        first = self.predict(self.farmer, "Common Rust", "a")
+        self.predict(self.farmer, "Common Rust", "b")
+        self.predict(None, None, "c")
+        create_prediction(self.farmer, "predictions/d.jpg", None, {"quality": {"reason": "blurry"}})
+        bulk_insert([build_prediction(self.farmer, f"predictions/batch{i}.jpg", "Blight", {"Blight": 0.8})
+                     for i in range(3)])
+
+        first.delete()
+
+        self.assertEqual(self.counts(), {
+            (self.farmer.id, self.rust.id, "classified"): 1,
+            (self.farmer.id, self.blight.id, "classified"): 3,
+            (0, 0, "not_maize"): 1,
+            (self.farmer.id, 0, "unusable"): 1,
+        })
+
+        # Cascaded deletes are counted too
+        self.farmer.delete()
+        self.assertEqual(sum(self.counts().values()), 1)
+
+    def test_deleting_a_disease_then_its_predictions(self):
+        first = self.predict(self.farmer, "Common Rust", "a")
+        second = self.predict(self.farmer, "Common Rust", "b")
+
+        # SET_NULL on the predictions: their counts follow them to the no-disease key
+        self.rust.delete()
+        self.assertEqual(self.counts(), {(self.farmer.id, 0, "classified"): 2})
+
+        first.delete()
+        second.delete()
+        self.assertEqual(self.counts(), {(self.farmer.id, 0, "classified"): 0})
+
+        # Drifted counters (nothing counted for this key) never go negative
+        Prediction.objects.create(user=self.farmer, image_path="predictions/c.jpg", prediction_scores={},
+                                  is_maize=False)
+        DailyPredictionCount.objects.all().delete()
+        Prediction.objects.get(image_path="predictions/c.jpg").delete()
+        self.assertFalse(DailyPredictionCount.objects.filter(count__lt=0).exists())
+        self.assertEqual(self.counts(), {})
+
+    def test_compaction_rebuilds_a_day_range(self):
+        for name in ["a", "b", "c"]:
+            self.predict(self.farmer, "Common Rust", name)
+        # Moved to last week behind the signals' back: the rollups are now wrong
+        last_week = timezone.now() - timedelta(days=7)
+        Prediction.objects.filter(image_path="predictions/a.jpg").update(created_at=last_week)
+        DailyPredictionCount.objects.create(day=self.today - timedelta(days=30), disease_id=self.rust.id,
+                                            outcome="classified", count=5)
+
+        output = io.StringIO()
+        since = (self.today - timedelta(days=7)).isoformat()
+        call_command("compact_analytics", "--since", since, stdout=output)
+
+        self.assertIn("Rebuilt 2 rollup row(s) from 3 prediction(s)", output.getvalue())
+        self.assertEqual(
+            list(DailyPredictionCount.objects.order_by("day").values_list("day", "count")),
+            [(self.today - timedelta(days=30), 5), (timezone.localdate(last_week), 1), (self.today, 2)],
+        )
+
+    def test_migration_backfills_existing_predictions(self):
+        self.predict(self.farmer, "Common Rust", "a")
+        self.predict(None, None, "b")
+        DailyPredictionCount.objects.all().delete()
+
+        migration = importlib.import_module("analytics.migrations.0002_backfill_rollups")
+        migration.backfill(django_apps, None)
+
+        self.assertEqual(self.counts(), {(self.farmer.id, self.rust.id, "classified"): 1, (0, 0, "not_maize"): 1})
+
+    def test_aggregations_from_rollups(self):
+        self.predict(self.farmer, "Common Rust", "a")
+        self.predict(self.farmer, "Blight", "b")
+        self.predict(self.admin, "Blight", "c")
+        self.predict(None, None, "d")
+
+        anonymous = self.client.get("/api/analytics/")
+        self.assertEqual(anonymous.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.force_authenticate(self.admin)
+        with self.assertNumQueries(2):  # rollup sums + disease names, no prediction scan
+            response = self.client.get("/api/analytics/", {"group_by": "disease"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["total"], 4)
+        self.assertEqual(response.data["results"][0], {"disease": {"id": self.blight.id, "name": "Blight"},
+                                                       "count": 2})
+
+        per_day = self.client.get("/api/analytics/", {"group_by": "day,outcome", "user": self.farmer.id})
+        self.assertEqual(per_day.data["results"], [{"day": self.today, "outcome": "classified", "count": 2}])
+
+        # Farmers only see their own predictions, whatever they ask for
+        self.client.force_authenticate(self.farmer)
+        own = self.client.get("/api/analytics/", {"group_by": "user", "user": self.admin.id})
+        self.assertEqual(own.data["results"], [{"user": {"id": self.farmer.id, "username": "farmer"}, "count": 2}])
+
+        bad = self.client.get("/api/analytics/", {"group_by": "field"})
+        self.assertEqual(bad.status_code, status.HTTP_400_BAD_REQUEST)
+        past = self.client.get("/api/analytics/", {"until": "2020-01-31"})
+        self.assertEqual(past.data["since"], date(2020, 1, 2))
+        self.assertEqual(past.data["total"], 0)
@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import AnalyticsView
+
+# Define URL patterns
+urlpatterns = [
+    # ex: GET /api/analytics/?since=2026-01-01&until=2026-01-31&group_by=day,disease
+    path('analytics/', AnalyticsView.as_view(), name='analytics'),
+]
@@ -0,0 +1,73 @@
+from django.contrib.auth.models import User
+from django.db.models import Sum
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+
+from diseases.models import Disease
+
+from .models import DailyPredictionCount
+from .serializers import AnalyticsQuerySerializer, GROUP_FIELDS
+
+
+class AnalyticsView(APIView):
+    """
+    Disease incidence over a day range, summed from the daily rollups
+    (never from the predictions table): per day, disease, user and/or outcome.
+    Staff see every user; anyone else only their own predictions.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        query = AnalyticsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        rollups = DailyPredictionCount.objects.filter(day__range=(params['since'], params['until']))
+        if not request.user.is_staff:
+            rollups = rollups.filter(user_id=request.user.id)
+        elif 'user' in params:
+            rollups = rollups.filter(user_id=params['user'])
+        if 'disease' in params:
+            rollups = rollups.filter(disease_id=params['disease'])
+        if 'outcome' in params:
+            rollups = rollups.filter(outcome=params['outcome'])
+
+        groups = params['group_by']
+        fields = [GROUP_FIELDS[group] for group in groups]
+        # Timelines in date order, rankings biggest first
+        ordering = fields if 'day' in groups else ['-count', *fields]
+        rows = list(rollups.values(*fields).annotate(count=Sum('count')).filter(count__gt=0).order_by(*ordering))
+
+        results = self.label(rows, groups)
+        return Response({
+            "since": params['since'],
+            "until": params['until'],
+            "group_by": groups,
+            "total": sum(row["count"] for row in results),
+            "results": results,
+        })
+
+    def label(self, rows, groups):
+        """Rollup rows -> response entries, with disease names and usernames (0 ids -> null)."""
+        names = {}
+        if 'disease' in groups:
+            ids = {row['disease_id'] for row in rows}
+            names['disease'] = dict(Disease.objects.filter(pk__in=ids).values_list('pk', 'name'))
+        if 'user' in groups:
+            ids = {row['user_id'] for row in rows}
+            names['user'] = dict(User.objects.filter(pk__in=ids).values_list('pk', 'username'))
+
+        results = []
+        for row in rows:
+            entry = {}
+            for group in groups:
+                value = row[GROUP_FIELDS[group]]
+                if group == 'disease':
+                    value = {"id": value, "name": names['disease'].get(value)} if value else None
+                elif group == 'user':
+                    value = {"id": value, "username": names['user'].get(value)} if value else None
+                entry[group] = value
+            entry["count"] = row["count"]
+            results.append(entry)
+        return results
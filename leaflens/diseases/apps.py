@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class DiseasesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'diseases'
+
+    def ready(self):
+        # label map invalidation on Disease changes
+        from . import signals  # noqa: F401
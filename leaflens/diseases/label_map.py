@@ -0,0 +1,123 @@
+"""
+Class label -> Disease map
+The classifier only ever predicts the four CLASSES: their Disease rows (and
+serialized payloads) are kept in memory so a prediction makes no disease query.
+
+The map is per process and built against the disease knowledge base version
+(versioning.py): every Disease save or delete bumps that row
+(diseases/signals.py, which also covers approved suggestions). The process
+that made the change rebuilds on its next lookup; the others read the version
+at most once per DISEASE_VERSION_CHECK_INTERVAL seconds, so lookups stay
+query-free and their edits show up within that delay.
+"""
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from ml.utils import CLASSES
+
+from .models import Disease
+from .versioning import current_version
+
+
+class DiseaseLabelMap:
+    """Disease row and API payload per class index, built on first use."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = None
+        self._by_id = {}
+        self._version = None
+        self._checked_at = 0.0
+        self._generation = 0
+
+    def _load(self):
+        """(class index -> entry, disease id -> payload) for the current disease version."""
+        interval = getattr(settings, 'DISEASE_VERSION_CHECK_INTERVAL', 1.0)
+        with self._lock:
+            if self._entries is not None and time.monotonic() - self._checked_at < interval:
+                return self._entries, self._by_id
+
+        checked_at = time.monotonic()
+        try:
+            version = current_version()[0]
+        except Exception as e:
+            # Database hiccup: keep serving the map we have rather than fail predictions
+            print("Disease version error:", e)
+            version = self._version
+
+        with self._lock:
+            if self._entries is not None and version == self._version:
+                self._checked_at = checked_at
+                return self._entries, self._by_id
+            generation = self._generation
+
+        from .serializers import DiseaseSerializer
+
+        # Four rows: build outside the lock, same first-by-id choice as name__iexact(...).first()
+        diseases = {}
+        for disease in Disease.objects.order_by('pk'):
+            diseases.setdefault(disease.name.lower(), disease)
+
+        entries = []
+        for label in CLASSES:
+            disease = diseases.get(label.lower())
+            payload = DiseaseSerializer(disease).data if disease is not None else None
+            entries.append({"id": disease.pk if disease else None, "disease": disease, "payload": payload})
+        by_id = {entry["id"]: entry["payload"] for entry in entries if entry["id"] is not None}
+
+        with self._lock:
+            # Invalidated while loading: serve this build once, don't keep it
+            if generation == self._generation:
+                self._entries, self._by_id = entries, by_id
+                self._version = version
+                self._checked_at = checked_at
+        return entries, by_id
+
+    def disease_for_label(self, label):
+        """A copy of the Disease for a class label (case-insensitive), None when it has no row."""
+        index = self.class_index(label)
+        if index is None:
+            # Not one of the classifier's classes: plain lookup
+            return Disease.objects.filter(name__iexact=label).first()
+        disease = self._load()[0][index]["disease"]
+        return copy.copy(disease) if disease is not None else None
+
+    def payload_for_id(self, disease_id):
+        """Serialized disease for one of the class diseases, None for any other id."""
+        return self.payloads().get(disease_id)
+
+    def payloads(self):
+        """Disease id -> serialized disease for the class diseases, all from one version."""
+        return self._load()[1]
+
+    @staticmethod
+    def class_index(label):
+        lowered = label.lower()
+        for index, name in enumerate(CLASSES):
+            if name.lower() == lowered:
+                return index
+        return None
+
+    def invalidate(self):
+        with self._lock:
+            self._entries = None
+            self._by_id = {}
+            self._version = None
+            self._generation += 1
+
+    def warm(self):
+        """Startup hook: build now, never fail the boot over it."""
+        try:
+            self._load()
+        except Exception as e:
+            print("Disease map warmup error:", e)
+        finally:
+            # Don't hand an open connection to forked workers
+            connections.close_all()
+
+
+disease_map = DiseaseLabelMap()
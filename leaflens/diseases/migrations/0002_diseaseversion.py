@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diseases', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiseaseVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
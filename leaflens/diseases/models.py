@@ -10,3 +10,8 @@ class Disease(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class DiseaseVersion(models.Model):
+    """Single row: the disease knowledge base version (see diseases/versioning.py)."""
+    version = models.BigIntegerField(default=0)
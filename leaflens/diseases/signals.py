@@ -0,0 +1,22 @@
+"""
+Keep derived disease data in step with the table: the class label -> Disease
+map (label_map.py) and the knowledge base version (versioning.py).
+Suggestion approvals save the Disease, so they are covered by post_save.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .label_map import disease_map
+from .models import Disease
+from .versioning import bump_version
+
+
+@receiver(post_save, sender=Disease)
+@receiver(post_delete, sender=Disease)
+def invalidate_disease_caches(sender, **kwargs):
+    # Same transaction as the change: other processes see the new version with the new row
+    bump_version()
+    # This process: now, and again at commit (a rebuild in between could read the old row)
+    disease_map.invalidate()
+    transaction.on_commit(disease_map.invalidate)
@@ -1,3 +1,155 @@
-from django.test import TestCase
+# diseases/tests.py
 
-# Create your tests here.
+import time
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from diseases.label_map import disease_map
+from diseases.models import Disease
+from diseases.versioning import bump_version
+from predictions.services import create_prediction
+from suggestions.models import Suggestion
+
+
+class DiseaseLabelMapTest(APITestCase):
+    """In-memory class label -> Disease map used by the prediction hot path"""
+
+    def setUp(self):
+        self.rust = Disease.objects.create(name="Common Rust", metadata={"prevention": []})
+
+    @override_settings(DISEASE_VERSION_CHECK_INTERVAL=60)
+    def test_prediction_makes_no_disease_query(self):
+        disease_map.disease_for_label("Common Rust")  # build the map
+
+        # The INSERT (and its analytics rollup), nothing read from the disease table
+        with CaptureQueriesContext(connection) as queries:
+            prediction = create_prediction(None, "predictions/leaf.jpg", "common rust", {"Common Rust": 1.0})
+        self.assertFalse([q["sql"] for q in queries if "diseases_disease" in q["sql"]])
+
+        self.assertEqual(prediction.predicted_disease_id, self.rust.id)
+        self.assertIsNone(disease_map.disease_for_label("Blight"))
+
+    def test_saving_or_deleting_a_disease_invalidates_the_map(self):
+        self.assertEqual(disease_map.payload_for_id(self.rust.id)["scientific_name"], None)
+
+        self.rust.scientific_name = "Puccinia sorghi"
+        self.rust.save()
+        self.assertEqual(disease_map.payload_for_id(self.rust.id)["scientific_name"], "Puccinia sorghi")
+
+        blight = Disease.objects.create(name="Blight")
+        self.assertEqual(disease_map.disease_for_label("Blight").id, blight.id)
+        blight.delete()
+        self.assertIsNone(disease_map.disease_for_label("Blight"))
+
+    @override_settings(DISEASE_VERSION_CHECK_INTERVAL=60)
+    def test_edit_in_another_process_is_picked_up(self):
+        self.assertEqual(disease_map.payload_for_id(self.rust.id)["scientific_name"], None)
+
+        # Another worker saved the row: no signal here, only the version row moves
+        Disease.objects.filter(pk=self.rust.id).update(scientific_name="Puccinia sorghi")
+        bump_version()
+        with self.assertNumQueries(0):
+            self.assertEqual(disease_map.payload_for_id(self.rust.id)["scientific_name"], None)
+
+        # Next version check
+        with patch("diseases.label_map.time.monotonic", return_value=time.monotonic() + 60):
+            self.assertEqual(disease_map.payload_for_id(self.rust.id)["scientific_name"], "Puccinia sorghi")
+
+    def test_approved_suggestion_refreshes_the_payload(self):
+        admin = User.objects.create_superuser(username="admin", password="password123")
+        farmer = User.objects.create_user(username="farmer", password="password123")
+        suggestion = Suggestion.objects.create(disease=self.rust, user=farmer, type="prevention",
+                                               suggestion="Crop rotation")
+        self.assertEqual(disease_map.payload_for_id(self.rust.id)["metadata"]["prevention"], [])
+
+        self.client.force_authenticate(admin)
+        self.client.patch(f"/api/suggestions/{suggestion.id}/approve/")
+
+        self.assertEqual(disease_map.payload_for_id(self.rust.id)["metadata"]["prevention"], ["Crop rotation"])
+
+
+class DiseaseConditionalGetTest(APITestCase):
+    """ETag / Last-Modified from the disease version, 304s and cached payloads"""
+
+    def setUp(self):
+        # Throttle counters and payloads live in the cache: start clean
+        cache.clear()
+        self.blight = Disease.objects.create(name="Blight")
+        Disease.objects.create(name="Healthy")
+
+    def test_unchanged_list_is_not_modified(self):
+        first = self.client.get("/api/diseases/")
+        self.assertEqual(first.status_code, 200)
+        self.assertIn("Last-Modified", first)
+        self.assertIn("no-cache", first["Cache-Control"])
+
+        revalidated = self.client.get("/api/diseases/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.content, b"")
+
+        since = self.client.get("/api/diseases/", HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(since.status_code, 304)
+
+    def test_version_is_shared_beyond_the_cache(self):
+        first = self.client.get("/api/diseases/")
+
+        # Another process, or a flushed cache: same version, still a 304
+        cache.clear()
+        revalidated = self.client.get("/api/diseases/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_change_within_the_same_second_is_not_a_304(self):
+        first = self.client.get("/api/diseases/")
+
+        with patch("diseases.versioning.time.time", return_value=time.time()):
+            Disease.objects.create(name="Gray Leaf Spot")
+            revalidated = self.client.get("/api/diseases/", HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+
+        self.assertEqual(revalidated.status_code, 200)
+        self.assertEqual(len(revalidated.data), 3)
+        self.assertNotEqual(revalidated["Last-Modified"], first["Last-Modified"])
+
+    def test_payloads_are_cached_per_query(self):
+        self.client.get("/api/diseases/?search=blight")
+        self.client.get(f"/api/diseases/{self.blight.id}/")
+
+        with self.assertNumQueries(2):  # the version row, per request
+            search = self.client.get("/api/diseases/?search=blight")
+            detail = self.client.get(f"/api/diseases/{self.blight.id}/")
+
+        self.assertEqual([d["name"] for d in search.data], ["Blight"])
+        self.assertEqual(detail.data["name"], "Blight")
+        self.assertNotEqual(search["ETag"], detail["ETag"])
+
+    def test_errors_are_never_a_304(self):
+        missing = self.client.get("/api/diseases/999999/", HTTP_IF_NONE_MATCH="*")
+        self.assertEqual(missing.status_code, 404)
+
+        since = self.client.get("/api/diseases/999999/", HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT")
+        self.assertEqual(since.status_code, 404)
+
+    def test_cache_key_ignores_unused_parameters(self):
+        first = self.client.get("/api/diseases/?search=blight&ordering=name")
+
+        with self.assertNumQueries(1):  # the version row only
+            busted = self.client.get("/api/diseases/?ordering=name&utm_source=sms&search=%20blight%20")
+        self.assertEqual(busted["ETag"], first["ETag"])
+
+        # Unknown ordering fields fall back to the default ordering
+        default = self.client.get("/api/diseases/?search=blight")
+        self.assertEqual(self.client.get("/api/diseases/?search=blight&ordering=secret")["ETag"], default["ETag"])
+
+    def test_disease_change_invalidates(self):
+        first = self.client.get(f"/api/diseases/{self.blight.id}/")
+
+        self.blight.scientific_name = "Exserohilum turcicum"
+        self.blight.save()
+
+        changed = self.client.get(f"/api/diseases/{self.blight.id}/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.data["scientific_name"], "Exserohilum turcicum")
+        self.assertNotEqual(changed["ETag"], first["ETag"])
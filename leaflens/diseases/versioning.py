@@ -0,0 +1,52 @@
+"""
+Disease knowledge base version
+A single DiseaseVersion row, bumped on every Disease change (signals.py) in
+the same transaction as the change. It keys the cached /api/diseases/
+payloads, drives their ETag / Last-Modified headers (clients revalidate with
+a 304 instead of a download) and tells the label map when to rebuild.
+
+The version is a millisecond timestamp that every change moves forward by at
+least a second. Last-Modified is derived from it, so two versions never share
+a Last-Modified value: If-Modified-Since is as exact as the ETag, even for
+changes made within the same second.
+
+It lives in the database, not the cache: every server process reads the same
+version whatever the cache backend, and it moves exactly when the change commits.
+"""
+import time
+
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .models import DiseaseVersion
+
+# Smallest step per change (ms): one HTTP date second
+VERSION_STEP = 1000
+
+VERSION_ROW = 1
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def current_version():
+    """(version, last modified as a Unix timestamp) of the disease table."""
+    version = DiseaseVersion.objects.filter(pk=VERSION_ROW).values_list('version', flat=True).first()
+    if version is None:
+        # Unknown history: treat it as changed now
+        row, _ = DiseaseVersion.objects.get_or_create(pk=VERSION_ROW, defaults={'version': _now_ms()})
+        version = row.version
+    return version, version // VERSION_STEP
+
+
+def bump_version():
+    """A disease was created, edited or deleted: invalidate every cached payload."""
+    now = _now_ms()
+    # Atomic: concurrent changes each add at least a step
+    bumped = Greatest(F('version') + VERSION_STEP, now)
+    if DiseaseVersion.objects.filter(pk=VERSION_ROW).update(version=bumped):
+        return
+    _, created = DiseaseVersion.objects.get_or_create(pk=VERSION_ROW, defaults={'version': now})
+    if not created:
+        DiseaseVersion.objects.filter(pk=VERSION_ROW).update(version=bumped)
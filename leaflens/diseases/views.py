@@ -1,4 +1,11 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
 from django.shortcuts import render
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
 
 # viewset
 from rest_framework.viewsets import ReadOnlyModelViewSet
@@ -7,16 +14,112 @@ from .serializers import DiseaseSerializer
 
 # filters
 from django_filters.rest_framework import DjangoFilterBackend
+from django_filters.utils import translate_validation
 from rest_framework.filters import SearchFilter, OrderingFilter
-from rest_framework import renderers
+from rest_framework import renderers, status
+from rest_framework.response import Response
 from .filters import DiseaseFilter
+from .versioning import current_version
 
 # Create your views here.
 
+# Conditional GET + versioned payload cache for read-only endpoints
+class VersionedCacheMixin:
+    """
+    Serves list/retrieve from the cache, keyed by the disease version
+    (versioning.py), what the payload depends on (lookup, filters, search,
+    ordering, page) and the response format. ETag / Last-Modified come from
+    the same version: a client that already has it gets a 304 with no body.
+    """
+
+    # Query parameters read by the pagination class, when the view has one
+    page_params = ('page_query_param', 'page_size_query_param', 'limit_query_param',
+                   'offset_query_param', 'cursor_query_param')
+
+    def list(self, request, *args, **kwargs):
+        return self.versioned_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.versioned_response(request, super().retrieve, *args, **kwargs)
+
+    def versioned_response(self, request, handler, *args, **kwargs):
+        version, modified = current_version()
+        key = self.variant_key(request)
+        etag = quote_etag(f"{version}-{key}")
+
+        # A cached payload means this request resolved at this version (no 404, no 400):
+        # otherwise run it first, so an error is never turned into a 304
+        cache_key = f"diseases:response:{version}:{key}"
+        data = cache.get(cache_key)
+        if data is not None:
+            response = Response(data)
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cache.set(cache_key, response.data, getattr(settings, 'DISEASE_RESPONSE_CACHE_TTL', 3600))
+
+        if self.not_modified(request, etag, modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(modified)
+        # Clients may keep the payload but must revalidate it (cheap: 304)
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    def variant_key(self, request):
+        """
+        Hash of what the payload depends on, normalized: the lookup, the
+        validated filter values, the search terms, the effective ordering, the
+        page parameters and the format. Other query parameters (cache busters,
+        unknown fields) share the entry. Invalid filters raise the handler's 400.
+        """
+        queryset = self.get_queryset()
+        variant = {
+            'lookup': self.kwargs.get(self.lookup_url_kwarg or self.lookup_field),
+            'format': request.accepted_renderer.format,
+        }
+        for backend_class in self.filter_backends:
+            backend = backend_class()
+            if isinstance(backend, DjangoFilterBackend):
+                filterset = backend.get_filterset(request, queryset, self)
+                if filterset is not None:
+                    if not filterset.is_valid():
+                        raise translate_validation(filterset.errors)
+                    variant['filters'] = {name: value for name, value in filterset.form.cleaned_data.items()
+                                          if value not in (None, '')}
+            elif isinstance(backend, SearchFilter):
+                variant['search'] = backend.get_search_terms(request)
+            elif isinstance(backend, OrderingFilter):
+                variant['ordering'] = backend.get_ordering(request, queryset, self)
+
+        if self.paginator is not None:
+            names = [getattr(self.paginator, attr, None) for attr in self.page_params]
+            variant['page'] = {name: request.query_params[name] for name in names
+                               if name and name in request.query_params}
+
+        encoded = json.dumps(variant, sort_keys=True, default=str)
+        return hashlib.sha256(encoded.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def not_modified(request, etag, modified):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            # If-None-Match wins over If-Modified-Since when both are sent
+            etags = [e.removeprefix('W/') for e in parse_etags(if_none_match)]
+            return '*' in etags or etag in etags
+
+        # Exact despite whole-second dates: every version has its own Last-Modified (versioning.py)
+        since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        return since is not None and modified <= since
+
+
 # viewSet Diseases(wrap multiple CBV methods into one class)
 # LIST ALL DISEASES x RETRIEVE ONE DISEASE
-class DiseaseViewSet(ReadOnlyModelViewSet):
-    """Performing read-only operations on Diseases"""
+class DiseaseViewSet(VersionedCacheMixin, ReadOnlyModelViewSet):
+    """Performing read-only operations on Diseases (conditional GET, cached payloads)"""
     queryset = Disease.objects.all()
     serializer_class = DiseaseSerializer
 
@@ -47,6 +47,7 @@ INSTALLED_APPS = [
     'suggestions',
     'ml',
     'accounts',
+    'analytics',
     'rest_framework_simplejwt.token_blacklist',
     'drf_spectacular'
 
@@ -83,6 +84,7 @@ REST_FRAMEWORK = {
         "user": "60/min",
         "predict_anon": "3/min",
         "predict_user": "20/min",
+        "predict_batch": "5/min",
 },
 
     # OpenAPI / Swagger documentation
@@ -185,6 +187,122 @@ if 'test' in sys.argv:
     }
 
 
+# Cache: throttle counters and the cached disease payloads.
+# Set CACHE_REDIS_URL (e.g. redis://127.0.0.1:6379/1, needs the `redis` package) so all
+# server processes share them; without it each process has its own in-memory cache.
+CACHE_REDIS_URL = config('CACHE_REDIS_URL', default='')
+if CACHE_REDIS_URL and not TESTING:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        }
+    }
+
+
+# ML inference
+# Models load lazily on first use. Server processes (wsgi/asgi) preload and warm them up
+# at boot; migrate/shell/admin-only commands never import torch or TensorFlow.
+# /api/health/ready answers 503 until warmup has finished.
+ML_PRELOAD_MODELS = config('ML_PRELOAD_MODELS', default=True, cast=bool)
+ML_WARMUP_IN_BACKGROUND = config('ML_WARMUP_IN_BACKGROUND', default=True, cast=bool)
+# With `gunicorn --preload`: load CLIP and the TFLite model bytes once in the master and
+# share them copy-on-write with the workers (interpreters are still built per worker).
+ML_PRELOAD_BEFORE_FORK = config('ML_PRELOAD_BEFORE_FORK', default=False, cast=bool)
+
+# Micro-batching: group concurrent predictions into one model call.
+# Trades up to ML_BATCH_MAX_WAIT_MS of latency for throughput per core,
+# only useful with threaded workers (several requests in one process).
+ML_BATCHING_ENABLED = config('ML_BATCHING_ENABLED', default=False, cast=bool)
+ML_BATCH_MAX_SIZE = config('ML_BATCH_MAX_SIZE', default=8, cast=int)
+ML_BATCH_MAX_WAIT_MS = config('ML_BATCH_MAX_WAIT_MS', default=5.0, cast=float)
+
+# TFLite interpreter pool: one preallocated interpreter per concurrent inference.
+# POOL_SIZE x NUM_THREADS ~ cores available to this process.
+ML_TFLITE_POOL_SIZE = config('ML_TFLITE_POOL_SIZE', default=os.cpu_count() or 1, cast=int)
+ML_TFLITE_NUM_THREADS = config('ML_TFLITE_NUM_THREADS', default=1, cast=int)
+# Classifier variant: float32 (reference), float16 or int8 (ml/models/<name>_<variant>.tflite).
+# Pick one per host with `manage.py benchmark_classifier`.
+ML_TFLITE_VARIANT = config('ML_TFLITE_VARIANT', default='float32')
+
+# CLIP prompt embeddings are computed once at load and cached here ('' disables the disk cache).
+# The text transformer is then dropped: the prefilter only needs the image encoder.
+ML_CLIP_EMBEDDING_CACHE_DIR = config('ML_CLIP_EMBEDDING_CACHE_DIR', default=str(BASE_DIR / 'ml' / 'cache'))
+ML_CLIP_UNLOAD_TEXT_TOWER = config('ML_CLIP_UNLOAD_TEXT_TOWER', default=True, cast=bool)
+# CLIP image encoder precision on CPU: fp32, int8 (dynamic quantization) or bf16.
+# Only switch after `manage.py benchmark_clip` shows enough agreement with fp32.
+ML_CLIP_PRECISION = config('ML_CLIP_PRECISION', default='fp32')
+
+# Cascade prefilter: a gate fitted with `manage.py fit_maize_gate` decides confident
+# cases from the classifier output, CLIP only runs for the uncertain ones ('' = CLIP always).
+# AUDIT_RATE: share of confident decisions re-checked with CLIP to measure disagreement.
+ML_GATE_PATH = config('ML_GATE_PATH', default='')
+ML_GATE_AUDIT_RATE = config('ML_GATE_AUDIT_RATE', default=0.02, cast=float)
+
+# Inference server: when set, web workers forward both model stages to
+# `manage.py run_inference_server` on this Unix socket (pixels go through shared
+# memory) instead of loading their own copy of CLIP and TFLite. '' = in-process.
+ML_INFERENCE_SOCKET = config('ML_INFERENCE_SOCKET', default='')
+ML_INFERENCE_TIMEOUT = config('ML_INFERENCE_TIMEOUT', default=30.0, cast=float)
+
+# Async predictions: clients opt in per request with POST /api/predict/?async=true
+# and get 202 + job id; `manage.py run_prediction_worker` runs the models.
+PREDICTION_ASYNC_ENABLED = config('PREDICTION_ASYNC_ENABLED', default=False, cast=bool)
+# Claims per job: a job left 'running' by a dead worker this many times is failed instead
+# of requeued, so a photo that kills its worker does not take every worker down in turn
+PREDICTION_JOB_MAX_ATTEMPTS = config('PREDICTION_JOB_MAX_ATTEMPTS', default=3, cast=int)
+
+# Result cache: a re-submitted photo (same SHA-256, same model version) reuses the
+# earlier result and stored file. TTL in seconds, 0 = results never expire.
+PREDICTION_CACHE_ENABLED = config('PREDICTION_CACHE_ENABLED', default=True, cast=bool)
+PREDICTION_CACHE_TTL = config('PREDICTION_CACHE_TTL', default=30 * 24 * 3600, cast=int)
+# Near-duplicates (WhatsApp recompression, resizing): reuse scores when the perceptual
+# hash differs by at most this many bits: 0-3 (the 4 hash bands find nothing further
+# apart, larger values are clamped to 3); -1 disables.
+PREDICTION_PHASH_MAX_DISTANCE = config('PREDICTION_PHASH_MAX_DISTANCE', default=3, cast=int)
+# Most recent band matches compared per lookup; an older match past this is missed
+PREDICTION_PHASH_MAX_CANDIDATES = config('PREDICTION_PHASH_MAX_CANDIDATES', default=1000, cast=int)
+
+# Quality precheck before any model: tiny, dark, overexposed or blurry photos are
+# stored with {"quality": {"reason", "message", "metrics"}} instead of being classified.
+# Off in tests: the fixtures are 10x10 solid-colour images.
+PREDICTION_QUALITY_CHECK = config('PREDICTION_QUALITY_CHECK', default=not TESTING, cast=bool)
+PREDICTION_QUALITY_MIN_SIDE = config('PREDICTION_QUALITY_MIN_SIDE', default=128, cast=int)
+PREDICTION_QUALITY_MIN_SHARPNESS = config('PREDICTION_QUALITY_MIN_SHARPNESS', default=12.0, cast=float)
+
+# Upload guards, checked before decoding: file size, then pixel count from the image
+# header (rejects decompression bombs without allocating the pixels). 0 disables either.
+PREDICTION_MAX_UPLOAD_BYTES = config('PREDICTION_MAX_UPLOAD_BYTES', default=15 * 1024 * 1024, cast=int)
+PREDICTION_MAX_MEGAPIXELS = config('PREDICTION_MAX_MEGAPIXELS', default=40, cast=int)
+
+# Decode JPEGs at reduced scale (libjpeg DCT scaling) keeping the shorter side >= this
+# many pixels, e.g. 448. Much cheaper for phone photos; 0 decodes at full resolution,
+# which is what the classifier was trained and validated on.
+ML_DRAFT_DECODE_MIN_SIDE = config('ML_DRAFT_DECODE_MIN_SIDE', default=0, cast=int)
+
+# /api/diseases/ payload cache, keyed by the disease version: entries are never stale,
+# this only bounds how long superseded ones linger.
+DISEASE_RESPONSE_CACHE_TTL = config('DISEASE_RESPONSE_CACHE_TTL', default=3600, cast=int)
+# Seconds between two reads of the disease version by the in-memory class label map
+# (one small query): disease edits made in other processes reach predictions within this.
+DISEASE_VERSION_CHECK_INTERVAL = config('DISEASE_VERSION_CHECK_INTERVAL', default=1.0, cast=float)
+
+# GET /api/predictions/: history page size (?page_size= up to 100)
+PREDICTION_HISTORY_PAGE_SIZE = config('PREDICTION_HISTORY_PAGE_SIZE', default=20, cast=int)
+
+# POST /api/predict/batch/: most photos accepted per request (files or zip members)
+PREDICTION_BATCH_MAX_IMAGES = config('PREDICTION_BATCH_MAX_IMAGES', default=50, cast=int)
+
+# Speculative classification: run the TFLite classifier in parallel with the CLIP
+# prefilter and discard its result on rejection. Lower latency, extra classifier
+# work for non-maize uploads. Ignored when the cascade gate is on (it needs the classifier first).
+PREDICTION_SPECULATIVE_CLASSIFY = config('PREDICTION_SPECULATIVE_CLASSIFY', default=False, cast=bool)
+
+# Write prediction uploads to media in a background thread (off the request path).
+# Tests write synchronously so files exist before assertions run.
+PREDICTION_MEDIA_ASYNC_WRITE = config('PREDICTION_MEDIA_ASYNC_WRITE', default=not TESTING, cast=bool)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -41,6 +41,8 @@ urlpatterns = [
     path('api/', include('diseases.urls')),
     path('api/', include('predictions.urls')),
     path('api/', include('suggestions.urls')),
+    path('api/', include('ml.urls')),
+    path('api/', include('analytics.urls')),
 
     # api docs routes
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
@@ -14,3 +14,14 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'leaflens.settings')
 
 application = get_wsgi_application()
+
+# Load and warm up the ML models while the server boots rather than on the first request.
+# Only server processes import this module, so manage.py commands stay fast.
+from ml.warmup import warmup_on_startup  # noqa: E402
+
+warmup_on_startup()
+
+# Class label -> Disease rows for the prediction hot path (diseases/label_map.py)
+from diseases.label_map import disease_map  # noqa: E402
+
+disease_map.warm()
@@ -0,0 +1,142 @@
+"""
+Dynamic micro-batching
+Collects concurrent inference calls into one stacked model call
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Groups items submitted from many threads into batches for `batch_fn`.
+
+    A batch is flushed as soon as it holds `max_batch_size` items or the
+    oldest item has waited `max_wait_ms`, whichever comes first.
+    `batch_fn` receives a list of items and must return a list of results
+    in the same order; each caller gets back only its own result.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=8, max_wait_ms=5.0, name="batcher"):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._init_runtime()
+
+    def _init_runtime(self):
+        """Queue, worker thread and stats: the per-process state."""
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+
+        # Stats (guarded by _stats_lock)
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._largest_batch = 0
+        self._batch_sizes = {}
+        self._queue_time_total = 0.0
+        self._queue_time_max = 0.0
+
+    # ---------------------------
+    # Public API
+    # ---------------------------
+    def submit(self, item):
+        """Queue one item and return a Future resolving to its result."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def infer(self, item, timeout=None):
+        """Submit one item and block until its result is ready."""
+        return self.submit(item).result(timeout=timeout)
+
+    def after_fork(self):
+        """
+        Child side of a fork: the worker thread did not survive it and the
+        parent's queue and locks may be in any state, so start over.
+        """
+        self._init_runtime()
+
+    def stats(self):
+        """Return batch-size and queue-time statistics."""
+        with self._stats_lock:
+            return {
+                "name": self.name,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": self._items / self._batches if self._batches else 0.0,
+                "largest_batch": self._largest_batch,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "avg_queue_ms": (self._queue_time_total / self._items) * 1000.0 if self._items else 0.0,
+                "max_queue_ms": self._queue_time_max * 1000.0,
+                "pending": self._queue.qsize(),
+            }
+
+    # ---------------------------
+    # Worker
+    # ---------------------------
+    def _ensure_worker(self):
+        # Started lazily so importing the module never spawns threads
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name=f"{self.name}-worker", daemon=True
+                )
+                self._worker.start()
+
+    def _collect(self):
+        """Block for the first item, then gather more until full or timed out."""
+        batch = [self._queue.get()]
+        deadline = batch[0][2] + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            self._record(len(batch), [started - enqueued for _, _, enqueued in batch])
+
+            items = [item for item, _, _ in batch]
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"{self.name}: batch_fn returned {len(results)} results for {len(items)} items"
+                    )
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+    def _record(self, size, queue_times):
+        with self._stats_lock:
+            self._batches += 1
+            self._items += size
+            self._largest_batch = max(self._largest_batch, size)
+            self._batch_sizes[size] = self._batch_sizes.get(size, 0) + 1
+            self._queue_time_total += sum(queue_times)
+            self._queue_time_max = max(self._queue_time_max, max(queue_times))
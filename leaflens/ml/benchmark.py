@@ -0,0 +1,51 @@
+"""
+Benchmark helpers
+Shared by the model benchmark commands: labelled image discovery,
+latency summaries and decision agreement between two model variants.
+"""
+import math
+import os
+
+from .preprocessing import IMAGE_EXTENSIONS
+
+
+def labelled_images(directory):
+    """
+    (path, label) for every image under `directory`, sorted by path.
+    The label is the image's first-level subdirectory name
+    (e.g. maize/, not_maize/), None for images at the top level.
+    """
+    images = []
+    for root, _, files in os.walk(directory):
+        relative = os.path.relpath(root, directory)
+        label = None if relative == "." else relative.split(os.sep)[0]
+        for name in files:
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                images.append((os.path.join(root, name), label))
+    return sorted(images)
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def latency_summary(seconds):
+    """Mean / p50 / p95 / max in milliseconds."""
+    ms = sorted(s * 1000.0 for s in seconds)
+    return {
+        "mean_ms": sum(ms) / len(ms) if ms else 0.0,
+        "p50_ms": percentile(ms, 50),
+        "p95_ms": percentile(ms, 95),
+        "max_ms": ms[-1] if ms else 0.0,
+    }
+
+
+def agreement(reference, candidate):
+    """Fraction of positions where both lists hold the same decision."""
+    if not reference:
+        return 1.0
+    return sum(a == b for a, b in zip(reference, candidate)) / len(reference)
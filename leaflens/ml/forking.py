@@ -0,0 +1,60 @@
+"""
+Pre-fork preloading
+With ML_PRELOAD_BEFORE_FORK (and `gunicorn --preload`), the master process
+loads CLIP and reads the TFLite model once; forked workers inherit both
+copy-on-write, so adding a worker does not add another copy of the weights.
+
+Anything owning threads or sockets (TFLite interpreters, batcher threads,
+inference server connections) is created again in each child after the fork.
+"""
+import gc
+import os
+
+_hook_registered = False
+
+
+def share_clip_weights(prefilter):
+    """Move CLIP weights into shared memory: pages stay shared even if touched."""
+    prefilter.model.share_memory()
+    prefilter.prompt_features.share_memory_()
+
+
+def preload_for_fork():
+    """Master side: load what can be shared, leave the rest to the workers."""
+    global _hook_registered
+    import torch
+
+    from .loaders import classifier_model_content
+    from .registry import registry
+
+    # A CUDA context does not survive fork(): GPU workers load their own copy
+    if torch.cuda.is_available():
+        print("Fork preload: CUDA available, CLIP is loaded per worker")
+    else:
+        share_clip_weights(registry.get("clip"))
+
+    # Interpreters are built per worker, all from this one buffer
+    classifier_model_content()
+
+    if not _hook_registered:
+        os.register_at_fork(after_in_child=after_fork_in_child)
+        _hook_registered = True
+
+    # Everything allocated so far is exempt from collection: the GC no longer
+    # writes to these objects' headers, so their pages stay shared after fork
+    gc.collect()
+    gc.freeze()
+
+
+def after_fork_in_child():
+    """Child side: reset per-process state, then warm up this worker's interpreters."""
+    from . import inference_server, utils, warmup
+    from .gate import cascade_stats
+    from .registry import registry
+
+    registry.after_fork()
+    cascade_stats.reset()
+    utils.clip_batcher.after_fork()
+    utils.tflite_batcher.after_fork()
+    inference_server.after_fork()
+    warmup.after_fork()
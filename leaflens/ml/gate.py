@@ -0,0 +1,219 @@
+"""
+Cascade prefilter (maize gate)
+A small logistic head over the classifier's output decides the confident
+maize / not-maize cases, so CLIP only runs for uncertain images.
+
+The head is distilled from past CLIP decisions (`manage.py fit_maize_gate`):
+its two thresholds are chosen on held-out data so that confident decisions
+agree with CLIP at least `target_agreement` of the time. A sample of
+confident decisions is still checked against CLIP at runtime
+(ML_GATE_AUDIT_RATE) to measure disagreement in production.
+"""
+import hashlib
+import json
+import threading
+
+import numpy as np
+
+FEATURES = "classifier-probabilities-v1"
+EPSILON = 1e-6
+
+
+def gate_features(probabilities):
+    """
+    Features of one classifier probability vector:
+    log-probabilities, top probability and entropy. Out-of-domain photos
+    tend to give flatter, less confident distributions.
+    """
+    p = np.clip(np.asarray(probabilities, dtype=np.float64), EPSILON, 1.0)
+    return np.concatenate([np.log(p), [p.max(), -(p * np.log(p)).sum()]])
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+class MaizeGate:
+    """
+    Logistic head with a confidence band: scores >= accept_above are maize,
+    scores <= reject_below are not, anything in between is left to CLIP.
+    """
+
+    def __init__(self, weights, bias, mean, std, accept_above, reject_below, meta=None):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.std = np.asarray(std, dtype=np.float64)
+        self.accept_above = float(accept_above)
+        self.reject_below = float(reject_below)
+        self.meta = meta or {}
+
+    def score(self, probabilities):
+        """Probability that CLIP would accept the image."""
+        features = (gate_features(probabilities) - self.mean) / self.std
+        return float(_sigmoid(features @ self.weights + self.bias))
+
+    def decide(self, probabilities):
+        """True / False for confident cases, None when CLIP has to decide."""
+        score = self.score(probabilities)
+        if score >= self.accept_above:
+            return True
+        if score <= self.reject_below:
+            return False
+        return None
+
+    @property
+    def identity(self):
+        """Short hash of the parameters: part of model_version() when the gate is on."""
+        payload = json.dumps(self.to_dict(include_meta=False), sort_keys=True).encode()
+        return hashlib.sha256(payload).hexdigest()[:8]
+
+    def to_dict(self, include_meta=True):
+        data = {
+            "features": FEATURES,
+            "weights": self.weights.tolist(),
+            "bias": self.bias,
+            "mean": self.mean.tolist(),
+            "std": self.std.tolist(),
+            "accept_above": self.accept_above,
+            "reject_below": self.reject_below,
+        }
+        if include_meta:
+            data["meta"] = self.meta
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("features") != FEATURES:
+            raise ValueError(f"Gate was fitted on {data.get('features')!r} features, expected {FEATURES!r}")
+        return cls(data["weights"], data["bias"], data["mean"], data["std"],
+                   data["accept_above"], data["reject_below"], data.get("meta"))
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+# ---------------------------
+# Fitting
+# ---------------------------
+def fit_gate(probabilities, labels, target_agreement=0.995, holdout=0.2, epochs=500,
+             learning_rate=0.5, l2=1e-3, seed=0):
+    """
+    Fit the head on classifier outputs labelled with CLIP's decisions,
+    then pick the confidence band on a held-out split.
+    Returns (gate, report) where report has the held-out hit rate and agreement.
+    """
+    features = np.array([gate_features(p) for p in probabilities])
+    labels = np.asarray(labels, dtype=np.float64)
+    if len(set(labels.tolist())) < 2:
+        raise ValueError("Need both CLIP-accepted and CLIP-rejected examples")
+
+    order = np.random.default_rng(seed).permutation(len(labels))
+    split = max(1, int(len(labels) * holdout))
+    held_out, train = order[:split], order[split:]
+
+    mean = features[train].mean(axis=0)
+    std = features[train].std(axis=0) + EPSILON
+    x = (features - mean) / std
+
+    # Plain batch gradient descent: a few thousand rows, a handful of features
+    weights = np.zeros(x.shape[1])
+    bias = 0.0
+    for _ in range(epochs):
+        predicted = _sigmoid(x[train] @ weights + bias)
+        error = predicted - labels[train]
+        weights -= learning_rate * (x[train].T @ error / len(train) + l2 * weights)
+        bias -= learning_rate * error.mean()
+
+    scores = _sigmoid(x[held_out] @ weights + bias)
+    accept_above, reject_below = _confidence_band(scores, labels[held_out], target_agreement)
+
+    gate = MaizeGate(weights, bias, mean, std, accept_above, reject_below)
+    report = evaluate_gate(gate, [probabilities[i] for i in held_out], labels[held_out])
+    gate.meta = {"samples": int(len(labels)), "target_agreement": target_agreement, "holdout": report}
+    return gate, report
+
+
+def _confidence_band(scores, labels, target_agreement):
+    """
+    Lowest accept threshold whose accepted images are CLIP-maize at least
+    `target_agreement` of the time, and the highest such reject threshold.
+    A side that never reaches the target is disabled.
+    """
+    accept_above, reject_below = float("inf"), float("-inf")
+
+    order = np.argsort(-scores)
+    agreeing = np.cumsum(labels[order]) / np.arange(1, len(order) + 1)
+    passing = np.nonzero(agreeing >= target_agreement)[0]
+    if len(passing):
+        accept_above = float(scores[order][passing.max()])
+
+    order = np.argsort(scores)
+    agreeing = np.cumsum(1 - labels[order]) / np.arange(1, len(order) + 1)
+    passing = np.nonzero(agreeing >= target_agreement)[0]
+    if len(passing):
+        reject_below = float(scores[order][passing.max()])
+
+    # Never overlap: an image can't be confidently both
+    if reject_below >= accept_above:
+        accept_above, reject_below = float("inf"), float("-inf")
+    return accept_above, reject_below
+
+
+def evaluate_gate(gate, probabilities, labels):
+    """Share of images the gate decides alone, and how often it agrees with CLIP there."""
+    decisions = [gate.decide(p) for p in probabilities]
+    confident = [(d, bool(label)) for d, label in zip(decisions, labels) if d is not None]
+    return {
+        "images": len(decisions),
+        "hit_rate": len(confident) / len(decisions) if decisions else 0.0,
+        "agreement": sum(d == label for d, label in confident) / len(confident) if confident else 1.0,
+    }
+
+
+# ---------------------------
+# Runtime metrics
+# ---------------------------
+class CascadeStats:
+    """Per-process counters: how often the gate decides alone and how often it disagrees with CLIP."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(
+            ("images", "gate_maize", "gate_not_maize", "clip_fallthrough",
+             "audited", "disagree_gate_maize", "disagree_gate_not_maize"), 0)
+
+    def record_decision(self, decision):
+        key = "clip_fallthrough" if decision is None else "gate_maize" if decision else "gate_not_maize"
+        with self._lock:
+            self._counts["images"] += 1
+            self._counts[key] += 1
+
+    def record_audit(self, gate_decision, clip_decision):
+        with self._lock:
+            self._counts["audited"] += 1
+            if gate_decision != clip_decision:
+                self._counts["disagree_gate_maize" if gate_decision else "disagree_gate_not_maize"] += 1
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        decided = counts["gate_maize"] + counts["gate_not_maize"]
+        disagreements = counts["disagree_gate_maize"] + counts["disagree_gate_not_maize"]
+        return {
+            **counts,
+            "hit_rate": decided / counts["images"] if counts["images"] else 0.0,
+            "disagreement_rate": disagreements / counts["audited"] if counts["audited"] else 0.0,
+        }
+
+
+cascade_stats = CascadeStats()
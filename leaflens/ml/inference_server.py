@@ -0,0 +1,346 @@
+"""
+Inference server
+One long-lived process (`manage.py run_inference_server`) holds CLIP and the
+TFLite interpreters; web workers forward is_maize_clip / run_tflite_inference
+(and their _batch variants) to it over a local Unix socket instead of loading
+their own copies.
+
+Only small control messages go through the socket. Pixel arrays are written
+into a shared memory segment owned by the calling thread and read in place
+by the server, so they are never pickled.
+"""
+import os
+import socket
+import threading
+import weakref
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import AuthenticationError, Client, Listener
+
+import numpy as np
+from django.conf import settings
+from PIL import Image
+
+from .preprocessing import PreprocessedImage, as_preprocessed, clip_presize
+
+SEGMENT_MIN_BYTES = 1024 * 1024
+
+# Segments created by clients in this process (they stay registered with our tracker)
+_owned_segments = set()
+
+
+class InferenceServerUnavailable(RuntimeError):
+    """The server could not be reached or did not answer in time."""
+
+
+class RemoteInferenceError(RuntimeError):
+    """The server answered, but running the model on this input failed."""
+
+
+def remote_inference_enabled():
+    return bool(getattr(settings, 'ML_INFERENCE_SOCKET', ''))
+
+
+def server_authkey():
+    # Both sides run with the same settings: no extra secret to distribute
+    return settings.SECRET_KEY.encode()
+
+
+# ---------------------------
+# Shared memory helpers
+# ---------------------------
+def _attach_segment(name):
+    """Open a segment created by another process without taking ownership of it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        segment = shared_memory.SharedMemory(name=name)
+        # Older versions register every attached segment with this process's
+        # resource tracker, which would unlink the client's segment on exit
+        if segment.name not in _owned_segments:
+            resource_tracker.unregister(segment._name, "shared_memory")
+        return segment
+
+
+def _release_segment(segment, unlink, owner_pid=None):
+    # Finalizers are inherited by forked children: only the creator releases
+    if owner_pid is not None and owner_pid != os.getpid():
+        return
+    try:
+        segment.close()
+        if unlink:
+            _owned_segments.discard(segment.name)
+            segment.unlink()
+    except (BufferError, FileNotFoundError):
+        pass
+
+
+# ---------------------------
+# Client (web workers)
+# ---------------------------
+class _Channel:
+    """One connection plus one reusable shared memory segment (per thread)."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.segment = None
+        self._finalizer = None
+
+    def put(self, array):
+        """Copy `array` into the segment and return its descriptor for the request."""
+        array = np.ascontiguousarray(array)
+
+        if self.segment is None or self.segment.size < array.nbytes:
+            self.release_segment()
+            # Grow in whole MiB so a slightly larger photo does not reallocate
+            size = max(SEGMENT_MIN_BYTES, -(-array.nbytes // SEGMENT_MIN_BYTES) * SEGMENT_MIN_BYTES)
+            self.segment = shared_memory.SharedMemory(create=True, size=size)
+            _owned_segments.add(self.segment.name)
+            self._finalizer = weakref.finalize(self, _release_segment, self.segment, True, os.getpid())
+
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=self.segment.buf)
+        view[...] = array
+        del view
+        return {"shm": self.segment.name, "shape": array.shape, "dtype": array.dtype.str}
+
+    def release_segment(self):
+        if self._finalizer is not None:
+            self._finalizer()
+        self.segment = None
+        self._finalizer = None
+
+    def close(self):
+        self.release_segment()
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+
+
+class InferenceClient:
+    """
+    Thread-safe client: every thread gets its own connection and segment,
+    so concurrent requests in one worker don't serialize on a lock.
+    """
+
+    def __init__(self, address, authkey, timeout=30.0):
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def call(self, op, array=None, **params):
+        channel = self._channel()
+        request = {"op": op}
+        if array is not None:
+            request.update(channel.put(array))
+        if params:
+            request["params"] = params
+
+        try:
+            channel.conn.send(request)
+            if not channel.conn.poll(self.timeout):
+                raise TimeoutError(f"no reply within {self.timeout}s")
+            reply = channel.conn.recv()
+        except (OSError, EOFError, TimeoutError) as e:
+            # A late reply would be read as the answer to the next request: start over
+            self._drop()
+            raise InferenceServerUnavailable(f"{op}: {e}") from e
+
+        if not reply["ok"]:
+            raise RemoteInferenceError(reply["error"])
+        return reply["result"]
+
+    def clip_similarity(self, image):
+        """
+        Max prompt similarity for one image. Cut down to CLIP's input size here
+        (clip_presize gives the same tensor); the rest of CLIP's preprocessing
+        runs on the server.
+        """
+        return self.call("clip", np.asarray(clip_presize(as_preprocessed(image).image)))
+
+    def tflite_probabilities(self, img_array):
+        """Probability vector for one (1, 224, 224, 3) MobileNet array."""
+        return np.asarray(self.call("classify", img_array), dtype=np.float32)
+
+    def clip_similarities(self, images):
+        """
+        Max prompt similarity per image, in one request. Images are cut down to
+        CLIP's input size here (clip_presize gives the same tensor) and sent as
+        one flat pixel buffer plus their shapes.
+        """
+        pixels = [np.asarray(clip_presize(as_preprocessed(image).image)) for image in images]
+        flat = np.concatenate([p.reshape(-1) for p in pixels])
+        return self.call("clip_batch", flat, shapes=[p.shape for p in pixels])
+
+    def tflite_probabilities_batch(self, img_arrays):
+        """One probability vector per (1, 224, 224, 3) MobileNet array, in one request."""
+        return np.asarray(self.call("classify_batch", np.concatenate(img_arrays)), dtype=np.float32)
+
+    def readiness(self):
+        return self.call("ready")
+
+    def _channel(self):
+        channel = getattr(self._local, "channel", None)
+        if channel is None:
+            try:
+                conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            except (OSError, EOFError, AuthenticationError) as e:
+                raise InferenceServerUnavailable(f"cannot connect to {self.address}: {e}") from e
+            channel = self._local.channel = _Channel(conn)
+        return channel
+
+    def _drop(self):
+        channel = getattr(self._local, "channel", None)
+        if channel is not None:
+            channel.close()
+            self._local.channel = None
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def inference_client():
+    """Process-wide client for ML_INFERENCE_SOCKET (rebuilt if the setting changes)."""
+    global _client
+    address = getattr(settings, 'ML_INFERENCE_SOCKET', '')
+    with _client_lock:
+        if _client is None or _client.address != address:
+            _client = InferenceClient(
+                address,
+                server_authkey(),
+                timeout=getattr(settings, 'ML_INFERENCE_TIMEOUT', 30.0),
+            )
+        return _client
+
+
+def after_fork():
+    """Forked child: never reuse the parent's connections or segments."""
+    global _client, _client_lock
+    _client = None
+    _client_lock = threading.Lock()
+    _owned_segments.clear()
+
+
+# ---------------------------
+# Server
+# ---------------------------
+def split_pixels(flat, shapes):
+    """Undo InferenceClient.clip_similarities' packing: one array per shape."""
+    arrays, offset = [], 0
+    for shape in shapes:
+        size = int(np.prod(shape))
+        arrays.append(flat[offset:offset + size].reshape(shape))
+        offset += size
+    return arrays
+
+
+def default_handlers():
+    """
+    op -> fn(array, **params) using this process's models.
+    Single-image ops are micro-batched when enabled; _batch ops already are batches.
+    """
+    from . import utils
+    from .warmup import readiness
+
+    def clip_batch(flat, shapes):
+        tensors = [utils.clip_input(PreprocessedImage(Image.fromarray(pixels, "RGB")))
+                   for pixels in split_pixels(flat, shapes)]
+        return [float(similarity) for similarity in utils.clip_similarity_batch(tensors)]
+
+    return {
+        "ready": lambda _: readiness()[1],
+        "clip": lambda pixels: float(utils.clip_similarity(PreprocessedImage(Image.fromarray(pixels, "RGB")))),
+        "classify": lambda img_array: [float(p) for p in utils.tflite_probabilities(img_array)],
+        "clip_batch": clip_batch,
+        "classify_batch": lambda img_arrays: [
+            [float(p) for p in probabilities] for probabilities in utils.tflite_probabilities_batch([img_arrays])
+        ],
+    }
+
+
+class InferenceServer:
+    """
+    Accepts client connections on a Unix socket, one thread per connection.
+    Requests from different web workers run concurrently, so with
+    ML_BATCHING_ENABLED they are grouped into stacked model calls.
+    """
+
+    def __init__(self, address, authkey, handlers=None):
+        self.address = address
+        self.authkey = authkey
+        self.handlers = handlers if handlers is not None else default_handlers()
+        self._listener = None
+        self._closed = threading.Event()
+        self.started = threading.Event()
+
+    def serve_forever(self):
+        # Left over by a server that was killed
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+
+        self._listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        os.chmod(self.address, 0o660)
+        self.started.set()
+
+        try:
+            while not self._closed.is_set():
+                try:
+                    conn = self._listener.accept()
+                except (OSError, EOFError, AuthenticationError) as e:
+                    if self._closed.is_set():
+                        break
+                    print("Inference server accept error:", e)
+                    continue
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+        finally:
+            self._listener.close()
+
+    def shutdown(self):
+        self._closed.set()
+        # Wake up accept(): the handshake fails and the loop sees the flag
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as wakeup:
+                wakeup.connect(self.address)
+        except OSError:
+            pass
+
+    def _serve_connection(self, conn):
+        attached = {}
+        try:
+            while True:
+                try:
+                    request = conn.recv()
+                except (OSError, EOFError):
+                    break
+                conn.send(self._handle(request, attached))
+        except OSError:
+            pass
+        finally:
+            conn.close()
+            for segment in attached.values():
+                _release_segment(segment, unlink=False)
+
+    def _handle(self, request, attached):
+        try:
+            array = None
+            if "shm" in request:
+                array = self._read_array(request, attached)
+            return {"ok": True, "result": self.handlers[request["op"]](array, **request.get("params", {}))}
+        except Exception as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+    def _read_array(self, request, attached):
+        name = request["shm"]
+        if name not in attached:
+            # The client grew its segment: the old one is gone
+            for old in attached.values():
+                _release_segment(old, unlink=False)
+            attached.clear()
+            attached[name] = _attach_segment(name)
+
+        view = np.ndarray(request["shape"], dtype=np.dtype(request["dtype"]), buffer=attached[name].buf)
+        # One memcpy out of the segment: the client reuses it for its next request
+        array = view.copy()
+        del view
+        return array
@@ -0,0 +1,211 @@
+"""
+Model loaders
+Heavy imports (torch, clip, tensorflow) happen inside the loaders,
+so importing this module is cheap.
+"""
+import os
+import threading
+
+from django.conf import settings
+
+from .pool import InterpreterPool
+from .prompts import load_prompt_embeddings
+
+# ---------------------------
+# Model files / names
+# ---------------------------
+TFLITE_PATH = str(settings.BASE_DIR / 'ml/models/mobilenetv2_v1_44_0.996.tflite')
+
+# Classifier variants, converted from the same trained model. float16 keeps
+# float32 inputs/outputs; int8 is fully quantized (int8 or uint8 input/output).
+# Compare them with `manage.py benchmark_classifier` before switching.
+TFLITE_VARIANTS = {
+    "float32": TFLITE_PATH,
+    "float16": TFLITE_PATH.replace(".tflite", "_float16.tflite"),
+    "int8": TFLITE_PATH.replace(".tflite", "_int8.tflite"),
+}
+CLIP_MODEL_NAME = "ViT-B/32"
+CLIP_THRESHOLD = 0.29
+
+# Image encoder precision on CPU: fp32 (reference), int8 (dynamic quantization
+# of the Linear layers) or bf16. Check agreement with `manage.py benchmark_clip` first.
+CLIP_PRECISIONS = ("fp32", "int8", "bf16")
+
+maize_prompts = [
+    "maize leaf",
+    "maize plant leaf",
+    "corn leaf",
+    "maize crop leaf",
+    "closeup of maize leaf",
+    "maize disease leaf",
+    "healthy maize leaf"
+]
+
+
+def model_version():
+    """
+    Identifies the models that produced a result, e.g.
+    "mobilenetv2_v1_44_0.996+clip-ViT-B/32@0.29". Cached results are only
+    reused for the same version. ML_MODEL_VERSION overrides it.
+    """
+    override = getattr(settings, 'ML_MODEL_VERSION', '')
+    if override:
+        return override
+    classifier = os.path.splitext(os.path.basename(classifier_model_path()))[0]
+    precision = clip_precision()
+    clip_name = CLIP_MODEL_NAME if precision == "fp32" else f"{CLIP_MODEL_NAME}-{precision}"
+    version = f"{classifier}+clip-{clip_name}@{CLIP_THRESHOLD}"
+
+    # Reduced-resolution JPEG decodes feed the models different pixels
+    draft_min_side = getattr(settings, 'ML_DRAFT_DECODE_MIN_SIDE', 0)
+    if draft_min_side:
+        version += f"+draft{draft_min_side}"
+
+    # The cascade gate makes some prefilter decisions instead of CLIP
+    from .registry import registry
+    gate = registry.get("gate")
+    if gate is not None:
+        version += f"+gate-{gate.identity}"
+    return version
+
+
+def clip_precision():
+    precision = getattr(settings, 'ML_CLIP_PRECISION', 'fp32')
+    if precision not in CLIP_PRECISIONS:
+        raise ValueError(f"ML_CLIP_PRECISION must be one of {CLIP_PRECISIONS}, got {precision!r}")
+    return precision
+
+
+def classifier_model_path(variant=None):
+    """Model file for `variant` (default ML_TFLITE_VARIANT)."""
+    variant = variant or getattr(settings, 'ML_TFLITE_VARIANT', 'float32')
+    if variant not in TFLITE_VARIANTS:
+        raise ValueError(f"ML_TFLITE_VARIANT must be one of {tuple(TFLITE_VARIANTS)}, got {variant!r}")
+    return TFLITE_VARIANTS[variant]
+
+
+class ClipPrefilter:
+    """CLIP image encoder, its preprocessing and the precomputed prompt features."""
+
+    def __init__(self, model, preprocess, prompt_features, device, precision="fp32"):
+        self.model = model
+        self.preprocess = preprocess
+        self.prompt_features = prompt_features
+        self.device = device
+        self.precision = precision
+
+
+# ---------------------------
+# TFLite model
+# ---------------------------
+_model_content = {}
+_model_content_lock = threading.Lock()
+
+
+def classifier_model_content(path=None):
+    """
+    The TFLite flatbuffer, read once per process.
+    Every pooled interpreter is built from this one buffer, and when it is read
+    before a fork (ml/forking.py) all workers share its pages copy-on-write.
+    """
+    path = path or classifier_model_path()
+    with _model_content_lock:
+        if path not in _model_content:
+            with open(path, "rb") as f:
+                _model_content[path] = f.read()
+        return _model_content[path]
+
+
+def make_interpreter(model_content, num_threads=None):
+    """One allocated TFLite interpreter for a model buffer."""
+    from tensorflow.lite.python.interpreter import Interpreter
+
+    interpreter = Interpreter(
+        model_content=model_content,
+        num_threads=num_threads or getattr(settings, 'ML_TFLITE_NUM_THREADS', None),
+    )
+    interpreter.allocate_tensors()
+    return interpreter
+
+
+def load_classifier():
+    """Pool of preallocated TFLite interpreters (interpreters are not thread-safe)."""
+    model_content = classifier_model_content()
+
+    return InterpreterPool(
+        lambda: make_interpreter(model_content),
+        size=getattr(settings, 'ML_TFLITE_POOL_SIZE', 1),
+        name="classifier",
+    )
+
+
+# ---------------------------
+# CLIP model
+# ---------------------------
+def load_clip(precision=None):
+    import torch
+    import clip
+
+    precision = precision or clip_precision()
+
+    # Device for CLIP
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    clip_model, clip_preprocess = clip.load(CLIP_MODEL_NAME, device=device)
+
+    def encode_prompts(prompts):
+        with torch.no_grad():
+            text_tokens = clip.tokenize(prompts).to(device)
+            return clip_model.encode_text(text_tokens).float().cpu().numpy()
+
+    # Text features never change: compute (or read from disk) once, already normalized.
+    # Kept in fp32: similarities are computed in fp32 whatever the encoder precision.
+    prompt_features = torch.from_numpy(load_prompt_embeddings(
+        CLIP_MODEL_NAME,
+        maize_prompts,
+        encode_prompts,
+        cache_dir=getattr(settings, 'ML_CLIP_EMBEDDING_CACHE_DIR', None),
+    )).to(device=device, dtype=torch.float32)
+
+    # Only the image encoder is needed from here on
+    if getattr(settings, 'ML_CLIP_UNLOAD_TEXT_TOWER', True):
+        for name in ("transformer", "token_embedding", "positional_embedding",
+                     "ln_final", "text_projection"):
+            setattr(clip_model, name, None)
+
+    # Inference only: no autograd state, weights are never written after this
+    clip_model.eval().requires_grad_(False)
+    clip_model = apply_clip_precision(clip_model, precision, device)
+
+    return ClipPrefilter(clip_model, clip_preprocess, prompt_features, device, precision)
+
+
+def apply_clip_precision(clip_model, precision, device):
+    """Convert the (text-tower-free) CLIP model to a reduced-precision CPU mode."""
+    import torch
+
+    if precision == "fp32":
+        return clip_model
+    if device != "cpu":
+        raise ValueError(f"CLIP precision {precision!r} is for CPU inference, device is {device!r}")
+
+    if precision == "int8":
+        # Weights stored as int8, activations quantized on the fly per batch.
+        # Covers the MLP blocks, which hold most of the ViT's FLOPs.
+        return torch.quantization.quantize_dynamic(clip_model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    if precision == "bf16":
+        # encode_image casts its input to the model dtype
+        return clip_model.to(torch.bfloat16)
+
+    raise ValueError(f"Unknown CLIP precision {precision!r}")
+
+
+# ---------------------------
+# Cascade gate
+# ---------------------------
+def load_gate():
+    """The fitted maize gate (ML_GATE_PATH), or None when the cascade is off."""
+    from .gate import MaizeGate
+
+    path = getattr(settings, 'ML_GATE_PATH', '')
+    return MaizeGate.load(path) if path else None
@@ -0,0 +1,112 @@
+"""
+Classifier variant benchmark
+usage: python manage.py benchmark_classifier <image_dir> [--variants float16 int8] [--threads 2]
+Runs the float32 model and each available variant over the same images and
+reports p50/p99 latency, throughput and top-1 agreement with float32.
+Images in subdirectories named after a class (Blight/, Healthy/, ...) also count
+towards accuracy.
+"""
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ml.benchmark import agreement, labelled_images, latency_summary, percentile
+from ml.loaders import TFLITE_VARIANTS, classifier_model_content, make_interpreter
+from ml.preprocessing import PreprocessedImage
+from ml.utils import CLASSES, interpreter_probabilities, mobilenet_input
+
+
+class Command(BaseCommand):
+    help = "Compare latency, throughput and top-1 agreement of the TFLite classifier variants"
+
+    def add_arguments(self, parser):
+        parser.add_argument('image_dir', help="Directory of images, optionally in class subdirectories")
+        parser.add_argument('--variants', nargs='+', default=["float16", "int8"],
+                            choices=[v for v in TFLITE_VARIANTS if v != "float32"])
+        parser.add_argument('--threads', type=int, default=None,
+                            help="Interpreter num_threads, to match the deployment")
+        parser.add_argument('--batch-size', type=int, default=8,
+                            help="Batch size for the throughput run")
+        parser.add_argument('--min-agreement', type=float, default=0.99,
+                            help="Top-1 agreement with float32 required to recommend a variant")
+
+    def handle(self, *args, **options):
+        images = labelled_images(options['image_dir'])
+        if not images:
+            raise CommandError(f"No images found in {options['image_dir']}")
+
+        # Same float32 [0, 1] arrays for every variant: only the interpreter differs
+        arrays = [mobilenet_input(PreprocessedImage.from_path(path)) for path, _ in images]
+        labels = [label for _, label in images]
+
+        results = {}
+        for variant in ["float32"] + [v for v in options['variants'] if v != "float32"]:
+            path = TFLITE_VARIANTS[variant]
+            if not os.path.exists(path):
+                self.stdout.write(self.style.WARNING(f"Skipping {variant}: {path} not found"))
+                continue
+            self.stdout.write(f"Running {variant} on {len(arrays)} image(s)...")
+            results[variant] = self.run(path, arrays, options)
+
+        if "float32" not in results:
+            raise CommandError("The float32 reference model is missing")
+        self.report(results, labels, options)
+
+    def run(self, path, arrays, options):
+        interpreter = make_interpreter(classifier_model_content(path), num_threads=options['threads'])
+
+        # First invoke allocates: keep it out of the timings
+        interpreter_probabilities(interpreter, arrays[:1])
+
+        predictions, timings = [], []
+        for img_array in arrays:
+            started = time.perf_counter()
+            probabilities = interpreter_probabilities(interpreter, [img_array])[0]
+            timings.append(time.perf_counter() - started)
+            predictions.append(int(probabilities.argmax()))
+
+        # Throughput with stacked batches (what the async worker and batchers do)
+        batch_size = max(1, options['batch_size'])
+        started = time.perf_counter()
+        for start in range(0, len(arrays), batch_size):
+            interpreter_probabilities(interpreter, arrays[start:start + batch_size])
+        elapsed = time.perf_counter() - started
+
+        return {
+            "predictions": predictions,
+            "latency": latency_summary(timings),
+            "p99_ms": percentile(sorted(t * 1000.0 for t in timings), 99),
+            "throughput": len(arrays) / elapsed if elapsed else 0.0,
+        }
+
+    def report(self, results, labels, options):
+        reference = results["float32"]["predictions"]
+        labelled = [i for i, label in enumerate(labels) if label in CLASSES]
+
+        self.stdout.write("")
+        self.stdout.write(f"{'variant':<10}{'p50 ms':>10}{'p99 ms':>10}{'img/s':>10}"
+                          f"{'top-1 agree':>13}{'accuracy':>10}")
+
+        acceptable = []
+        for variant, result in results.items():
+            agreed = agreement(reference, result["predictions"])
+            if labelled:
+                correct = sum(CLASSES[result["predictions"][i]] == labels[i] for i in labelled)
+                accuracy = f"{correct / len(labelled):.3f}"
+            else:
+                accuracy = "-"
+
+            self.stdout.write(
+                f"{variant:<10}{result['latency']['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+                f"{result['throughput']:>10.1f}{agreed:>13.4f}{accuracy:>10}"
+            )
+            if agreed >= options['min_agreement']:
+                acceptable.append(variant)
+
+        # Fastest variant that still agrees with float32 often enough
+        best = max(acceptable, key=lambda v: results[v]["throughput"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Fastest variant with top-1 agreement >= {options['min_agreement']}: {best} "
+            f"(ML_TFLITE_VARIANT={best})"
+        ))
@@ -0,0 +1,117 @@
+"""
+Reduced-precision CLIP benchmark
+usage: python manage.py benchmark_clip <image_dir> [--precisions int8 bf16] [--min-agreement 0.99]
+Compares each precision with fp32: latency per image and agreement of the
+maize / not-maize decision. Images in <image_dir>/maize/ are expected to
+pass the prefilter, images in any other subdirectory to be rejected.
+Fails (non-zero exit) when a precision is below --min-agreement.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ml.benchmark import agreement, labelled_images, latency_summary
+from ml.loaders import CLIP_PRECISIONS, CLIP_THRESHOLD, load_clip
+from ml.preprocessing import PreprocessedImage
+from ml.utils import clip_similarity_batch
+
+
+class Command(BaseCommand):
+    help = "Measure latency and decision agreement of reduced-precision CLIP against fp32"
+
+    def add_arguments(self, parser):
+        parser.add_argument('image_dir', help="Directory of images, optionally in label subdirectories")
+        parser.add_argument('--precisions', nargs='+', default=["int8", "bf16"],
+                            choices=[p for p in CLIP_PRECISIONS if p != "fp32"])
+        parser.add_argument('--threshold', type=float, default=CLIP_THRESHOLD)
+        parser.add_argument('--positive-label', default="maize",
+                            help="Subdirectory holding images that should pass the prefilter")
+        parser.add_argument('--min-agreement', type=float, default=0.99,
+                            help="Required fraction of decisions identical to fp32")
+        parser.add_argument('--threads', type=int, default=None,
+                            help="torch.set_num_threads, to match the deployment")
+
+    def handle(self, *args, **options):
+        images = labelled_images(options['image_dir'])
+        if not images:
+            raise CommandError(f"No images found in {options['image_dir']}")
+
+        if options['threads']:
+            import torch
+            torch.set_num_threads(options['threads'])
+
+        # Decode once: only the encoder is timed
+        decoded = [PreprocessedImage.from_path(path) for path, _ in images]
+        labels = [label for _, label in images]
+
+        results = {}
+        for precision in ["fp32"] + [p for p in options['precisions'] if p != "fp32"]:
+            self.stdout.write(f"Running {precision} on {len(decoded)} image(s)...")
+            results[precision] = self.run(precision, decoded, options['threshold'])
+
+        self.report(results, images, labels, options)
+
+    def run(self, precision, decoded, threshold):
+        prefilter = load_clip(precision=precision)
+        tensors = [prefilter.preprocess(image.image).unsqueeze(0) for image in decoded]
+
+        # First call allocates: keep it out of the timings
+        clip_similarity_batch(tensors[:1], prefilter)
+
+        similarities, timings = [], []
+        for tensor in tensors:
+            started = time.perf_counter()
+            similarities.append(clip_similarity_batch([tensor], prefilter)[0])
+            timings.append(time.perf_counter() - started)
+
+        return {
+            "similarities": similarities,
+            "decisions": [sim > threshold for sim in similarities],
+            "latency": latency_summary(timings),
+        }
+
+    def report(self, results, images, labels, options):
+        reference = results["fp32"]
+        labelled = [i for i, label in enumerate(labels) if label is not None]
+
+        self.stdout.write("")
+        self.stdout.write(f"{'precision':<10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}"
+                          f"{'speedup':>10}{'agreement':>11}{'accuracy':>10}{'max |dsim|':>12}")
+
+        failing = []
+        for precision, result in results.items():
+            latency = result["latency"]
+            speedup = reference["latency"]["mean_ms"] / latency["mean_ms"] if latency["mean_ms"] else 0.0
+            agreed = agreement(reference["decisions"], result["decisions"])
+            max_delta = max(abs(a - b) for a, b in zip(reference["similarities"], result["similarities"]))
+
+            if labelled:
+                correct = sum(result["decisions"][i] == (labels[i] == options['positive_label']) for i in labelled)
+                accuracy = f"{correct / len(labelled):.3f}"
+            else:
+                accuracy = "-"
+
+            self.stdout.write(
+                f"{precision:<10}{latency['mean_ms']:>10.1f}{latency['p50_ms']:>10.1f}{latency['p95_ms']:>10.1f}"
+                f"{speedup:>9.2f}x{agreed:>11.4f}{accuracy:>10}{max_delta:>12.4f}"
+            )
+            if precision != "fp32" and agreed < options['min_agreement']:
+                failing.append(precision)
+
+        # Decisions that flipped, with both similarities, for a quick look
+        for precision, result in results.items():
+            flips = [i for i, (a, b) in enumerate(zip(reference["decisions"], result["decisions"])) if a != b]
+            for i in flips[:10]:
+                self.stdout.write(
+                    f"  {precision} flip: {images[i][0]} "
+                    f"fp32={reference['similarities'][i]:.4f} {precision}={result['similarities'][i]:.4f}"
+                )
+
+        if failing:
+            raise CommandError(
+                f"Agreement below {options['min_agreement']} for: {', '.join(failing)}. Keep ML_CLIP_PRECISION=fp32."
+            )
+        passing = ", ".join(p for p in results if p != "fp32")
+        self.stdout.write(self.style.SUCCESS(
+            f"{passing} meet(s) the {options['min_agreement']} agreement bar: safe to set ML_CLIP_PRECISION"
+        ))
@@ -0,0 +1,39 @@
+"""
+Shared inference server for all web workers
+usage: python manage.py run_inference_server [--socket /run/leaflens/inference.sock]
+Web workers forward to it when ML_INFERENCE_SOCKET is set.
+"""
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ml.inference_server import InferenceServer, server_authkey
+from ml.warmup import warmup
+
+
+class Command(BaseCommand):
+    help = "Hold the ML models in one process and serve web workers over a Unix socket"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=getattr(settings, 'ML_INFERENCE_SOCKET', ''),
+                            help="Unix socket path (defaults to ML_INFERENCE_SOCKET)")
+
+    def handle(self, *args, **options):
+        address = options['socket']
+        if not address:
+            raise CommandError("No socket path: pass --socket or set ML_INFERENCE_SOCKET")
+
+        # Load and warm both models before accepting connections
+        if not warmup():
+            raise CommandError("Model warmup failed, see the error above")
+
+        server = InferenceServer(address, server_authkey())
+        signal.signal(signal.SIGTERM, lambda *_: server.shutdown())
+
+        self.stdout.write(self.style.SUCCESS(f"Inference server listening on {address}"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write("Inference server stopped")
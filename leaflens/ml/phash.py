@@ -0,0 +1,57 @@
+"""
+Perceptual hashing (dHash)
+Near-identical photos (recompressed, resized) get hashes a few bits apart,
+unlike SHA-256 where any change gives a new hash.
+"""
+import numpy as np
+from PIL import Image
+
+HASH_SIZE = 8        # 8x8 gradients -> 64-bit hash
+BAND_COUNT = 4       # 4 x 16-bit bands used for indexed lookups
+BAND_BITS = 64 // BAND_COUNT
+
+# Largest distance a band lookup is guaranteed to find (see hash_bands)
+MAX_BAND_DISTANCE = BAND_COUNT - 1
+
+# Hashes of (almost) flat images carry no information: every black or
+# overexposed photo would match every other one
+MIN_INFORMATIVE_BITS = 8
+
+
+def dhash(image):
+    """
+    64-bit difference hash of a PIL image.
+    Downscale to 9x8 grayscale, then one bit per pixel: brighter than its left neighbour?
+    """
+    gray = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR)
+    pixels = np.asarray(gray, dtype=np.int16)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def hamming_distance(a, b):
+    return (a ^ b).bit_count()
+
+
+def is_informative(hash_value):
+    ones = hash_value.bit_count()
+    return MIN_INFORMATIVE_BITS <= ones <= 64 - MIN_INFORMATIVE_BITS
+
+
+def hash_bands(hash_value):
+    """
+    Split the hash into BAND_COUNT 16-bit bands.
+    Pigeonhole: two hashes within distance < BAND_COUNT share at least one
+    band exactly, so an equality lookup on any band finds every such match.
+    """
+    mask = (1 << BAND_BITS) - 1
+    return [(hash_value >> (BAND_BITS * i)) & mask for i in range(BAND_COUNT)]
+
+
+def to_signed64(hash_value):
+    """Unsigned 64-bit hash -> value that fits a signed BIGINT column."""
+    return hash_value - (1 << 64) if hash_value >= (1 << 63) else hash_value
+
+
+def from_signed64(value):
+    return value + (1 << 64) if value < 0 else value
@@ -0,0 +1,100 @@
+"""
+TFLite interpreter pool
+One interpreter is NOT thread-safe (set_tensor/invoke/get_tensor share buffers),
+so each inference checks out its own preallocated interpreter.
+"""
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+
+class _Slot:
+    """One pooled interpreter plus its usage counters."""
+
+    def __init__(self, index, interpreter):
+        self.index = index
+        self.interpreter = interpreter
+        self.uses = 0
+        self.busy_seconds = 0.0
+
+
+class InterpreterPool:
+    """
+    Fixed-size pool of interpreters built by `factory()`.
+
+    Use `with pool.checkout() as interpreter:` around set_tensor/invoke/get_tensor.
+    Callers block while every interpreter is busy.
+    """
+
+    def __init__(self, factory, size, name="tflite"):
+        if size < 1:
+            raise ValueError("pool size must be at least 1")
+
+        self.name = name
+        self.size = size
+        self._slots = [_Slot(i, factory()) for i in range(size)]
+        self._available = queue.Queue()
+        for slot in self._slots:
+            self._available.put(slot)
+
+        self._created = time.perf_counter()
+        self._stats_lock = threading.Lock()
+        self._in_use = 0
+        self._peak_in_use = 0
+        self._checkouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """Borrow an interpreter for the duration of the block."""
+        requested = time.perf_counter()
+        try:
+            slot = self._available.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No {self.name} interpreter free after {timeout}s")
+
+        started = time.perf_counter()
+        with self._stats_lock:
+            waited = started - requested
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+
+        try:
+            yield slot.interpreter
+        finally:
+            with self._stats_lock:
+                slot.uses += 1
+                slot.busy_seconds += time.perf_counter() - started
+                self._in_use -= 1
+            self._available.put(slot)
+
+    def stats(self):
+        """Pool-wide and per-interpreter utilization metrics."""
+        with self._stats_lock:
+            uptime = max(time.perf_counter() - self._created, 1e-9)
+            busy_total = sum(slot.busy_seconds for slot in self._slots)
+            return {
+                "name": self.name,
+                "size": self.size,
+                "in_use": self._in_use,
+                "peak_in_use": self._peak_in_use,
+                "checkouts": self._checkouts,
+                "avg_wait_ms": (self._wait_total / self._checkouts) * 1000.0 if self._checkouts else 0.0,
+                "max_wait_ms": self._wait_max * 1000.0,
+                # Fraction of pool capacity spent inside checkout blocks since creation
+                "utilization": busy_total / (uptime * self.size),
+                "interpreters": [
+                    {
+                        "index": slot.index,
+                        "uses": slot.uses,
+                        "busy_seconds": round(slot.busy_seconds, 6),
+                        "utilization": slot.busy_seconds / uptime,
+                    }
+                    for slot in self._slots
+                ],
+            }
@@ -0,0 +1,181 @@
+"""
+Image preprocessing
+Decode an upload ONCE and derive every model input from memory
+"""
+import hashlib
+import io
+import math
+
+import numpy as np
+from django.conf import settings
+from PIL import Image
+
+
+# MobileNetV2 input size (width, height) used during training
+MOBILENET_SIZE = (224, 224)
+
+# CLIP ViT-B/32 preprocess: Resize(224, bicubic) on the shorter side, then CenterCrop(224)
+CLIP_RESIZE = 224
+
+# File extensions treated as photos in directories and zip archives
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+
+class ImageTooLarge(ValueError):
+    """The header announces more pixels than PREDICTION_MAX_MEGAPIXELS allows."""
+
+
+def draft_size(size, min_side):
+    """Smallest size with the same aspect ratio whose shorter side is >= min_side."""
+    width, height = size
+    scale = min_side / min(width, height)
+    return math.ceil(width * scale), math.ceil(height * scale)
+
+
+def decode_image(data):
+    """
+    Decode raw image bytes into an RGB PIL image.
+    Raises OSError/ValueError for anything Pillow cannot fully decode,
+    ImageTooLarge for decompression bombs (checked from the header alone).
+
+    With ML_DRAFT_DECODE_MIN_SIDE, JPEGs are decoded at 1/2, 1/4 or 1/8 scale
+    by libjpeg itself (DCT scaling), keeping the shorter side >= that value:
+    a 12 MP photo then costs a fraction of the CPU and memory. Off by default:
+    the classifier was trained on full-resolution decodes.
+    """
+    image = Image.open(io.BytesIO(data))
+
+    # Only the header has been read: refuse oversized images before allocating pixels
+    max_megapixels = getattr(settings, 'PREDICTION_MAX_MEGAPIXELS', 0)
+    if max_megapixels and image.width * image.height > max_megapixels * 1_000_000:
+        raise ImageTooLarge(
+            f"{image.width}x{image.height} is over the {max_megapixels} megapixel limit"
+        )
+
+    draft_min_side = getattr(settings, 'ML_DRAFT_DECODE_MIN_SIDE', 0)
+    if draft_min_side and image.format == "JPEG" and min(image.size) > draft_min_side:
+        image.draft("RGB", draft_size(image.size, draft_min_side))
+
+    # Force the full decode now so truncated files fail here, not mid-inference
+    image.load()
+
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return image
+
+
+def mobilenet_array(image, out=None):
+    """
+    MobileNet input (1, 224, 224, 3) float32 in [0, 1] from an RGB PIL image.
+
+    Bit-identical to the training pipeline
+    `img_to_array(load_img(path, target_size=(224, 224))) / 255.0`:
+    nearest-neighbour resize, then float32 division by 255.
+    Writes into `out` when given: a (1, 224, 224, 3) buffer or one
+    (224, 224, 3) row of a preallocated batch.
+    """
+    if image.size != MOBILENET_SIZE:
+        image = image.resize(MOBILENET_SIZE, Image.NEAREST)
+
+    if out is None:
+        out = np.empty((1, MOBILENET_SIZE[1], MOBILENET_SIZE[0], 3), dtype=np.float32)
+
+    # uint8 / float32 runs the float32 loop: same rounding as keras' float32 array / 255.0
+    pixels = np.asarray(image, dtype=np.uint8)
+    np.divide(pixels, np.float32(255.0), out=out[0] if out.ndim == 4 else out)
+    return out
+
+
+def clip_presize(image, size=CLIP_RESIZE):
+    """
+    The resize step of CLIP's preprocess, done ahead of time: same output
+    size and bicubic filter as torchvision's Resize(size), so running the
+    real preprocess on the result is a no-op resize and gives the same tensor.
+    Lets decode workers ship a small image instead of the full-resolution one.
+    """
+    width, height = image.size
+    if width <= height:
+        new_size = (size, int(size * height / width))
+    else:
+        new_size = (int(size * width / height), size)
+    if new_size == image.size:
+        return image
+    return image.resize(new_size, Image.BICUBIC)
+
+
+def quantize_input(batch, input_details):
+    """
+    Adapt a float32 [0, 1] MobileNet batch to the interpreter's input tensor:
+    unchanged for float models, quantized with the tensor's (scale, zero_point)
+    for int8 / uint8 models.
+    """
+    dtype = np.dtype(input_details['dtype'])
+    if dtype.kind == 'f':
+        return batch.astype(dtype, copy=False)
+
+    scale, zero_point = input_details['quantization']
+    info = np.iinfo(dtype)
+    quantized = np.round(batch / np.float32(scale)) + zero_point
+    return np.clip(quantized, info.min, info.max).astype(dtype)
+
+
+def dequantize_output(output, output_details):
+    """Probabilities as a new float32 array, whatever the model's output dtype."""
+    if np.dtype(output_details['dtype']).kind == 'f':
+        return output.astype(np.float32)
+
+    scale, zero_point = output_details['quantization']
+    return (output.astype(np.float32) - zero_point) * np.float32(scale)
+
+
+class PreprocessedImage:
+    """
+    One decoded upload shared by the CLIP prefilter and the TFLite classifier.
+
+    `data` keeps the original bytes (for persisting to media), `image` the
+    decoded RGB pixels and `content_hash` the SHA-256 of the bytes.
+    Model inputs are built on first use and cached, so a CLIP-rejected
+    image never pays for the MobileNet array.
+    """
+
+    def __init__(self, image, data=None, content_hash=None):
+        self.image = image
+        self.data = data
+        self.content_hash = content_hash
+        if content_hash is None and data is not None:
+            self.content_hash = hashlib.sha256(data).hexdigest()
+        self._inputs = {}
+
+    @classmethod
+    def from_bytes(cls, data, content_hash=None):
+        return cls(decode_image(data), data=data, content_hash=content_hash)
+
+    @classmethod
+    def from_upload(cls, uploaded_file):
+        """Read a Django upload chunk by chunk, hashing while it streams in."""
+        sha256 = hashlib.sha256()
+        buffer = io.BytesIO()
+        for chunk in uploaded_file.chunks():
+            sha256.update(chunk)
+            buffer.write(chunk)
+        return cls.from_bytes(buffer.getvalue(), content_hash=sha256.hexdigest())
+
+    @classmethod
+    def from_path(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+    def cached(self, key, build):
+        """Return the model input stored under `key`, building it once."""
+        if key not in self._inputs:
+            self._inputs[key] = build(self.image)
+        return self._inputs[key]
+
+
+def as_preprocessed(image):
+    """Accept a PreprocessedImage, a PIL image or a file path."""
+    if isinstance(image, PreprocessedImage):
+        return image
+    if isinstance(image, Image.Image):
+        return PreprocessedImage(image.convert("RGB") if image.mode != "RGB" else image)
+    return PreprocessedImage.from_path(image)
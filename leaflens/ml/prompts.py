@@ -0,0 +1,56 @@
+"""
+CLIP prompt embeddings
+The maize prompts never change, so their text features are computed once
+(at load time) and optionally cached on disk between restarts.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+
+def prompt_cache_key(model_name, prompts):
+    """Stable key for one model + prompt list (order matters)."""
+    payload = json.dumps({"model": model_name, "prompts": list(prompts)}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def normalize(features):
+    """L2-normalize each row, same as features / features.norm(dim=-1)."""
+    features = np.asarray(features, dtype=np.float32)
+    return features / np.linalg.norm(features, axis=-1, keepdims=True)
+
+
+def load_prompt_embeddings(model_name, prompts, compute, cache_dir=None):
+    """
+    Return normalized text features, shape (len(prompts), dim), float32.
+
+    `compute(prompts)` runs the text encoder and is only called on a cache
+    miss. With `cache_dir` set, results are stored as
+    `clip_prompts_<key>.npy`, so a new model or prompt list never reuses
+    stale features.
+    """
+    cache_path = None
+    if cache_dir:
+        cache_path = Path(cache_dir) / f"clip_prompts_{prompt_cache_key(model_name, prompts)}.npy"
+        if cache_path.exists():
+            cached = np.load(cache_path)
+            if cached.shape[0] == len(prompts):
+                return cached
+
+    features = normalize(compute(prompts))
+
+    if cache_path is not None:
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            # Write then rename so concurrent workers never read a partial file
+            tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, features)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print("Prompt embedding cache write error:", e)
+
+    return features
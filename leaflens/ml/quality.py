@@ -0,0 +1,88 @@
+"""
+Image quality precheck
+Cheap NumPy checks on a downscaled grayscale copy, run before any model:
+too small, too dark, overexposed, too blurry. A failed check carries a
+reason code and a message the farmer can act on.
+"""
+import numpy as np
+from django.conf import settings
+
+# Long side of the copy the checks run on: enough detail for blur, ~1 ms of work
+QUALITY_SIZE = 256
+
+# Exposure: share of pixels crushed to black / blown out to white
+DARK_LEVEL = 16
+BRIGHT_LEVEL = 240
+MAX_CLIPPED_FRACTION = 0.85
+MIN_MEAN_BRIGHTNESS = 25
+MAX_MEAN_BRIGHTNESS = 235
+
+MESSAGES = {
+    "too_small": "The photo is too small. Take the picture closer to the leaf or upload the original photo.",
+    "too_dark": "The photo is too dark. Take it in daylight or with the flash on.",
+    "overexposed": "The photo is too bright. Avoid direct sunlight on the leaf, or shade it with your hand.",
+    "blurry": "The photo is blurry. Hold the phone steady and tap the leaf to focus before taking the picture.",
+}
+
+
+def grayscale_thumbnail(image):
+    """Grayscale float32 copy, long side about QUALITY_SIZE (box reduce: fast on big photos)."""
+    factor = max(1, max(image.size) // QUALITY_SIZE)
+    small = image.reduce(factor) if factor > 1 else image
+    return np.asarray(small.convert("L"), dtype=np.float32)
+
+
+def sharpness(gray):
+    """Variance of the 4-neighbour Laplacian: low for blurred (or flat) images."""
+    laplacian = (
+        gray[1:-1, :-2] + gray[1:-1, 2:] + gray[:-2, 1:-1] + gray[2:, 1:-1]
+        - 4.0 * gray[1:-1, 1:-1]
+    )
+    return float(laplacian.var())
+
+
+def exposure(gray):
+    """Mean brightness and the share of crushed-black / blown-white pixels."""
+    histogram = np.bincount(gray.astype(np.uint8).ravel(), minlength=256)
+    total = histogram.sum()
+    return {
+        "mean_brightness": float(gray.mean()),
+        "dark_fraction": float(histogram[:DARK_LEVEL + 1].sum() / total),
+        "bright_fraction": float(histogram[BRIGHT_LEVEL:].sum() / total),
+    }
+
+
+def assess_quality(image):
+    """
+    Quality verdict for an RGB PIL image.
+    Returns None when the photo is usable, otherwise
+    {"reason": ..., "message": ..., "metrics": {...}}.
+    """
+    width, height = image.size
+    metrics = {"width": width, "height": height}
+
+    min_side = getattr(settings, 'PREDICTION_QUALITY_MIN_SIDE', 128)
+    if min(width, height) < min_side:
+        return _rejection("too_small", metrics)
+
+    gray = grayscale_thumbnail(image)
+    metrics.update(exposure(gray))
+    if metrics["mean_brightness"] < MIN_MEAN_BRIGHTNESS or metrics["dark_fraction"] > MAX_CLIPPED_FRACTION:
+        return _rejection("too_dark", metrics)
+    if metrics["mean_brightness"] > MAX_MEAN_BRIGHTNESS or metrics["bright_fraction"] > MAX_CLIPPED_FRACTION:
+        return _rejection("overexposed", metrics)
+
+    # After exposure: a dark or blown-out photo has no edges either
+    metrics["sharpness"] = sharpness(gray)
+    if metrics["sharpness"] < getattr(settings, 'PREDICTION_QUALITY_MIN_SHARPNESS', 12.0):
+        return _rejection("blurry", metrics)
+
+    return None
+
+
+def _rejection(reason, metrics):
+    return {
+        "reason": reason,
+        "message": MESSAGES[reason],
+        "metrics": {key: round(value, 3) if isinstance(value, float) else value for key, value in metrics.items()},
+    }
@@ -0,0 +1,124 @@
+"""
+Model registry
+Models are loaded lazily on first use (or explicitly via load_all()),
+so processes that never run inference (migrate, shell, admin) never pay for them.
+"""
+import threading
+import time
+
+from .loaders import load_classifier, load_clip, load_gate
+
+UNLOADED = "unloaded"
+LOADING = "loading"
+LOADED = "loaded"
+FAILED = "failed"
+
+
+class _Entry:
+    def __init__(self, name, loader, fork_safe=True):
+        self.name = name
+        self.loader = loader
+        self.fork_safe = fork_safe
+        self.lock = threading.Lock()
+        self.model = None
+        self.state = UNLOADED
+        self.error = None
+        self.load_seconds = None
+        self.loaded_at = None
+
+
+class ModelRegistry:
+    """Named, lazily loaded models with load state and load time."""
+
+    def __init__(self):
+        self._entries = {}
+
+    def register(self, name, loader, fork_safe=True):
+        """
+        `loader()` is called once, on first get(), and returns the model.
+        `fork_safe=False` models (native thread pools) are dropped in forked
+        children and loaded again there on first use.
+        """
+        self._entries[name] = _Entry(name, loader, fork_safe)
+
+    def get(self, name):
+        entry = self._entries[name]
+
+        # Fast path: no locking once loaded
+        if entry.state == LOADED:
+            return entry.model
+
+        with entry.lock:
+            # Another thread may have finished loading while we waited
+            if entry.state != LOADED:
+                self._load(entry)
+        return entry.model
+
+    def is_loaded(self, name):
+        return self._entries[name].state == LOADED
+
+    def load_all(self):
+        """Warmup hook: load every registered model now instead of on first request."""
+        for name in self._entries:
+            self.get(name)
+
+    def reset(self, name=None):
+        """Forget loaded models (all, or one) so the next get() loads again."""
+        for entry in self._entries.values():
+            if name is None or entry.name == name:
+                with entry.lock:
+                    entry.model = None
+                    entry.state = UNLOADED
+                    entry.error = None
+                    entry.load_seconds = None
+                    entry.loaded_at = None
+
+    def after_fork(self):
+        """Child side of a fork: fresh locks, fork-unsafe models unloaded."""
+        for entry in self._entries.values():
+            # The parent may have held the lock mid-load when it forked
+            entry.lock = threading.Lock()
+            if not entry.fork_safe or entry.state != LOADED:
+                entry.model = None
+                entry.state = UNLOADED
+                entry.error = None
+                entry.load_seconds = None
+                entry.loaded_at = None
+
+    def status(self):
+        """Load state and timing for every registered model."""
+        return {
+            entry.name: {
+                "state": entry.state,
+                "load_seconds": entry.load_seconds,
+                "loaded_at": entry.loaded_at,
+                "error": entry.error,
+            }
+            for entry in self._entries.values()
+        }
+
+    def _load(self, entry):
+        entry.state = LOADING
+        entry.error = None
+        started = time.perf_counter()
+        try:
+            entry.model = entry.loader()
+        except Exception as e:
+            entry.state = FAILED
+            entry.error = f"{type(e).__name__}: {e}"
+            raise
+
+        entry.load_seconds = round(time.perf_counter() - started, 3)
+        entry.loaded_at = time.time()
+        entry.state = LOADED
+
+
+# ---------------------------
+# Process-wide registry
+# ---------------------------
+registry = ModelRegistry()
+registry.register("clip", load_clip)
+# TFLite interpreters own native thread pools: never shared across a fork
+registry.register("classifier", load_classifier, fork_safe=False)
+registry.register("gate", load_gate)
+
@@ -0,0 +1,78 @@
+# ml/tests/test_batching.py
+
+import threading
+from django.test import SimpleTestCase
+from ml.batching import MicroBatcher
+
+
+class MicroBatcherTest(SimpleTestCase):
+    """
+    Tests the micro-batching scheduler without any models:
+    - concurrent submits are grouped into one batch
+    - every caller gets its own result back
+    - errors reach every caller in the failed batch
+    """
+
+    def test_concurrent_items_share_a_batch(self):
+        """Items submitted together are run as one batch, results in order"""
+        seen_batches = []
+
+        def double(items):
+            seen_batches.append(list(items))
+            return [item * 2 for item in items]
+
+        # Long wait window so all four land in the same batch
+        batcher = MicroBatcher(double, max_batch_size=4, max_wait_ms=500)
+        futures = [batcher.submit(i) for i in range(4)]
+
+        self.assertEqual([f.result(timeout=5) for f in futures], [0, 2, 4, 6])
+        self.assertEqual(seen_batches, [[0, 1, 2, 3]])
+
+        stats = batcher.stats()
+        self.assertEqual(stats["batches"], 1)
+        self.assertEqual(stats["items"], 4)
+        self.assertEqual(stats["largest_batch"], 4)
+
+    def test_batch_never_exceeds_max_size(self):
+        """A full batch is flushed immediately and the rest go to the next one"""
+        sizes = []
+
+        def identity(items):
+            sizes.append(len(items))
+            return items
+
+        batcher = MicroBatcher(identity, max_batch_size=2, max_wait_ms=200)
+        futures = [batcher.submit(i) for i in range(5)]
+
+        self.assertEqual([f.result(timeout=5) for f in futures], [0, 1, 2, 3, 4])
+        self.assertTrue(all(size <= 2 for size in sizes))
+        self.assertEqual(sum(sizes), 5)
+
+    def test_callers_from_many_threads_get_their_own_result(self):
+        """Each thread blocks on infer() and receives the result for its input"""
+        batcher = MicroBatcher(lambda items: [item + 100 for item in items],
+                               max_batch_size=8, max_wait_ms=20)
+        results = {}
+
+        def call(i):
+            results[i] = batcher.infer(i, timeout=5)
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(16)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(results, {i: i + 100 for i in range(16)})
+
+    def test_batch_error_is_raised_to_every_caller(self):
+        """A failing batch_fn surfaces the exception on each Future"""
+        def fail(items):
+            raise ValueError("model crashed")
+
+        batcher = MicroBatcher(fail, max_batch_size=2, max_wait_ms=200)
+        futures = [batcher.submit(i) for i in range(2)]
+
+        for future in futures:
+            with self.assertRaises(ValueError):
+                future.result(timeout=5)
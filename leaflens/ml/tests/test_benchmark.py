@@ -0,0 +1,138 @@
+# ml/tests/test_benchmark.py
+
+import io
+import os
+import shutil
+import tempfile
+from unittest.mock import MagicMock, patch
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+import numpy as np
+from PIL import Image
+from ml.benchmark import agreement, labelled_images, latency_summary
+
+
+class FakeInterpreter:
+    """
+    Stand-in for a TFLite interpreter: class scores are the mean R, G, B of the
+    input plus a constant, with optional uint8 input/output quantization.
+    """
+
+    def __init__(self, quantized=False):
+        self.quantized = quantized
+        self.shape = np.array([1, 224, 224, 3])
+        self.input = self.output = None
+
+    def get_input_details(self):
+        if self.quantized:
+            return [{"index": 0, "shape": self.shape, "dtype": np.uint8, "quantization": (1 / 255.0, 0)}]
+        return [{"index": 0, "shape": self.shape, "dtype": np.float32, "quantization": (0.0, 0)}]
+
+    def get_output_details(self):
+        if self.quantized:
+            return [{"index": 1, "dtype": np.uint8, "quantization": (1 / 256.0, 0)}]
+        return [{"index": 1, "dtype": np.float32, "quantization": (0.0, 0)}]
+
+    def resize_tensor_input(self, index, shape):
+        self.shape = np.array(shape)
+
+    def allocate_tensors(self):
+        pass
+
+    def set_tensor(self, index, value):
+        self.input = value
+
+    def invoke(self):
+        pixels = self.input.astype(np.float32) / 255.0 if self.quantized else self.input
+        means = pixels.mean(axis=(1, 2))
+        scores = np.concatenate([means, np.full((len(means), 1), 0.2, dtype=np.float32)], axis=1)
+        scores /= scores.sum(axis=1, keepdims=True)
+        self.output = np.round(scores * 256).clip(0, 255).astype(np.uint8) if self.quantized else scores
+
+    def get_tensor(self, index):
+        return self.output
+
+
+class BenchmarkHelpersTest(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        for label, name in [("maize", "a.jpg"), ("maize", "b.png"), ("not_maize", "c.jpg"), (None, "d.jpg")]:
+            folder = os.path.join(self.directory, label) if label else self.directory
+            os.makedirs(folder, exist_ok=True)
+            Image.new("RGB", (8, 8)).save(os.path.join(folder, name))
+        open(os.path.join(self.directory, "notes.txt"), "w").close()
+
+    def test_labels_come_from_subdirectories(self):
+        found = {os.path.basename(path): label for path, label in labelled_images(self.directory)}
+        self.assertEqual(found, {"a.jpg": "maize", "b.png": "maize", "c.jpg": "not_maize", "d.jpg": None})
+
+    def test_latency_summary_and_agreement(self):
+        summary = latency_summary([0.010, 0.020, 0.030, 0.040])
+        self.assertAlmostEqual(summary["mean_ms"], 25.0)
+        self.assertAlmostEqual(summary["p50_ms"], 20.0)
+        self.assertAlmostEqual(summary["p95_ms"], 40.0)
+
+        self.assertEqual(agreement([True, False, True, True], [True, False, False, True]), 0.75)
+
+    def run_benchmark(self, similarities, **options):
+        """benchmark_clip with fake models returning fixed similarities per precision"""
+        def fake_load_clip(precision):
+            prefilter = MagicMock()
+            prefilter.precision = precision
+            return prefilter
+
+        def fake_similarity(tensors, prefilter):
+            fake_similarity.calls[prefilter.precision] = fake_similarity.calls.get(prefilter.precision, -1) + 1
+            index = max(fake_similarity.calls[prefilter.precision] - 1, 0)  # first call is the warmup
+            return [similarities[prefilter.precision][index]]
+        fake_similarity.calls = {}
+
+        out = io.StringIO()
+        with patch("ml.management.commands.benchmark_clip.load_clip", side_effect=fake_load_clip), \
+                patch("ml.management.commands.benchmark_clip.clip_similarity_batch", side_effect=fake_similarity):
+            call_command("benchmark_clip", self.directory, stdout=out, **options)
+        return out.getvalue()
+
+    def test_passes_when_decisions_agree(self):
+        output = self.run_benchmark(
+            {"fp32": [0.35, 0.31, 0.20, 0.40], "int8": [0.34, 0.30, 0.21, 0.41]},
+            precisions=["int8"],
+        )
+        self.assertIn("int8", output)
+        self.assertIn("safe to set ML_CLIP_PRECISION", output)
+
+    def test_fails_below_the_agreement_bar(self):
+        with self.assertRaisesRegex(CommandError, "bf16"):
+            self.run_benchmark(
+                {"fp32": [0.35, 0.30, 0.20, 0.40], "bf16": [0.35, 0.28, 0.20, 0.40]},  # b.png flips
+                precisions=["bf16"], min_agreement=0.99,
+            )
+
+
+class ClassifierBenchmarkTest(SimpleTestCase):
+    """benchmark_classifier feeds every variant the same arrays, quantized as each model expects"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        for label, color in [("Blight", (250, 10, 10)), ("Common Rust", (10, 250, 10)),
+                             ("Gray Leaf Spot", (10, 10, 250)), ("Healthy", (40, 40, 40))]:
+            os.makedirs(os.path.join(self.directory, label))
+            Image.new("RGB", (32, 32), color=color).save(os.path.join(self.directory, label, "leaf.png"))
+
+    def test_reports_agreement_and_recommends_a_variant(self):
+        out = io.StringIO()
+        with patch("ml.management.commands.benchmark_classifier.os.path.exists", return_value=True), \
+                patch("ml.management.commands.benchmark_classifier.classifier_model_content",
+                      side_effect=lambda path: path), \
+                patch("ml.management.commands.benchmark_classifier.make_interpreter",
+                      side_effect=lambda path, num_threads=None: FakeInterpreter(quantized="int8" in path)):
+            call_command("benchmark_classifier", self.directory, variants=["int8"], batch_size=3, stdout=out)
+
+        lines = {line.split()[0]: line.split() for line in out.getvalue().splitlines() if line.strip()}
+        self.assertEqual(lines["float32"][4:6], ["1.0000", "1.000"])  # agreement, accuracy
+        self.assertEqual(lines["int8"][4:6], ["1.0000", "1.000"])
+        self.assertIn("ML_TFLITE_VARIANT=", out.getvalue())
@@ -0,0 +1,75 @@
+# ml/tests/test_forking.py
+
+import os
+import tempfile
+from unittest.mock import MagicMock, patch
+from django.test import SimpleTestCase, override_settings
+from ml import forking, loaders, utils, warmup
+from ml.batching import MicroBatcher
+from ml.registry import ModelRegistry
+
+
+class ForkPreloadTest(SimpleTestCase):
+    """
+    A preloading master shares fork-safe models with its workers;
+    interpreters, batcher threads and locks are recreated in each child.
+    """
+
+    def test_child_keeps_fork_safe_models_only(self):
+        models = ModelRegistry()
+        models.register("weights", lambda: "shared weights")
+        models.register("interpreters", lambda: object(), fork_safe=False)
+        parent_interpreters = models.get("interpreters")
+        models.get("weights")
+
+        models.after_fork()
+
+        self.assertEqual(models.status()["weights"]["state"], "loaded")
+        self.assertEqual(models.status()["interpreters"]["state"], "unloaded")
+        self.assertIsNot(models.get("interpreters"), parent_interpreters)
+
+    def test_batcher_restarts_after_fork(self):
+        batcher = MicroBatcher(lambda items: [item * 2 for item in items], max_wait_ms=1)
+        self.assertEqual(batcher.infer(2, timeout=2), 4)
+
+        batcher.after_fork()
+
+        self.assertEqual(batcher.stats()["items"], 0)
+        self.assertEqual(batcher.infer(3, timeout=2), 6)
+
+    def test_model_bytes_are_read_once(self):
+        with tempfile.NamedTemporaryFile(suffix=".tflite", delete=False) as f:
+            f.write(b"flatbuffer")
+        self.addCleanup(os.unlink, f.name)
+
+        with patch("ml.loaders.classifier_model_path", return_value=f.name):
+            first = loaders.classifier_model_content()
+            self.assertIs(loaders.classifier_model_content(), first)
+        loaders._model_content.pop(f.name)
+
+        self.assertEqual(first, b"flatbuffer")
+
+    @override_settings(ML_PRELOAD_BEFORE_FORK=True, ML_PRELOAD_MODELS=True, ML_INFERENCE_SOCKET='')
+    @patch("ml.forking.preload_for_fork")
+    @patch("ml.warmup.warmup")
+    def test_master_preloads_without_warming_up(self, mock_warmup, mock_preload):
+        warmup.warmup_on_startup()
+        self.addCleanup(warmup._update, status=warmup.COLD)
+
+        mock_preload.assert_called_once()
+        mock_warmup.assert_not_called()
+        self.assertEqual(warmup.readiness()[1]["status"], warmup.PRELOADED)
+
+    @override_settings(ML_WARMUP_IN_BACKGROUND=False)
+    @patch("ml.warmup.warmup")
+    def test_child_resets_state_and_warms_up(self, mock_warmup):
+        fake_registry = MagicMock()
+        with patch("ml.registry.registry", fake_registry), \
+                patch.object(utils.clip_batcher, "after_fork") as clip_reset, \
+                patch.object(utils.tflite_batcher, "after_fork") as tflite_reset:
+            forking.after_fork_in_child()
+
+        fake_registry.after_fork.assert_called_once()
+        clip_reset.assert_called_once()
+        tflite_reset.assert_called_once()
+        mock_warmup.assert_called_once()
@@ -0,0 +1,107 @@
+# ml/tests/test_gate.py
+
+import os
+import tempfile
+import numpy as np
+from unittest.mock import MagicMock, patch
+from django.test import SimpleTestCase, override_settings
+from ml import utils
+from ml.gate import CascadeStats, MaizeGate, fit_gate
+
+
+def confidence_gate():
+    """Hand-built gate: confident maize when the top class is >= ~0.9, not maize when it is <= ~0.5"""
+    weights = [0, 0, 0, 0, 20, 0]  # only the top-probability feature counts
+    return MaizeGate(weights, -14, mean=[0] * 6, std=[1] * 6, accept_above=0.98, reject_below=0.02)
+
+
+def scores(top):
+    rest = (1 - top) / 3
+    return {"Blight": top, "Common Rust": rest, "Gray Leaf Spot": rest, "Healthy": rest}
+
+
+class MaizeGateTest(SimpleTestCase):
+    """Distilled CLIP decisions on classifier output, with an uncertain band left to CLIP"""
+
+    def test_decides_confident_cases_only(self):
+        gate = confidence_gate()
+        self.assertTrue(gate.decide([0.95, 0.03, 0.01, 0.01]))
+        self.assertFalse(gate.decide([0.3, 0.3, 0.2, 0.2]))
+        self.assertIsNone(gate.decide([0.7, 0.1, 0.1, 0.1]))
+
+    def test_fit_reaches_the_target_on_held_out_data(self):
+        rng = np.random.default_rng(0)
+        probabilities, labels = [], []
+        for _ in range(400):
+            maize = rng.random() < 0.6
+            # CLIP-accepted photos give peaked distributions, others flat-ish ones, with overlap
+            top = rng.uniform(0.55, 1.0) if maize else rng.uniform(0.25, 0.75)
+            rest = rng.dirichlet([1, 1, 1]) * (1 - top)
+            probabilities.append([top, *rest])
+            labels.append(maize)
+
+        gate, report = fit_gate(probabilities, labels, target_agreement=0.98)
+
+        self.assertGreater(report["hit_rate"], 0.3)
+        self.assertGreaterEqual(report["agreement"], 0.98)
+        self.assertIsNone(gate.decide([0.65, 0.15, 0.1, 0.1]))  # inside the overlap
+
+    def test_fit_needs_both_decisions(self):
+        with self.assertRaises(ValueError):
+            fit_gate([[0.9, 0.05, 0.03, 0.02]] * 10, [True] * 10)
+
+    def test_save_and_load(self):
+        gate = confidence_gate()
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+            path = f.name
+        self.addCleanup(os.unlink, path)
+
+        gate.save(path)
+        loaded = MaizeGate.load(path)
+
+        self.assertEqual(loaded.identity, gate.identity)
+        self.assertEqual(loaded.decide([0.95, 0.03, 0.01, 0.01]), True)
+
+    def test_stats(self):
+        stats = CascadeStats()
+        for decision in (True, True, False, None):
+            stats.record_decision(decision)
+        stats.record_audit(True, True)
+        stats.record_audit(True, False)
+
+        result = stats.stats()
+        self.assertEqual(result["hit_rate"], 0.75)
+        self.assertEqual(result["disagreement_rate"], 0.5)
+        self.assertEqual(result["disagree_gate_maize"], 1)
+
+
+class CascadePrefilterTest(SimpleTestCase):
+    """Only uncertain (and audited) images reach CLIP"""
+
+    def setUp(self):
+        fake_registry = MagicMock()
+        fake_registry.get.return_value = confidence_gate()
+        registry_patch = patch("ml.utils.registry", fake_registry)
+        registry_patch.start()
+        self.addCleanup(registry_patch.stop)
+        utils.cascade_stats.reset()
+
+    @override_settings(ML_GATE_AUDIT_RATE=0.0)
+    @patch("ml.utils.is_maize_clip_batch", return_value=[False, True])
+    @patch("ml.utils.is_maize_clip")
+    def test_uncertain_images_fall_through(self, mock_clip, mock_clip_batch):
+        images = ["confident", "reject", "unsure-1", "unsure-2"]
+        decisions = utils.is_maize_cascade(images, [scores(0.95), scores(0.3), scores(0.7), scores(0.72)])
+
+        self.assertEqual(decisions, [True, False, False, True])
+        mock_clip.assert_not_called()
+        mock_clip_batch.assert_called_once_with(["unsure-1", "unsure-2"], utils.CLIP_THRESHOLD)
+        self.assertEqual(utils.cascade_stats.stats()["hit_rate"], 0.5)
+
+    @override_settings(ML_GATE_AUDIT_RATE=1.0)
+    @patch("ml.utils.is_maize_clip", return_value=False)
+    def test_audits_record_disagreement_without_changing_the_decision(self, mock_clip):
+        decisions = utils.is_maize_cascade(["photo"], [scores(0.95)])
+
+        self.assertEqual(decisions, [True])
+        self.assertEqual(utils.cascade_stats.stats()["disagree_gate_maize"], 1)
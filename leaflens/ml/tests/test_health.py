@@ -0,0 +1,66 @@
+# ml/tests/test_health.py
+
+from unittest.mock import MagicMock, patch
+from rest_framework import status
+from rest_framework.test import APITestCase
+from ml import warmup
+
+
+class ReadinessEndpointTest(APITestCase):
+    """
+    /api/health/ready answers 503 until warmup has run both model stages,
+    then 200 with load state, warmup latency and model file identity.
+    """
+
+    def setUp(self):
+        # Every test starts from a cold process
+        warmup._update(status=warmup.COLD, started_at=None, finished_at=None,
+                       seconds=None, stages_ms={}, error=None)
+        self.addCleanup(warmup._update, status=warmup.COLD)
+
+    def fake_registry(self, pool_size=2):
+        registry = MagicMock()
+        registry.get.return_value.size = pool_size
+        registry.status.return_value = {"clip": {"state": "loaded"}, "classifier": {"state": "loaded"}}
+        return registry
+
+    def test_not_ready_before_warmup(self):
+        response = self.client.get("/api/health/ready")
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(response.data["ready"])
+        self.assertEqual(response.data["status"], "cold")
+        self.assertIn("classifier", response.data["model_files"])
+
+    @patch("ml.utils.tflite_probabilities_batch")
+    @patch("ml.utils.mobilenet_input")
+    @patch("ml.utils.clip_similarity_batch")
+    @patch("ml.utils.clip_input")
+    def test_ready_after_warmup(self, mock_clip_input, mock_clip, mock_mobilenet_input, mock_tflite):
+        with patch("ml.warmup.registry", self.fake_registry(pool_size=2)):
+            self.assertTrue(warmup.warmup())
+
+        # Both stages ran; every pooled interpreter got one invoke
+        mock_clip.assert_called_once()
+        self.assertEqual(mock_tflite.call_count, 2)
+
+        response = self.client.get("/api/health/ready/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["ready"])
+        self.assertIn("clip", response.data["warmup"]["stages_ms"])
+        self.assertIn("classifier", response.data["warmup"]["stages_ms"])
+
+    @patch("ml.utils.clip_input")
+    def test_failed_warmup_stays_unready(self, mock_clip_input):
+        registry = self.fake_registry()
+        registry.load_all.side_effect = FileNotFoundError("mobilenetv2_v1_44_0.996.tflite")
+
+        with patch("ml.warmup.registry", registry):
+            self.assertFalse(warmup.warmup())
+
+        response = self.client.get("/api/health/ready")
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.data["status"], "failed")
+        self.assertIn("mobilenetv2", response.data["warmup"]["error"])
@@ -0,0 +1,161 @@
+# ml/tests/test_inference_server.py
+
+import os
+import shutil
+import tempfile
+import threading
+import numpy as np
+from unittest.mock import patch
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+from ml import utils, warmup
+from ml.inference_server import (
+    InferenceClient, InferenceServer, InferenceServerUnavailable, RemoteInferenceError, split_pixels,
+)
+from ml.preprocessing import PreprocessedImage
+
+AUTHKEY = b"test-key"
+
+
+class InferenceServerTest(SimpleTestCase):
+    """
+    Web workers forward both model stages to one server process over a Unix
+    socket; pixel arrays travel through shared memory.
+    """
+
+    def setUp(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir, ignore_errors=True)
+        self.address = os.path.join(tmp_dir, "inference.sock")
+
+        self.received = []
+
+        def clip(pixels):
+            self.received.append(pixels)
+            return float(pixels.mean()) / 255.0
+
+        def classify(img_array):
+            self.received.append(img_array)
+            return [0.1, 0.2, 0.6, 0.1]
+
+        def clip_batch(flat, shapes):
+            images = split_pixels(flat, shapes)
+            self.received.append(images)
+            return [float(pixels.mean()) / 255.0 for pixels in images]
+
+        def classify_batch(img_arrays):
+            self.received.append(img_arrays)
+            return [[0.1, 0.2, 0.6, 0.1]] * len(img_arrays)
+
+        def fail(_):
+            raise ValueError("bad input")
+
+        self.server = InferenceServer(self.address, AUTHKEY, handlers={
+            "clip": clip, "classify": classify, "clip_batch": clip_batch, "classify_batch": classify_batch,
+            "fail": fail, "ready": lambda _: {"ready": True},
+        })
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.server.started.wait(5)
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(self.server.shutdown)
+
+        self.client = InferenceClient(self.address, AUTHKEY, timeout=5)
+
+    def test_arrays_arrive_intact(self):
+        # Already at CLIP's input size: sent as is
+        pixels = np.random.default_rng(0).integers(0, 256, size=(224, 300, 3), dtype=np.uint8)
+        similarity = self.client.clip_similarity(PreprocessedImage(Image.fromarray(pixels, "RGB")))
+
+        np.testing.assert_array_equal(self.received[0], pixels)
+        self.assertAlmostEqual(similarity, pixels.mean() / 255.0, places=6)
+
+        img_array = np.random.default_rng(1).random((1, 224, 224, 3), dtype=np.float32)
+        probabilities = self.client.tflite_probabilities(img_array)
+
+        np.testing.assert_array_equal(self.received[1], img_array)
+        self.assertEqual(self.received[1].dtype, np.float32)
+        np.testing.assert_allclose(probabilities, [0.1, 0.2, 0.6, 0.1])
+
+    def test_segment_grows_for_larger_images(self):
+        small = np.zeros((10, 10, 3), dtype=np.uint8)
+        large = np.full((1200, 1000, 3), 255, dtype=np.uint8)  # > 1 MiB
+
+        self.client.call("clip", small)
+        self.client.call("clip", large)
+        self.client.call("clip", small)
+
+        self.assertEqual([a.shape for a in self.received], [small.shape, large.shape, small.shape])
+        self.assertEqual(int(self.received[1].min()), 255)
+
+    def test_concurrent_threads_get_their_own_results(self):
+        results = {}
+
+        def worker(value):
+            pixels = np.full((32, 32, 3), value, dtype=np.uint8)
+            results[value] = [self.client.call("clip", pixels) for _ in range(5)]
+
+        threads = [threading.Thread(target=worker, args=(value,)) for value in (0, 51, 102, 204)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+        for value, similarities in results.items():
+            self.assertEqual(similarities, [value / 255.0] * 5)
+
+    def test_model_errors_are_reported(self):
+        with self.assertRaises(RemoteInferenceError):
+            self.client.call("fail", np.zeros((2, 2), dtype=np.uint8))
+
+        # The connection is still usable afterwards
+        self.assertEqual(self.client.readiness(), {"ready": True})
+
+    def test_unreachable_server(self):
+        client = InferenceClient(self.address + ".missing", AUTHKEY, timeout=1)
+        with self.assertRaises(InferenceServerUnavailable):
+            client.readiness()
+
+    def test_web_helpers_forward_without_loading_models(self):
+        image = PreprocessedImage(Image.new("RGB", (600, 400), color=(255, 255, 255)))
+
+        with override_settings(ML_INFERENCE_SOCKET=self.address), \
+                patch("ml.inference_server.server_authkey", return_value=AUTHKEY), \
+                patch("ml.utils.registry") as mock_registry:
+            self.assertTrue(utils.is_maize_clip(image))
+            predicted_class, scores = utils.run_tflite_inference(image)
+
+        mock_registry.get.assert_not_called()
+        self.assertEqual(predicted_class, "Gray Leaf Spot")
+        # Presized to CLIP's input size before leaving the worker
+        self.assertEqual(self.received[0].shape, (224, 336, 3))
+        self.assertEqual(self.received[1].shape, (1, 224, 224, 3))
+
+    @override_settings(ML_BATCH_MAX_SIZE=2)
+    def test_batch_helpers_forward_without_loading_models(self):
+        # Batch endpoint / worker path: one request per chunk, no model in the web worker
+        images = [PreprocessedImage(Image.new("RGB", (300, 200), color=(value, value, value)))
+                  for value in (255, 0, 255)]
+
+        with override_settings(ML_INFERENCE_SOCKET=self.address), \
+                patch("ml.inference_server.server_authkey", return_value=AUTHKEY), \
+                patch("ml.utils.registry") as mock_registry:
+            decisions = utils.is_maize_clip_batch(images)
+            results = utils.run_tflite_inference_batch(images)
+
+        mock_registry.get.assert_not_called()
+        self.assertEqual([bool(decision) for decision in decisions], [True, False, True])
+        # Presized to CLIP's input size before leaving the worker
+        self.assertEqual([pixels.shape for pixels in self.received[0]], [(224, 336, 3), (224, 336, 3)])
+        self.assertEqual([array.shape for array in self.received[2:]], [(2, 224, 224, 3), (1, 224, 224, 3)])
+        self.assertEqual([predicted_class for predicted_class, _ in results], ["Gray Leaf Spot"] * 3)
+
+    def test_readiness_comes_from_the_server(self):
+        with override_settings(ML_INFERENCE_SOCKET=self.address), \
+                patch("ml.inference_server.server_authkey", return_value=AUTHKEY):
+            warmup.warmup_on_startup()
+            self.addCleanup(warmup._update, status=warmup.COLD)
+            ready, payload = warmup.readiness()
+
+        self.assertTrue(ready)
+        self.assertEqual(payload["status"], warmup.REMOTE)
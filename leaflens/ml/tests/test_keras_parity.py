@@ -0,0 +1,64 @@
+# ml/tests/test_keras_parity.py
+
+import numpy as np
+from django.conf import settings
+from django.test import SimpleTestCase
+from ml.preprocessing import PreprocessedImage, mobilenet_array
+
+try:
+    from tensorflow.keras.preprocessing.image import img_to_array, load_img
+except ImportError:
+    try:
+        from keras.utils import img_to_array, load_img
+    except ImportError:
+        load_img = img_to_array = None
+
+
+SAMPLE_DIR = settings.BASE_DIR / "media" / "predictions"
+SAMPLE_SUFFIXES = {".jpg", ".jpeg", ".jfif", ".png"}
+
+
+def keras_reference(path):
+    """The exact preprocessing run_tflite_inference used with Keras"""
+    img = load_img(path, target_size=(224, 224))
+    img_array = img_to_array(img) / 255.0
+    return np.expand_dims(img_array, axis=0).astype(np.float32)
+
+
+class KerasParityTest(SimpleTestCase):
+    """
+    The Pillow/NumPy MobileNet preprocessing must be bit-identical
+    to the Keras pipeline the model was trained with, on real uploads.
+    """
+
+    def setUp(self):
+        if load_img is None:
+            self.skipTest("Keras is not installed")
+
+        self.samples = sorted(
+            path for path in SAMPLE_DIR.iterdir()
+            if path.suffix.lower() in SAMPLE_SUFFIXES
+        )
+        if not self.samples:
+            self.skipTest(f"No sample images in {SAMPLE_DIR}")
+
+    def test_bit_identical_to_keras(self):
+        for path in self.samples:
+            with self.subTest(image=path.name):
+                ours = mobilenet_array(PreprocessedImage.from_path(path).image)
+                reference = keras_reference(path)
+
+                self.assertEqual(ours.dtype, reference.dtype)
+                self.assertEqual(ours.shape, reference.shape)
+                self.assertTrue(np.array_equal(ours, reference))
+
+    def test_preallocated_batch_rows_match(self):
+        """Writing into rows of a shared batch buffer gives the same values"""
+        batch = np.zeros((len(self.samples), 224, 224, 3), dtype=np.float32)
+
+        for i, path in enumerate(self.samples):
+            mobilenet_array(PreprocessedImage.from_path(path).image, out=batch[i])
+
+        for i, path in enumerate(self.samples):
+            with self.subTest(image=path.name):
+                self.assertTrue(np.array_equal(batch[i:i + 1], keras_reference(path)))
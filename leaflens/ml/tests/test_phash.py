@@ -0,0 +1,54 @@
+# ml/tests/test_phash.py
+
+import io
+import numpy as np
+from django.test import SimpleTestCase
+from PIL import Image
+from ml.phash import (
+    dhash, from_signed64, hamming_distance, hash_bands, is_informative, to_signed64,
+)
+
+
+def leaf_like_image(seed=1, size=(320, 240)):
+    """Smooth random structure so the hash has real gradients"""
+    coarse = np.random.default_rng(seed).integers(0, 256, size=(6, 8, 3), dtype=np.uint8)
+    return Image.fromarray(coarse, "RGB").resize(size, Image.BICUBIC)
+
+
+def recompress(image, quality=40, scale=0.5):
+    """What a messaging app does to a photo"""
+    small = image.resize((int(image.width * scale), int(image.height * scale)), Image.BILINEAR)
+    buffer = io.BytesIO()
+    small.save(buffer, format="JPEG", quality=quality)
+    return Image.open(io.BytesIO(buffer.getvalue())).convert("RGB")
+
+
+class PerceptualHashTest(SimpleTestCase):
+    """dHash survives recompression/resizing and separates different photos"""
+
+    def test_recompressed_copy_is_near(self):
+        original = leaf_like_image()
+        self.assertLessEqual(hamming_distance(dhash(original), dhash(recompress(original))), 3)
+
+    def test_different_photos_are_far(self):
+        self.assertGreater(hamming_distance(dhash(leaf_like_image(1)), dhash(leaf_like_image(2))), 10)
+
+    def test_flat_images_are_not_informative(self):
+        self.assertFalse(is_informative(dhash(Image.new("RGB", (50, 50), color=(0, 0, 0)))))
+        self.assertTrue(is_informative(dhash(leaf_like_image())))
+
+    def test_bands_and_signed_storage_round_trip(self):
+        value = (1 << 64) - 12345
+        self.assertEqual(from_signed64(to_signed64(value)), value)
+        self.assertTrue(-(1 << 63) <= to_signed64(value) < (1 << 63))
+
+        bands = hash_bands(value)
+        self.assertEqual(len(bands), 4)
+        self.assertEqual(sum(band << (16 * i) for i, band in enumerate(bands)), value)
+
+    def test_close_hashes_share_a_band(self):
+        """Pigeonhole guarantee behind the indexed lookup"""
+        value = dhash(leaf_like_image())
+        flipped = value ^ (1 << 3) ^ (1 << 20) ^ (1 << 40)  # distance 3, three bands touched
+        shared = [a == b for a, b in zip(hash_bands(value), hash_bands(flipped))]
+        self.assertTrue(any(shared))
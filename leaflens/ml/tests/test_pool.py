@@ -0,0 +1,73 @@
+# ml/tests/test_pool.py
+
+import threading
+import time
+from django.test import SimpleTestCase
+from ml.pool import InterpreterPool
+
+
+class FakeInterpreter:
+    """Stands in for a TFLite interpreter; counts how many run at once"""
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def invoke(self):
+        with FakeInterpreter.lock:
+            FakeInterpreter.active += 1
+            FakeInterpreter.peak = max(FakeInterpreter.peak, FakeInterpreter.active)
+        time.sleep(0.01)
+        with FakeInterpreter.lock:
+            FakeInterpreter.active -= 1
+
+
+class InterpreterPoolTest(SimpleTestCase):
+    """Checkout semantics and utilization metrics of the interpreter pool"""
+
+    def setUp(self):
+        FakeInterpreter.active = 0
+        FakeInterpreter.peak = 0
+
+    def test_interpreters_are_preallocated(self):
+        created = []
+        InterpreterPool(lambda: created.append(1) or FakeInterpreter(), size=3)
+        self.assertEqual(len(created), 3)
+
+    def test_never_more_checkouts_than_pool_size(self):
+        """Threads beyond the pool size wait instead of sharing an interpreter"""
+        pool = InterpreterPool(FakeInterpreter, size=2)
+
+        def work():
+            with pool.checkout() as interpreter:
+                interpreter.invoke()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertLessEqual(FakeInterpreter.peak, 2)
+
+        stats = pool.stats()
+        self.assertEqual(stats["checkouts"], 8)
+        self.assertEqual(stats["in_use"], 0)
+        self.assertEqual(sum(i["uses"] for i in stats["interpreters"]), 8)
+        self.assertGreater(stats["utilization"], 0)
+
+    def test_interpreter_is_returned_after_error(self):
+        pool = InterpreterPool(FakeInterpreter, size=1)
+
+        with self.assertRaises(RuntimeError):
+            with pool.checkout():
+                raise RuntimeError("invoke failed")
+
+        with pool.checkout(timeout=1) as interpreter:
+            self.assertIsInstance(interpreter, FakeInterpreter)
+
+    def test_checkout_timeout(self):
+        pool = InterpreterPool(FakeInterpreter, size=1)
+        with pool.checkout():
+            with self.assertRaises(TimeoutError):
+                with pool.checkout(timeout=0.01):
+                    pass
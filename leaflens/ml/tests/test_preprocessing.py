@@ -0,0 +1,85 @@
+# ml/tests/test_preprocessing.py
+
+import io
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+from ml.preprocessing import (
+    ImageTooLarge, PreprocessedImage, as_preprocessed, decode_image, dequantize_output, quantize_input,
+)
+
+
+def encode(image, format="PNG"):
+    buffer = io.BytesIO()
+    image.save(buffer, format=format)
+    return buffer.getvalue()
+
+
+class PreprocessingTest(SimpleTestCase):
+    """Decode-once preprocessing shared by both model stages"""
+
+    def test_decode_converts_to_rgb(self):
+        """Grayscale / RGBA uploads come out as RGB like keras load_img"""
+        for mode in ("L", "RGBA", "P"):
+            image = decode_image(encode(Image.new(mode, (8, 6))))
+            self.assertEqual(image.mode, "RGB")
+            self.assertEqual(image.size, (8, 6))
+
+    def test_decode_rejects_truncated_file(self):
+        data = encode(Image.new("RGB", (64, 64), color=(0, 128, 0)), format="JPEG")
+        with self.assertRaises(OSError):
+            decode_image(data[: len(data) // 2])
+
+    @override_settings(PREDICTION_MAX_MEGAPIXELS=1)
+    def test_decode_rejects_too_many_pixels(self):
+        with self.assertRaises(ImageTooLarge):
+            decode_image(encode(Image.new("RGB", (1200, 1000))))
+
+    @override_settings(ML_DRAFT_DECODE_MIN_SIDE=200)
+    def test_draft_decode_keeps_the_minimum_side(self):
+        """JPEGs are decoded downscaled, never below the configured shorter side"""
+        image = decode_image(encode(Image.new("RGB", (1600, 1200), color=(0, 128, 0)), format="JPEG"))
+        self.assertEqual(image.size, (400, 300))
+        self.assertEqual(image.mode, "RGB")
+
+        # Other formats (and images already small enough) decode at full size
+        self.assertEqual(decode_image(encode(Image.new("RGB", (1600, 1200)))).size, (1600, 1200))
+
+    def test_model_inputs_are_built_once(self):
+        """cached() runs the builder only on first use"""
+        prepared = PreprocessedImage.from_bytes(encode(Image.new("RGB", (4, 4))))
+        calls = []
+
+        def build(pil):
+            calls.append(pil)
+            return "tensor"
+
+        self.assertEqual(prepared.cached("clip", build), "tensor")
+        self.assertEqual(prepared.cached("clip", build), "tensor")
+        self.assertEqual(len(calls), 1)
+
+    def test_as_preprocessed_passes_through(self):
+        prepared = PreprocessedImage(Image.new("RGB", (2, 2)))
+        self.assertIs(as_preprocessed(prepared), prepared)
+        self.assertEqual(as_preprocessed(Image.new("L", (2, 2))).image.mode, "RGB")
+
+    def test_inputs_follow_the_model_tensor(self):
+        """Float models get the array as is, quantized models their own scale / zero point"""
+        batch = np.array([[0.0, 0.6, 1.0]], dtype=np.float32)
+
+        as_float = quantize_input(batch, {"dtype": np.float32, "quantization": (0.0, 0)})
+        np.testing.assert_array_equal(as_float, batch)
+
+        as_uint8 = quantize_input(batch, {"dtype": np.uint8, "quantization": (1 / 255.0, 0)})
+        np.testing.assert_array_equal(as_uint8, [[0, 153, 255]])
+        self.assertEqual(as_uint8.dtype, np.uint8)
+
+        as_int8 = quantize_input(batch, {"dtype": np.int8, "quantization": (1 / 255.0, -128)})
+        np.testing.assert_array_equal(as_int8, [[-128, 25, 127]])
+
+    def test_outputs_are_dequantized(self):
+        output = np.array([[0, 64, 255]], dtype=np.uint8)
+        probabilities = dequantize_output(output, {"dtype": np.uint8, "quantization": (1 / 256.0, 0)})
+
+        np.testing.assert_allclose(probabilities, [[0.0, 0.25, 255 / 256.0]])
+        self.assertEqual(probabilities.dtype, np.float32)
@@ -0,0 +1,39 @@
+# ml/tests/test_prompts.py
+
+import tempfile
+import numpy as np
+from django.test import SimpleTestCase
+from ml.prompts import load_prompt_embeddings, prompt_cache_key
+
+
+class PromptEmbeddingsTest(SimpleTestCase):
+    """Prompt features are computed once, normalized and cached per model + prompts"""
+
+    def setUp(self):
+        self.calls = []
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+
+    def fake_encoder(self, prompts):
+        self.calls.append(list(prompts))
+        return np.arange(len(prompts) * 4, dtype=np.float32).reshape(len(prompts), 4) + 1
+
+    def test_features_are_normalized(self):
+        features = load_prompt_embeddings("ViT-B/32", ["maize leaf", "corn leaf"], self.fake_encoder)
+        self.assertEqual(features.shape, (2, 4))
+        np.testing.assert_allclose(np.linalg.norm(features, axis=-1), 1.0, rtol=1e-6)
+
+    def test_disk_cache_skips_encoder(self):
+        first = load_prompt_embeddings("ViT-B/32", ["maize leaf"], self.fake_encoder,
+                                       cache_dir=self.cache_dir.name)
+        second = load_prompt_embeddings("ViT-B/32", ["maize leaf"], self.fake_encoder,
+                                        cache_dir=self.cache_dir.name)
+
+        self.assertEqual(len(self.calls), 1)
+        np.testing.assert_array_equal(first, second)
+
+    def test_key_changes_with_model_and_prompts(self):
+        key = prompt_cache_key("ViT-B/32", ["maize leaf", "corn leaf"])
+        self.assertNotEqual(key, prompt_cache_key("ViT-B/16", ["maize leaf", "corn leaf"]))
+        self.assertNotEqual(key, prompt_cache_key("ViT-B/32", ["corn leaf", "maize leaf"]))
+        self.assertNotEqual(key, prompt_cache_key("ViT-B/32", ["maize leaf"]))
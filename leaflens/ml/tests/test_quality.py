@@ -0,0 +1,42 @@
+# ml/tests/test_quality.py
+
+import numpy as np
+from django.test import SimpleTestCase
+from PIL import Image, ImageFilter
+from ml.quality import assess_quality
+
+
+def leaf_photo(size=(1600, 1200), brightness=1.0):
+    """Green leaf-like texture with veins: sharp and well exposed by default"""
+    width, height = size
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.zeros((height, width, 3), dtype=np.float32)
+    pixels[..., 0], pixels[..., 1], pixels[..., 2] = 60, 120, 40
+    pixels += ((np.sin(x / 9.0 + y / 30.0) > 0.95) * 60)[..., None]
+    pixels += np.random.default_rng(0).normal(0, 12, (height, width, 1))
+    return Image.fromarray(np.clip(pixels * brightness, 0, 255).astype(np.uint8), "RGB")
+
+
+class QualityPrecheckTest(SimpleTestCase):
+    """Unusable photos are caught before any model runs, with a reason farmers can act on"""
+
+    def test_good_photo_passes(self):
+        self.assertIsNone(assess_quality(leaf_photo()))
+
+    def test_rejections(self):
+        cases = {
+            "too_small": leaf_photo(size=(100, 80)),
+            "too_dark": leaf_photo(brightness=0.1),
+            "overexposed": Image.new("RGB", (800, 600), color=(250, 250, 250)),
+            "blurry": leaf_photo().filter(ImageFilter.GaussianBlur(10)),
+        }
+        for reason, image in cases.items():
+            with self.subTest(reason=reason):
+                rejection = assess_quality(image)
+                self.assertEqual(rejection["reason"], reason)
+                self.assertTrue(rejection["message"])
+                self.assertIn("width", rejection["metrics"])
+
+    def test_mild_blur_is_tolerated(self):
+        """Phone photos are rarely tack sharp: only unusable blur is rejected"""
+        self.assertIsNone(assess_quality(leaf_photo().filter(ImageFilter.GaussianBlur(2))))
@@ -0,0 +1,71 @@
+# ml/tests/test_registry.py
+
+import threading
+from django.test import SimpleTestCase
+from ml.registry import ModelRegistry, registry
+
+
+class ModelRegistryTest(SimpleTestCase):
+    """Lazy loading, load state and load-once semantics"""
+
+    def test_loads_lazily_and_once(self):
+        calls = []
+        models = ModelRegistry()
+        models.register("fake", lambda: calls.append(1) or "model")
+
+        self.assertEqual(models.status()["fake"]["state"], "unloaded")
+        self.assertEqual(calls, [])
+
+        self.assertEqual(models.get("fake"), "model")
+        self.assertEqual(models.get("fake"), "model")
+        self.assertEqual(len(calls), 1)
+
+        status = models.status()["fake"]
+        self.assertEqual(status["state"], "loaded")
+        self.assertIsNotNone(status["load_seconds"])
+
+    def test_concurrent_first_use_loads_once(self):
+        calls = []
+        release = threading.Event()
+
+        def slow_loader():
+            calls.append(1)
+            release.wait(1)
+            return "model"
+
+        models = ModelRegistry()
+        models.register("fake", slow_loader)
+        threads = [threading.Thread(target=models.get, args=("fake",)) for _ in range(4)]
+        for t in threads:
+            t.start()
+        release.set()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+
+    def test_failed_load_is_reported_and_retried(self):
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise FileNotFoundError("model.tflite")
+            return "model"
+
+        models = ModelRegistry()
+        models.register("fake", flaky)
+
+        with self.assertRaises(FileNotFoundError):
+            models.get("fake")
+        self.assertEqual(models.status()["fake"]["state"], "failed")
+        self.assertIn("model.tflite", models.status()["fake"]["error"])
+
+        self.assertEqual(models.get("fake"), "model")
+
+    def test_importing_ml_utils_loads_nothing(self):
+        """Non-inference processes must not pay for torch/TensorFlow"""
+        import ml.utils  # noqa: F401
+
+        self.assertFalse(registry.is_loaded("clip"))
+        self.assertFalse(registry.is_loaded("classifier"))
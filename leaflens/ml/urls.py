@@ -0,0 +1,10 @@
+from django.urls import re_path
+from .views import MetricsView, ReadinessView
+
+# Define URL patterns
+urlpatterns = [
+    # ex: GET /api/health/ready (trailing slash optional: probes often don't follow redirects)
+    re_path(r'^health/ready/?$', ReadinessView.as_view(), name='health-ready'),
+    # ex: GET /api/health/metrics (staff only)
+    re_path(r'^health/metrics/?$', MetricsView.as_view(), name='health-metrics'),
+]
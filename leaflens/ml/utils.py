@@ -1,44 +1,19 @@
 """
 Django ML Engine
-Everything here is loaded ONCE at startup (fast inference)
+Models are loaded ONCE per process, lazily on first use (see ml/registry.py),
+so importing this module stays cheap for non-inference commands.
 """
+import random
+
 import numpy as np
-from PIL import Image
 from django.conf import settings
 
-# To skip ML loading during tests (and keep production behavior unchanged)
-# and Guard heavy ML imports
-if not getattr(settings, 'TESTING', False):
-      import torch
-      import clip
-      from tensorflow.lite.python.interpreter import Interpreter
-
-      # ---------------------------
-      # Device for CLIP
-      # ---------------------------
-      device = "cuda" if torch.cuda.is_available() else "cpu"
-
-      # ---------------------------
-      # TFLite model
-      # ---------------------------
-      TFLITE_PATH = str(settings.BASE_DIR / 'ml/models/mobilenetv2_v1_44_0.996.tflite')
-      classifier_interpreter = Interpreter(model_path=TFLITE_PATH)
-      classifier_interpreter.allocate_tensors()
-
-      # ---------------------------
-      # CLIP model
-      # ---------------------------
-      clip_model, clip_preprocess = clip.load("ViT-B/32", device=device)
-      maize_prompts = [
-          "maize leaf",
-          "maize plant leaf",
-          "corn leaf",
-          "maize crop leaf",
-          "closeup of maize leaf",
-          "maize disease leaf",
-          "healthy maize leaf"
-      ]
-      text_tokens = clip.tokenize(maize_prompts).to(device)
+from .batching import MicroBatcher
+from .gate import cascade_stats
+from .inference_server import InferenceServerUnavailable, inference_client, remote_inference_enabled
+from .preprocessing import as_preprocessed, dequantize_output, mobilenet_array, quantize_input
+from .loaders import CLIP_THRESHOLD
+from .registry import registry
 
 
 # ---------------------------
@@ -46,30 +21,200 @@ if not getattr(settings, 'TESTING', False):
 # ---------------------------
 CLASSES = ['Blight', 'Common Rust', 'Gray Leaf Spot', 'Healthy']
 
+
+# ---------------------------
+# Batched model calls
+# ---------------------------
+def clip_similarity_batch(image_tensors, prefilter=None):
+    """
+    Run the CLIP image encoder over a stack of preprocessed images.
+    Returns the max prompt similarity for each image, in input order.
+    `prefilter` defaults to the registry's model (benchmarks pass their own).
+    """
+    import torch
+
+    prefilter = prefilter or registry.get("clip")
+    batch = torch.cat(image_tensors).to(prefilter.device)
+
+    with torch.no_grad():
+        # fp32 from here on whatever the encoder precision
+        image_features = prefilter.model.encode_image(batch).float()
+
+        # Normalize (prompt features are precomputed and already normalized)
+        image_features /= image_features.norm(dim=-1, keepdim=True)
+
+        # (batch, prompts) -> best matching prompt per image
+        similarity = image_features @ prefilter.prompt_features.T
+        return similarity.max(dim=-1).values.tolist()
+
+
+def tflite_probabilities_batch(img_arrays):
+    """
+    Run the TFLite classifier over a stack of (1, 224, 224, 3) arrays.
+    Returns one probability vector per image, in input order.
+    """
+    with registry.get("classifier").checkout() as interpreter:
+        return interpreter_probabilities(interpreter, img_arrays)
+
+
+def interpreter_probabilities(interpreter, img_arrays):
+    """
+    Invoke one interpreter on a stack of float32 [0, 1] MobileNet arrays.
+    Input quantization and output dequantization follow the model's tensors,
+    so float32, float16 and int8 variants all take the same arrays.
+    """
+    input_details = interpreter.get_input_details()[0]
+    output_details = interpreter.get_output_details()[0]
+    batch = quantize_input(np.concatenate(img_arrays), input_details)
+
+    # Resize the batch dimension only when it changes (allocation is not free)
+    if input_details['shape'][0] != len(batch):
+        interpreter.resize_tensor_input(input_details['index'], list(batch.shape))
+        interpreter.allocate_tensors()
+
+    interpreter.set_tensor(input_details['index'], batch)
+    interpreter.invoke()
+
+    # dequantize_output copies: the interpreter reuses its output buffer
+    return list(dequantize_output(interpreter.get_tensor(output_details['index']), output_details))
+
+
+def interpreter_pool_stats():
+    """Utilization of the TFLite interpreter pool (None until it is loaded)."""
+    if not registry.is_loaded("classifier"):
+        return None
+    return registry.get("classifier").stats()
+
+
+# ---------------------------
+# Micro-batching
+# ---------------------------
+# Concurrent requests are grouped into one model call when enabled.
+# Only the batcher worker thread touches the models in that mode.
+clip_batcher = MicroBatcher(
+    clip_similarity_batch,
+    max_batch_size=getattr(settings, 'ML_BATCH_MAX_SIZE', 8),
+    max_wait_ms=getattr(settings, 'ML_BATCH_MAX_WAIT_MS', 5.0),
+    name="clip",
+)
+tflite_batcher = MicroBatcher(
+    tflite_probabilities_batch,
+    max_batch_size=getattr(settings, 'ML_BATCH_MAX_SIZE', 8),
+    max_wait_ms=getattr(settings, 'ML_BATCH_MAX_WAIT_MS', 5.0),
+    name="tflite",
+)
+
+
+def batching_enabled():
+    return getattr(settings, 'ML_BATCHING_ENABLED', False)
+
+
+def clip_similarity(image):
+    """Max prompt similarity for one image, using this process's CLIP model."""
+    image_tensor = clip_input(image)
+    if batching_enabled():
+        return clip_batcher.infer(image_tensor)
+    return clip_similarity_batch([image_tensor])[0]
+
+
+def tflite_probabilities(img_array):
+    """Probability vector for one MobileNet array, using this process's interpreters."""
+    if batching_enabled():
+        return tflite_batcher.infer(img_array)
+    return tflite_probabilities_batch([img_array])[0]
+
+
+def batching_stats():
+    """Batch-size and queue-time stats for both model stages."""
+    return {
+        "enabled": batching_enabled(),
+        "clip": clip_batcher.stats(),
+        "tflite": tflite_batcher.stats(),
+    }
+
+
+# ---------------------------
+# Shared preprocessing stage
+# ---------------------------
+# Both model inputs are derived from the same decoded pixels in memory
+# and cached on the PreprocessedImage, so each upload is decoded once.
+def clip_input(image):
+    """CLIP tensor (1, 3, 224, 224) for a path, PIL or PreprocessedImage."""
+    preprocess = registry.get("clip").preprocess
+    return as_preprocessed(image).cached("clip", lambda pil: preprocess(pil).unsqueeze(0))
+
+
+def mobilenet_input(image):
+    """
+    MobileNet array (1, 224, 224, 3) float32 in [0, 1].
+    Pure Pillow/NumPy, bit-identical to the keras load_img/img_to_array
+    steps used during training (no Keras import in the request path).
+    """
+    return as_preprocessed(image).cached("mobilenet", mobilenet_array)
+
+
 # ---------------------------
 # CLIP prefilter
 # ---------------------------
-def is_maize_clip(img_path, threshold=0.29):
-    """Return True if image passes maize prefilter."""
-    try:
-        image_pil = Image.open(img_path).convert("RGB")
-        image_tensor = clip_preprocess(image_pil).unsqueeze(0).to(device)
+class ClipDecision:
+    """
+    Prefilter outcome: truthy when the image passes, with the CLIP similarity
+    that decided it (None when CLIP failed) so it can be stored on the Prediction.
+    Compares equal to the plain bool.
+    """
+    __slots__ = ("is_maize", "similarity")
 
-        with torch.no_grad():
-            image_features = clip_model.encode_image(image_tensor)
-            text_features = clip_model.encode_text(text_tokens)
+    def __init__(self, is_maize, similarity=None):
+        self.is_maize = bool(is_maize)
+        self.similarity = similarity
 
-            # Normalize
-            image_features /= image_features.norm(dim=-1, keepdim=True)
-            text_features /= text_features.norm(dim=-1, keepdim=True)
+    @classmethod
+    def from_similarity(cls, similarity, threshold=CLIP_THRESHOLD):
+        similarity = float(similarity)
+        return cls(similarity > threshold, similarity)
 
-            similarity = (image_features @ text_features.T).squeeze(0)
-            max_sim = similarity.max().item()
+    @property
+    def failed(self):
+        # CLIP raised: a rejection by error, not a verdict on the image
+        return self.similarity is None
 
-        return max_sim > threshold
+    def __bool__(self):
+        return self.is_maize
+
+    def __eq__(self, other):
+        return self.is_maize == bool(other)
+
+    def __hash__(self):
+        return hash(self.is_maize)
+
+    def __repr__(self):
+        return f"ClipDecision({self.is_maize}, similarity={self.similarity})"
+
+
+def is_maize_clip(image, threshold=CLIP_THRESHOLD):
+    """
+    Return a truthy ClipDecision if image passes maize prefilter.
+    `image` may be a file path, a PIL image or a PreprocessedImage.
+    """
+    if remote_inference_enabled():
+        # Forwarded to the inference server (ML_INFERENCE_SOCKET)
+        try:
+            return ClipDecision.from_similarity(inference_client().clip_similarity(image), threshold)
+        except InferenceServerUnavailable:
+            # Same as a missing model: fail loudly, not reject every image
+            raise
+        except Exception as e:
+            print("CLIP error:", e)
+            return ClipDecision(False)
+
+    # Load outside the try: a missing model must fail loudly, not reject every image
+    registry.get("clip")
+
+    try:
+        return ClipDecision.from_similarity(clip_similarity(image), threshold)
     except Exception as e:
         print("CLIP error:", e)
-        return False
+        return ClipDecision(False)
 
 # ---------------------------
 # TFLite inference
@@ -77,53 +222,39 @@ def is_maize_clip(img_path, threshold=0.29):
 """Return predicted class and probabilities from TFLite model"""
 
 
-def run_tflite_inference(img_path):
+def run_tflite_inference(image):
     """
     Perform classification and return predicted class and probabilities from TFLite model
 
     The preprocessing pipeline replicates exactly how images were prepared
     during model training to ensure consistent results.
+    `image` may be a file path, a PIL image or a PreprocessedImage.
     """
-    # Import here to avoid circular imports
-    from tensorflow.keras.preprocessing import image as keras_image
-
-
-    # 1. Image Loading & Preprocessing
+    # 1. Image Preprocessing
     # ---------------------------
-    # Load image with same parameters used during training
-    img = keras_image.load_img(img_path, target_size=(224, 224))
-
-    # Convert to array and normalize to [0,1] range
-    # This matches the training data preprocessing pipeline
-    img_array = keras_image.img_to_array(img) / 255.0
-
-    # Expand dimensions to create batch of size 1
-    # Required format: (batch_size, height, width, channels)
-    img_array_expanded = np.expand_dims(img_array, axis=0).astype(np.float32)
+    # (batch_size, height, width, channels) array built from the decoded
+    # pixels in memory, normalized to [0,1] like the training data
+    img_array_expanded = mobilenet_input(image)
 
 
     # 2. Model Inference
     # ---------------------------
-    # Get model input/output tensor indices
-    input_index = classifier_interpreter.get_input_details()[0]['index']
-    output_index = classifier_interpreter.get_output_details()[0]['index']
-
-    # Set input tensor with preprocessed image
-    classifier_interpreter.set_tensor(input_index, img_array_expanded)
-
-    # Execute inference
-    classifier_interpreter.invoke()
-
-    # Retrieve model predictions
-    # Output is a 2D array: [[class1_prob, class2_prob, ...]]
-    output_data = classifier_interpreter.get_tensor(output_index)
-
-    # Extract probabilities for the single image in batch
-    probabilities = output_data[0]
+    # Either forward to the inference server, queue the image for the next
+    # stacked batch or run it alone. All paths return the probability
+    # vector for this image only.
+    if remote_inference_enabled():
+        probabilities = inference_client().tflite_probabilities(img_array_expanded)
+    else:
+        probabilities = tflite_probabilities(img_array_expanded)
 
 
     # 3. Result Interpretation
     # ---------------------------
+    return interpret_probabilities(probabilities)
+
+
+def interpret_probabilities(probabilities):
+    """Map a probability vector to (predicted class, {class: probability})."""
     # Get index of highest probability class
     predicted_index = int(np.argmax(probabilities))
 
@@ -136,4 +267,106 @@ def run_tflite_inference(img_path):
         for i in range(len(CLASSES))
     }
 
-    return predicted_class, probabilities_dict
\ No newline at end of file
+    return predicted_class, probabilities_dict
+
+
+# ---------------------------
+# Batch API (async worker, bulk jobs)
+# ---------------------------
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def is_maize_clip_batch(images, threshold=CLIP_THRESHOLD):
+    """
+    Batched prefilter: one encode_image call (or one inference server
+    request) per chunk of images.
+    Returns one ClipDecision per image, in input order.
+    """
+    if remote_inference_enabled():
+        # Forwarded to the inference server (ML_INFERENCE_SOCKET)
+        similarities_for = inference_client().clip_similarities
+    else:
+        registry.get("clip")
+
+        def similarities_for(chunk):
+            return clip_similarity_batch([clip_input(image) for image in chunk])
+
+    decisions = []
+    for chunk in _chunks(list(images), getattr(settings, 'ML_BATCH_MAX_SIZE', 8)):
+        try:
+            similarities = similarities_for(chunk)
+            decisions.extend(ClipDecision.from_similarity(sim, threshold) for sim in similarities)
+        except InferenceServerUnavailable:
+            # Same as is_maize_clip: fail loudly, not reject every image
+            raise
+        except Exception as e:
+            # Same policy as is_maize_clip: a CLIP error rejects the image
+            print("CLIP error:", e)
+            decisions.extend(ClipDecision(False) for _ in chunk)
+
+    return decisions
+
+
+def run_tflite_inference_batch(images):
+    """
+    Batched classifier: one interpreter invoke (or one inference server
+    request) per chunk of images.
+    Returns (predicted class, probabilities dict) per image, in input order.
+    """
+    if remote_inference_enabled():
+        probabilities_for = inference_client().tflite_probabilities_batch
+    else:
+        probabilities_for = tflite_probabilities_batch
+
+    results = []
+    for chunk in _chunks(list(images), getattr(settings, 'ML_BATCH_MAX_SIZE', 8)):
+        probabilities = probabilities_for([mobilenet_input(image) for image in chunk])
+        results.extend(interpret_probabilities(p) for p in probabilities)
+
+    return results
+
+
+# ---------------------------
+# Cascade prefilter
+# ---------------------------
+def cascade_enabled():
+    """True when a maize gate is configured (ML_GATE_PATH)."""
+    return registry.get("gate") is not None
+
+
+def is_maize_cascade(images, scores, threshold=CLIP_THRESHOLD):
+    """
+    Prefilter decisions for images the classifier has already scored.
+    The gate decides confident cases from the classifier output; uncertain
+    images (and an ML_GATE_AUDIT_RATE sample of confident ones, to measure
+    disagreement) go through CLIP. Returns one decision per image, in input
+    order: a bool where the gate decided, CLIP's ClipDecision otherwise.
+    """
+    gate = registry.get("gate")
+    audit_rate = getattr(settings, 'ML_GATE_AUDIT_RATE', 0.0)
+
+    decisions = [gate.decide([s[name] for name in CLASSES]) for s in scores]
+    for decision in decisions:
+        cascade_stats.record_decision(decision)
+
+    uncertain = [i for i, decision in enumerate(decisions) if decision is None]
+    audited = [i for i, decision in enumerate(decisions) if decision is not None and random.random() < audit_rate]
+    needs_clip = uncertain + audited
+    if not needs_clip:
+        return decisions
+
+    # One image: the request path (batcher / inference server). Several: stacked batch
+    if len(needs_clip) == 1:
+        clip_decisions = [is_maize_clip(images[needs_clip[0]], threshold)]
+    else:
+        clip_decisions = is_maize_clip_batch([images[i] for i in needs_clip], threshold)
+
+    for i, clip_decision in zip(needs_clip, clip_decisions):
+        if decisions[i] is None:
+            decisions[i] = clip_decision
+        else:
+            # Audited: the gate's decision stands, only the agreement is recorded
+            cascade_stats.record_audit(decisions[i], bool(clip_decision))
+    return decisions
@@ -1,3 +1,49 @@
-from django.shortcuts import render
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework import status
+
+from .warmup import readiness
+
 
 # Create your views here.
+
+class ReadinessView(APIView):
+    """
+    Load balancer readiness probe.
+    200 once both models are loaded and warmed up, 503 before that (or on failure).
+    Reports load state/time per model, warmup latency and model file hashes.
+    """
+    # Polled often by the load balancer: no auth lookups, no throttling
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    throttle_classes = []
+
+    def get(self, request, *args, **kwargs):
+        ready, payload = readiness()
+        return Response(
+            payload,
+            status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
+
+class MetricsView(APIView):
+    """
+    Inference metrics of the process answering the request (staff only):
+    micro-batching, interpreter pool utilization and the cascade prefilter's
+    hit rate and disagreement with CLIP.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        # Imported here: the readiness probe must not pull in the batchers
+        from .gate import cascade_stats
+        from .loaders import model_version
+        from .utils import batching_stats, cascade_enabled, interpreter_pool_stats
+
+        return Response({
+            "model_version": model_version(),
+            "batching": batching_stats(),
+            "interpreter_pool": interpreter_pool_stats(),
+            "cascade": {"enabled": cascade_enabled(), **cascade_stats.stats()},
+        })
@@ -0,0 +1,166 @@
+"""
+Startup warmup and readiness
+Loads the models and pushes a synthetic image through both stages, so the
+first real prediction does not pay for lazy allocations. The readiness
+endpoint (/api/health/ready) reports the result to the load balancer.
+"""
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+from django.conf import settings
+
+from .inference_server import inference_client, remote_inference_enabled
+from .loaders import CLIP_MODEL_NAME, classifier_model_path
+from .preprocessing import PreprocessedImage
+from .registry import registry
+
+COLD = "cold"          # warmup not started
+WARMING = "warming"    # warmup running
+READY = "ready"        # both stages ran successfully
+FAILED = "failed"      # a model failed to load or run
+LAZY = "lazy"          # warmup disabled, models load on first request
+REMOTE = "remote"      # models live in the inference server (ML_INFERENCE_SOCKET)
+PRELOADED = "preloaded"  # pre-fork master: models loaded, workers warm up after fork
+
+_lock = threading.Lock()
+_state = {
+    "status": COLD,
+    "started_at": None,
+    "finished_at": None,
+    "seconds": None,
+    "stages_ms": {},
+    "error": None,
+}
+_file_identity = {}
+
+
+def synthetic_image(size=(224, 224), seed=0):
+    """Deterministic noise image: exercises the same code paths as a real upload."""
+    pixels = np.random.default_rng(seed).integers(0, 256, size=(size[1], size[0], 3), dtype=np.uint8)
+    return PreprocessedImage(Image.fromarray(pixels, "RGB"))
+
+
+def warmup():
+    """Load both models and run synthetic inference through each stage."""
+    # Imported here: ml.utils pulls in the batchers, not needed to report status
+    from .utils import clip_input, clip_similarity_batch, mobilenet_input, tflite_probabilities_batch
+
+    _update(status=WARMING, started_at=time.time(), finished_at=None, seconds=None, stages_ms={}, error=None)
+    started = time.perf_counter()
+
+    try:
+        registry.load_all()
+        image = synthetic_image()
+        stages_ms = {}
+
+        stage_started = time.perf_counter()
+        clip_similarity_batch([clip_input(image)])
+        stages_ms["clip"] = round((time.perf_counter() - stage_started) * 1000.0, 1)
+
+        # One invoke per pooled interpreter: the pool hands them out in turn
+        stage_started = time.perf_counter()
+        for _ in range(registry.get("classifier").size):
+            tflite_probabilities_batch([mobilenet_input(image)])
+        stages_ms["classifier"] = round((time.perf_counter() - stage_started) * 1000.0, 1)
+    except Exception as e:
+        _update(status=FAILED, finished_at=time.time(), error=f"{type(e).__name__}: {e}")
+        print("Warmup error:", e)
+        return False
+
+    _update(
+        status=READY,
+        finished_at=time.time(),
+        seconds=round(time.perf_counter() - started, 3),
+        stages_ms=stages_ms,
+    )
+    return True
+
+
+def warmup_on_startup():
+    """
+    Startup hook for server processes (wsgi/asgi).
+    Runs in a background thread by default so /api/health/ready can
+    answer 503 while models are still warming.
+    """
+    if remote_inference_enabled():
+        # Nothing to load here: readiness is the inference server's
+        _update(status=REMOTE)
+        return
+
+    if not getattr(settings, 'ML_PRELOAD_MODELS', True):
+        _update(status=LAZY)
+        return
+
+    if getattr(settings, 'ML_PRELOAD_BEFORE_FORK', False):
+        # gunicorn --preload: share weights with the workers, warm each one after fork
+        from .forking import preload_for_fork
+        preload_for_fork()
+        _update(status=PRELOADED)
+        return
+
+    _start_warmup()
+
+
+def after_fork():
+    """Forked worker of a preloaded master: fresh lock, then warm up like at startup."""
+    global _lock
+    _lock = threading.Lock()
+    _update(status=COLD, started_at=None, finished_at=None, seconds=None, stages_ms={}, error=None)
+    _start_warmup()
+
+
+def _start_warmup():
+    if getattr(settings, 'ML_WARMUP_IN_BACKGROUND', True):
+        threading.Thread(target=warmup, name="ml-warmup", daemon=True).start()
+    else:
+        warmup()
+
+
+def model_file_identity():
+    """Name, size and SHA-256 of the model files (hashed once per process)."""
+    with _lock:
+        if not _file_identity:
+            path = classifier_model_path()
+            classifier = {"file": os.path.basename(path)}
+            try:
+                sha256 = hashlib.sha256()
+                with open(path, "rb") as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                        sha256.update(chunk)
+                classifier.update(bytes=os.path.getsize(path), sha256=sha256.hexdigest())
+            except OSError as e:
+                classifier["error"] = str(e)
+
+            _file_identity.update(classifier=classifier, clip={"name": CLIP_MODEL_NAME})
+        return dict(_file_identity)
+
+
+def readiness():
+    """(ready, payload) for the readiness endpoint."""
+    with _lock:
+        warmup_state = dict(_state)
+
+    status = warmup_state.pop("status")
+    if status == REMOTE:
+        try:
+            server = inference_client().readiness()
+        except Exception as e:
+            server = {"ready": False, "error": f"{type(e).__name__}: {e}"}
+        return server["ready"], {"ready": server["ready"], "status": status, "inference_server": server}
+
+    return status in (READY, LAZY), {
+        "ready": status in (READY, LAZY),
+        "status": status,
+        "warmup": warmup_state,
+        "models": registry.status(),
+        "model_files": model_file_identity(),
+    }
+
+
+def _update(**values):
+    with _lock:
+        _state.update(values)
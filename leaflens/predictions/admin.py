@@ -1,8 +1,14 @@
 from django.contrib import admin
-from .models import Prediction
+from .models import Prediction, PredictionJob
 
 # Register your models here.
 @admin.register(Prediction)
 class PredictionAdmin(admin.ModelAdmin):
     # Columns to display in the admin list view
     list_display = ('user', 'image_path', 'predicted_disease', 'prediction_scores', 'explanation_image', 'created_at')
+
+
+@admin.register(PredictionJob)
+class PredictionJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'status', 'prediction', 'created_at', 'started_at', 'finished_at')
+    list_filter = ('status',)
@@ -6,10 +6,17 @@ class PredictionFilter(django_filters.FilterSet):
     # date range filtering (?created_at_after=YYYY-MM-DD&created_at_before=YYYY-MM-DD)
     created_at = django_filters.DateFromToRangeFilter()
 
+    # confidence of the top class, on the indexed column (?max_confidence=0.6 → low-confidence)
+    min_confidence = django_filters.NumberFilter(field_name='top_probability', lookup_expr='gte')
+    max_confidence = django_filters.NumberFilter(field_name='top_probability', lookup_expr='lt')
+
     class Meta:
         model = Prediction
         fields = {
             'id': ['exact'],
             'predicted_disease': ['exact'],  # FK ID filtering ex: ?predicted_disease__name__icontains=rust
             'predicted_disease__name': ['icontains'],  # human-friendly search
-        }
\ No newline at end of file
+            'top_class': ['exact'],  # ex: ?top_class=Common Rust
+            'is_maize': ['exact'],  # ex: ?is_maize=false → CLIP rejections
+            'model_version': ['exact'],
+        }
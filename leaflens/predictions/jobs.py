@@ -0,0 +1,129 @@
+"""
+Async prediction jobs
+The web tier only stores the upload and queues a PredictionJob;
+`manage.py run_prediction_worker` claims queued jobs in batches and runs the models.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ml.inference_server import InferenceServerUnavailable
+from ml.preprocessing import PreprocessedImage
+
+from .models import PredictionJob
+from .services import classify_batch, create_prediction
+
+
+def enqueue_job(user, image_path):
+    return PredictionJob.objects.create(user=user, image_path=image_path)
+
+
+def claim_jobs(batch_size):
+    """
+    Atomically move up to `batch_size` of the oldest pending jobs to running.
+    SKIP LOCKED lets several workers poll the same table without
+    claiming the same job twice.
+    """
+    with transaction.atomic():
+        jobs = list(
+            PredictionJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=PredictionJob.STATUS_PENDING)
+            .order_by('created_at')[:batch_size]
+        )
+        if jobs:
+            now = timezone.now()
+            PredictionJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status=PredictionJob.STATUS_RUNNING,
+                started_at=now,
+                attempts=F('attempts') + 1,
+            )
+            for job in jobs:
+                job.status = PredictionJob.STATUS_RUNNING
+                job.started_at = now
+                job.attempts += 1
+    return jobs
+
+
+def requeue_stale_jobs(older_than_seconds, max_attempts=None):
+    """
+    Put jobs left running by a crashed worker back in the queue.
+    A job that already had `max_attempts` (default PREDICTION_JOB_MAX_ATTEMPTS)
+    probably crashes the worker itself (OOM, decode bomb): it is failed instead.
+    Returns the number of jobs requeued.
+    """
+    if max_attempts is None:
+        max_attempts = getattr(settings, 'PREDICTION_JOB_MAX_ATTEMPTS', 3)
+    now = timezone.now()
+    stale = PredictionJob.objects.filter(
+        status=PredictionJob.STATUS_RUNNING,
+        started_at__lt=now - timedelta(seconds=older_than_seconds),
+    )
+    stale.filter(attempts__gte=max_attempts).update(
+        status=PredictionJob.STATUS_FAILED,
+        error=f"Worker stopped while running this job {max_attempts} time(s); not retried",
+        finished_at=now,
+    )
+    return stale.filter(attempts__lt=max_attempts).update(status=PredictionJob.STATUS_PENDING, started_at=None)
+
+
+def process_jobs(jobs):
+    """
+    Run one claimed batch through both model stages and store the results.
+    Returns the number of jobs put back in the queue because the inference
+    server was unreachable (not the jobs' fault: they are retried as they are).
+    """
+    images = []
+    runnable = []
+
+    # 1. Read and decode every stored upload (a bad file fails only its own job)
+    for job in jobs:
+        try:
+            with default_storage.open(job.image_path.name, 'rb') as f:
+                images.append(PreprocessedImage.from_bytes(f.read()))
+            runnable.append(job)
+        except Exception as e:
+            _finish(job, PredictionJob.STATUS_FAILED, error=f"Could not read image: {e}")
+
+    # 2. Stacked inference over the whole batch
+    try:
+        outcomes = classify_batch(images)
+    except InferenceServerUnavailable as e:
+        print("Inference server unavailable, requeueing jobs:", e)
+        return _requeue(runnable)
+    except Exception as e:
+        for job in runnable:
+            _finish(job, PredictionJob.STATUS_FAILED, error=f"Inference failed: {e}")
+        return 0
+
+    # 3. One Prediction per job (a failed save fails only its own job)
+    for job, image, (predicted_label, scores, decision) in zip(runnable, images, outcomes):
+        try:
+            with transaction.atomic():
+                prediction = create_prediction(job.user, job.image_path.name, predicted_label, scores,
+                                               image=image, clip=decision)
+                _finish(job, PredictionJob.STATUS_DONE, prediction=prediction)
+        except Exception as e:
+            _finish(job, PredictionJob.STATUS_FAILED, error=f"Could not save prediction: {e}")
+    return 0
+
+
+def _requeue(jobs):
+    # This claim does not count towards PREDICTION_JOB_MAX_ATTEMPTS
+    return PredictionJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+        status=PredictionJob.STATUS_PENDING,
+        started_at=None,
+        attempts=F('attempts') - 1,
+    )
+
+
+def _finish(job, status, prediction=None, error=''):
+    job.status = status
+    job.prediction = prediction
+    job.error = error
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'prediction', 'error', 'finished_at'])
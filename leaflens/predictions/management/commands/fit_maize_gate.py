@@ -0,0 +1,86 @@
+"""
+Fit the cascade prefilter gate from past CLIP decisions
+usage: python manage.py fit_maize_gate [--output ml/models/maize_gate.json] [--limit 5000]
+Runs the classifier on stored prediction images and fits a head that predicts
+CLIP's maize / not-maize decision from the classifier output (see ml/gate.py).
+Learns from rows with a stored CLIP similarity only.
+"""
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from ml.gate import fit_gate
+from ml.preprocessing import PreprocessedImage
+from ml.utils import CLASSES, run_tflite_inference_batch
+from predictions.models import Prediction
+
+
+class Command(BaseCommand):
+    help = "Fit the maize gate that lets confident images skip CLIP"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=str(settings.BASE_DIR / 'ml' / 'models' / 'maize_gate.json'))
+        parser.add_argument('--limit', type=int, default=5000,
+                            help="Most recent distinct images to learn from")
+        parser.add_argument('--target-agreement', type=float, default=0.995,
+                            help="Required agreement with CLIP on held-out confident decisions")
+        parser.add_argument('--chunk-size', type=int, default=64,
+                            help="Images decoded and classified at a time")
+
+    def handle(self, *args, **options):
+        # Only decisions CLIP made itself: results of an earlier gate would teach it its own mistakes.
+        # No similarity: CLIP never ran (quality rejection) or failed, not a decision to learn
+        predictions = (
+            Prediction.objects
+            .exclude(model_version__contains="+gate-")
+            .filter(clip_similarity__isnull=False)
+            .order_by('-created_at')
+            .only('image_path', 'is_maize')
+        )
+
+        probabilities, labels, chunk = [], [], []
+        seen = set()
+        for prediction in predictions.iterator():
+            if len(seen) >= options['limit']:
+                break
+            # Cached and near-duplicate results share the file: learn from it once
+            name = prediction.image_path.name
+            if not name or name in seen:
+                continue
+            seen.add(name)
+
+            try:
+                with default_storage.open(name, 'rb') as f:
+                    image = PreprocessedImage.from_bytes(f.read())
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f"Skipping {name}: {e}"))
+                continue
+
+            chunk.append((image, bool(prediction.is_maize)))
+            if len(chunk) >= options['chunk_size']:
+                self.classify(chunk, probabilities, labels)
+                chunk = []
+        self.classify(chunk, probabilities, labels)
+
+        self.stdout.write(f"Fitting on {len(labels)} image(s) ({sum(labels)} accepted by CLIP)")
+        try:
+            gate, report = fit_gate(probabilities, labels, target_agreement=options['target_agreement'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        gate.save(options['output'])
+        self.stdout.write(
+            f"Held-out: gate decides {report['hit_rate']:.1%} of {report['images']} image(s) alone, "
+            f"agreeing with CLIP on {report['agreement']:.2%} of those"
+        )
+        if report['hit_rate'] == 0:
+            self.stdout.write(self.style.WARNING("No confident band reached the target: the gate would never skip CLIP"))
+        self.stdout.write(self.style.SUCCESS(f"Saved {options['output']}: set ML_GATE_PATH to enable the cascade"))
+
+    def classify(self, chunk, probabilities, labels):
+        if not chunk:
+            return
+        classified = run_tflite_inference_batch([image for image, _ in chunk])
+        for (_, label), (_, scores) in zip(chunk, classified):
+            probabilities.append([scores[name] for name in CLASSES])
+            labels.append(label)
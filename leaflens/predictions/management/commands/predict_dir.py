@@ -0,0 +1,156 @@
+"""
+Offline bulk prediction for an image archive
+usage: python manage.py predict_dir <image_dir> [--user officer] [--batch-size 64] [--workers 4]
+Walks the directory tree, decodes and preprocesses images in a process pool
+and runs both model stages in stacked batches (predictions.services.predict_batch):
+one bulk_create per batch, images/sec reported as it goes.
+
+Finished files are appended to a checkpoint file, so an interrupted run
+picks up where it stopped when started again with the same checkpoint.
+"""
+import multiprocessing
+import os
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from ml.preprocessing import IMAGE_EXTENSIONS, PreprocessedImage
+from predictions.services import predict_batch, release_full_resolution
+
+
+def walk_images(directory):
+    """Image paths under `directory`, relative to it, in a stable (sorted) order without listing it all first."""
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for name in sorted(files):
+            if not name.startswith('.') and os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                yield os.path.relpath(os.path.join(root, name), directory)
+
+
+def prepare(path):
+    """
+    Pool worker: decode one file and build everything derived from the
+    full-resolution pixels (MobileNet array, perceptual hash, quality verdict).
+    Only a CLIP-sized copy of the image travels back to the main process.
+    Returns (path, PreprocessedImage or None, error).
+    """
+    try:
+        return path, release_full_resolution(PreprocessedImage.from_path(path)), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def read_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+
+class Command(BaseCommand):
+    help = "Predict every image under a directory (offline backfill), resumable from a checkpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument('image_dir', help="Directory tree of photos")
+        parser.add_argument('--user', default=None,
+                            help="Username the predictions belong to (anonymous by default)")
+        parser.add_argument('--batch-size', type=int, default=64,
+                            help="Images run through the models and inserted together")
+        parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                            help="Decode processes (0 decodes in this process)")
+        parser.add_argument('--checkpoint', default=None,
+                            help="File listing finished images (default: <image_dir>/.predict_dir.checkpoint)")
+
+    def handle(self, *args, **options):
+        directory = options['image_dir']
+        if not os.path.isdir(directory):
+            raise CommandError(f"{directory} is not a directory")
+
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user named {options['user']!r}")
+
+        checkpoint_path = options['checkpoint'] or os.path.join(directory, '.predict_dir.checkpoint')
+        done = read_checkpoint(checkpoint_path)
+        if done:
+            self.stdout.write(f"Resuming: {len(done)} image(s) already done according to {checkpoint_path}")
+
+        pending = (relative for relative in walk_images(directory) if relative not in done)
+        batches = self.batches(pending, options['batch_size'])
+
+        # Fork before any model is loaded: workers only decode, the models stay in this process
+        pool = None
+        if options['workers'] > 0:
+            context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+            pool = context.Pool(options['workers'])
+
+        self.counts = {"predicted": 0, "failed": 0}
+        self.started = time.perf_counter()
+        try:
+            with open(checkpoint_path, 'a') as checkpoint:
+                self.run(directory, batches, pool, user, checkpoint)
+        finally:
+            if pool is not None:
+                pool.terminate()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {self.counts['predicted']} image(s) predicted, {self.counts['failed']} unreadable, "
+            f"{self.rate():.1f} images/s"
+        ))
+
+    def batches(self, paths, size):
+        batch = []
+        for path in paths:
+            batch.append(path)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def decode(self, directory, batch, pool):
+        """Start decoding a batch; returns a callable giving its results."""
+        paths = [os.path.join(directory, relative) for relative in batch]
+        if pool is None:
+            results = [prepare(path) for path in paths]
+            return lambda: results
+        return pool.map_async(prepare, paths).get
+
+    def run(self, directory, batches, pool, user, checkpoint):
+        # Pipeline: the next batch decodes in the pool while this one is on the models
+        batch = next(batches, None)
+        decoded = self.decode(directory, batch, pool) if batch else None
+        while batch:
+            results = decoded()
+            next_batch = next(batches, None)
+            if next_batch:
+                decoded = self.decode(directory, next_batch, pool)
+
+            images, filenames = [], []
+            for (path, prepared, error), relative in zip(results, batch):
+                if prepared is None:
+                    self.stdout.write(self.style.WARNING(f"Skipping {relative}: {error}"))
+                    self.counts["failed"] += 1
+                    continue
+                images.append(prepared)
+                filenames.append(os.path.basename(path))
+
+            if images:
+                close_old_connections()
+                predict_batch(images, user, filenames)
+                self.counts["predicted"] += len(images)
+
+            # Only after the rows are in: a crash before this point redoes the batch
+            checkpoint.writelines(f"{relative}\n" for relative in batch)
+            checkpoint.flush()
+
+            self.stdout.write(f"{self.counts['predicted']} image(s) predicted, {self.rate():.1f} images/s")
+            batch = next_batch
+
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.counts["predicted"] / elapsed if elapsed > 0 else 0.0
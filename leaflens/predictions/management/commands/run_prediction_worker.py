@@ -0,0 +1,63 @@
+"""
+Background worker for async predictions
+usage: python manage.py run_prediction_worker [--batch-size 16] [--once]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from predictions.jobs import claim_jobs, process_jobs, requeue_stale_jobs
+
+
+class Command(BaseCommand):
+    help = "Process queued async prediction jobs in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=16,
+                            help="Max jobs claimed and run through the models together")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Seconds to sleep when the queue is empty")
+        parser.add_argument('--requeue-after', type=int, default=600,
+                            help="Requeue jobs stuck in 'running' for this many seconds")
+        parser.add_argument('--max-attempts', type=int, default=None,
+                            help="Fail stuck jobs claimed this many times instead "
+                                 "(default: PREDICTION_JOB_MAX_ATTEMPTS)")
+        parser.add_argument('--once', action='store_true',
+                            help="Drain the queue and exit instead of polling forever")
+
+    def handle(self, *args, **options):
+        from ml.inference_server import remote_inference_enabled
+        from ml.registry import registry
+
+        # Load models before taking jobs so the first batch isn't slow.
+        # With ML_INFERENCE_SOCKET the inference server holds them: nothing to load here
+        if not options['once'] and not remote_inference_enabled():
+            registry.load_all()
+
+        processed = 0
+        while True:
+            close_old_connections()
+            requeue_stale_jobs(options['requeue_after'], options['max_attempts'])
+
+            jobs = claim_jobs(options['batch_size'])
+            if jobs:
+                started = time.perf_counter()
+                requeued = process_jobs(jobs)
+                processed += len(jobs) - requeued
+                self.stdout.write(
+                    f"Processed {len(jobs) - requeued} job(s) in {time.perf_counter() - started:.2f}s"
+                )
+                if not requeued:
+                    continue
+                # Inference server down: back off instead of reclaiming the same jobs right away
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {processed} job(s) processed"))
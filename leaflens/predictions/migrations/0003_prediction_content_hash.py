@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diseases', '0001_initial'),
+        ('predictions', '0002_predictionjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prediction',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='prediction',
+            name='model_version',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['content_hash', 'model_version', 'created_at'], name='predictions_content_76932a_idx'),
+        ),
+    ]
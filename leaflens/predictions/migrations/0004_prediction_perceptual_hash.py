@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0003_prediction_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prediction',
+            name='perceptual_hash',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='prediction',
+            name='phash_band_0',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='prediction',
+            name='phash_band_1',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='prediction',
+            name='phash_band_2',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='prediction',
+            name='phash_band_3',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
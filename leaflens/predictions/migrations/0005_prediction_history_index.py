@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diseases', '0001_initial'),
+        ('predictions', '0004_prediction_perceptual_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='predictions_user_id_c3c5d0_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diseases', '0001_initial'),
+        ('predictions', '0005_prediction_history_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prediction',
+            name='clip_similarity',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='prediction',
+            name='is_maize',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='prediction',
+            name='top_class',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AddField(
+            model_name='prediction',
+            name='top_probability',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['user', 'top_probability'], name='predictions_user_id_9b3567_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['is_maize', 'created_at'], name='predictions_is_maiz_8c1a47_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['top_class', 'created_at'], name='predictions_top_cla_1a1092_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['model_version', 'created_at'], name='predictions_model_v_8803ed_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Fill the score columns of predictions stored before they existed
+
+from django.db import migrations
+
+
+def score_columns(scores):
+    """Same columns as predictions.services.score_fields, from the stored JSON alone."""
+    if not isinstance(scores, dict) or "quality" in scores:
+        return None, None, None
+    if scores.get("is_maize") is False:
+        return None, None, False
+
+    probabilities = {name: value for name, value in scores.items() if isinstance(value, (int, float))}
+    if not probabilities:
+        return None, None, None
+    top_class = max(probabilities, key=probabilities.get)
+    return top_class, float(probabilities[top_class]), True
+
+
+def backfill(apps, schema_editor):
+    Prediction = apps.get_model('predictions', 'Prediction')
+
+    batch = []
+    for prediction in Prediction.objects.only('id', 'prediction_scores').iterator(chunk_size=2000):
+        prediction.top_class, prediction.top_probability, prediction.is_maize = score_columns(
+            prediction.prediction_scores)
+        batch.append(prediction)
+        if len(batch) >= 2000:
+            Prediction.objects.bulk_update(batch, ['top_class', 'top_probability', 'is_maize'])
+            batch = []
+    if batch:
+        Prediction.objects.bulk_update(batch, ['top_class', 'top_probability', 'is_maize'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0006_prediction_score_columns'),
+    ]
+
+    operations = [
+        # CLIP similarities were never stored: they stay null for old rows
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
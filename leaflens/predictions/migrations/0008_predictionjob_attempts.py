@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0007_backfill_score_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='predictionjob',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 
@@ -23,10 +25,109 @@ class Prediction(models.Model):
     prediction_scores = models.JSONField()
     # e.g. {"blight":0.82,"rust":0.12,"healthy":0.06}
     # Or CLIP filter: {"is_maize": false}
+    # Or quality precheck: {"quality": {"reason": "blurry", "message": "...", "metrics": {...}}}
 
     explanation_image = models.ImageField(upload_to='xai/', null=True, blank=True) # stores only the path
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # SHA-256 of the uploaded bytes + models that produced the scores:
+    # together they key the result cache for re-submitted photos
+    content_hash = models.CharField(max_length=64, null=True, blank=True)
+    model_version = models.CharField(max_length=100, blank=True, default='')
+
+    # 64-bit dHash (stored signed) for near-duplicate lookups, plus its four
+    # 16-bit bands: indexed equality on any band finds hashes within Hamming distance 3
+    perceptual_hash = models.BigIntegerField(null=True, blank=True)
+    phash_band_0 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    phash_band_1 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    phash_band_2 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    phash_band_3 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+
+    # Denormalized from the model outcome at insert time, so confidence and rejection
+    # queries filter on indexed columns instead of the JSON:
+    # top_class/top_probability: the classifier's best class (null when it did not run)
+    # is_maize: prefilter decision (null for quality rejections, which never reach it)
+    # clip_similarity: CLIP's max prompt similarity, when CLIP made the decision
+    top_class = models.CharField(max_length=50, null=True, blank=True)
+    top_probability = models.FloatField(null=True, blank=True)
+    is_maize = models.BooleanField(null=True, blank=True)
+    clip_similarity = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['content_hash', 'model_version', 'created_at']),
+            # history pages: WHERE user = ? ORDER BY created_at DESC, id DESC from a cursor
+            models.Index(fields=['user', 'created_at', 'id']),
+            # a user's low / high confidence predictions (?max_confidence= / ?min_confidence=)
+            models.Index(fields=['user', 'top_probability']),
+            # "CLIP rejections this week", per class over a period
+            models.Index(fields=['is_maize', 'created_at']),
+            models.Index(fields=['top_class', 'created_at']),
+            # results of one model version
+            models.Index(fields=['model_version', 'created_at']),
+        ]
+
     def __str__(self):
         return f"Prediction {self.id} for {self.user}"
+
+
+class PredictionJob(models.Model):
+    """
+    Queued prediction for the async mode of POST /api/predict/.
+    The upload is stored right away; a worker (manage.py run_prediction_worker)
+    runs the models and links the resulting Prediction.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    # Unguessable id: anonymous clients poll their job by id alone
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='prediction_jobs',
+    )
+
+    image_path = models.ImageField(upload_to='predictions/')
+
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            (STATUS_PENDING, 'Pending'),
+            (STATUS_RUNNING, 'Running'),
+            (STATUS_DONE, 'Done'),
+            (STATUS_FAILED, 'Failed'),
+        ],
+        default=STATUS_PENDING,
+    )
+
+    prediction = models.OneToOneField(
+        Prediction,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='job',
+    )
+
+    error = models.TextField(blank=True, default='')
+
+    # Times a worker claimed the job: jobs that keep killing their worker are
+    # failed instead of requeued past PREDICTION_JOB_MAX_ATTEMPTS
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        # The worker claims the oldest pending jobs first
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f"PredictionJob {self.id} ({self.status})"
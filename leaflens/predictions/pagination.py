@@ -0,0 +1,90 @@
+"""
+Prediction history pagination
+Keyset (cursor) pages on (created_at, id): each page is an indexed range
+scan from the previous page's last row, so deep pages cost the same as the first.
+
+DRF's CursorPagination keys on the first ordering field only and steps over
+ties with an offset. Batch inserts give many rows the same created_at, so the
+cursor here carries both columns and compares them as a pair.
+"""
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class PredictionCursorPagination(CursorPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    # newest first; ?ordering=created_at gives oldest first, still keyed on (created_at, id)
+    ordering = ('-created_at', '-id')
+
+    def get_page_size(self, request):
+        # Read per request, not at import (override_settings, reloaded settings)
+        self.page_size = getattr(settings, 'PREDICTION_HISTORY_PAGE_SIZE', 20)
+        return super().get_page_size(request)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        cursor = self.decode_cursor(request)
+        self.position = self.decode_position(cursor.position) if cursor else None
+        reverse = bool(cursor and cursor.reverse)
+
+        # A previous-page cursor walks the other way, then the page is flipped back
+        descending = self.ordering[0].startswith('-') != reverse
+        queryset = queryset.order_by(*(('-created_at', '-id') if descending else ('created_at', 'id')))
+        if self.position is not None:
+            created_at, pk = self.position
+            lookup = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'created_at__{lookup}': created_at}) | Q(created_at=created_at, **{f'id__{lookup}': pk})
+            )
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.position is not None
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        row = self.page[-1] if self.page else None
+        return self.link(row, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        row = self.page[0] if self.page else None
+        return self.link(row, reverse=True)
+
+    def link(self, row, reverse):
+        # Empty page: continue from the cursor we were given
+        position = (row.created_at, row.pk) if row is not None else self.position
+        return self.encode_cursor(Cursor(offset=0, reverse=reverse, position=self.encode_position(position)))
+
+    @staticmethod
+    def encode_position(position):
+        created_at, pk = position
+        return f"{created_at.isoformat()}|{pk}"
+
+    def decode_position(self, value):
+        try:
+            created_at, pk = value.split('|')
+            return datetime.fromisoformat(created_at), int(pk)
+        except (AttributeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
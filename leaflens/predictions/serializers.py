@@ -1,5 +1,12 @@
+import os
+import zipfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework import serializers
-from .models import Prediction
+from .models import Prediction, PredictionJob
+from diseases.label_map import disease_map
+from ml.preprocessing import IMAGE_EXTENSIONS, ImageTooLarge, PreprocessedImage
 
 try:
     from diseases.serializers import DiseaseSerializer
@@ -9,8 +16,34 @@ except ImportError:
 
 
 
+class CachedDiseaseSerializer(DiseaseSerializer):
+    """
+    Nested disease taken from the class label map (diseases/label_map.py)
+    when it is one of the classifier's diseases: no query, no re-serializing.
+    The map is read once per serializer pass: a whole page shares the context.
+    """
+
+    def get_attribute(self, instance):
+        # The FK id only: reading instance.predicted_disease would load the row
+        disease_id = instance.predicted_disease_id
+        if disease_id is None:
+            return None
+        payloads = self.context.get('disease_payloads')
+        if payloads is None:
+            payloads = self.context['disease_payloads'] = disease_map.payloads()
+        payload = payloads.get(disease_id)
+        if payload is not None:
+            return payload
+        return super().get_attribute(instance)
+
+    def to_representation(self, instance):
+        if isinstance(instance, dict):
+            return instance
+        return super().to_representation(instance)
+
+
 class PredictionSerializer(serializers.ModelSerializer):
-    predicted_disease = DiseaseSerializer(read_only=True)
+    predicted_disease = CachedDiseaseSerializer(read_only=True)
     image_path = serializers.ImageField(read_only=True)
     explanation_image = serializers.ImageField(read_only=True)
 
@@ -22,6 +55,10 @@ class PredictionSerializer(serializers.ModelSerializer):
             'image_path',
             'predicted_disease',
             'prediction_scores',
+            'top_class',
+            'top_probability',
+            'is_maize',
+            'clip_similarity',
             'explanation_image',
             'created_at',
         ]
@@ -38,6 +75,135 @@ Because images are saved automatically by the prediction endpoint — not manual
 """
 
 
+class PredictionJobSerializer(serializers.ModelSerializer):
+    """Status of an async prediction; `prediction` is filled in once the job is done."""
+    prediction = PredictionSerializer(read_only=True)
+
+    class Meta:
+        model = PredictionJob
+        fields = [
+            'id',
+            'status',
+            'prediction',
+            'error',
+            'created_at',
+            'started_at',
+            'finished_at',
+        ]
+
+"""
+Where this is used
+POST /api/predict/?async=true (202 response)
+GET /api/predict/jobs/<id>/
+"""
+
+
+class DecodedImageField(serializers.ImageField):
+    """
+    ImageField that validates the upload by decoding it.
+    The decoded pixels are kept on the file as `preprocessed` so the
+    model stages reuse them instead of decoding the same bytes again.
+    """
+
+    default_error_messages = {
+        'file_too_large': 'The image is too large ({size_mb:.1f} MB). The limit is {limit_mb:.0f} MB.',
+        'too_many_pixels': 'The image resolution is too high: {detail}.',
+    }
+
+    def to_internal_value(self, data):
+        # FileField checks (name, size, empty) without Django's separate Pillow verify pass
+        file_object = serializers.FileField.to_internal_value(self, data)
+
+        # Before reading anything into memory
+        max_bytes = getattr(settings, 'PREDICTION_MAX_UPLOAD_BYTES', 0)
+        if max_bytes and file_object.size > max_bytes:
+            self.fail('file_too_large', size_mb=file_object.size / 1024 ** 2, limit_mb=max_bytes / 1024 ** 2)
+
+        try:
+            file_object.seek(0)
+            file_object.preprocessed = PreprocessedImage.from_upload(file_object)
+        except ImageTooLarge as e:
+            self.fail('too_many_pixels', detail=e)
+        except Exception:
+            self.fail('invalid_image')
+
+        return file_object
+
+
 # for handling uploads in the Browsable API
 class PredictionUploadSerializer(serializers.Serializer):
-    image = serializers.ImageField(required=True)
\ No newline at end of file
+    image = DecodedImageField(required=True)
+
+class ArchiveMember:
+    """
+    A photo inside an uploaded zip, inflated only when opened: a batch
+    never holds more than the photos it is working on.
+    open() returns an upload, like UploadedFile.open() does for `images`.
+    """
+
+    def __init__(self, archive, info):
+        self.archive = archive
+        self.info = info
+        self.name = os.path.basename(info.filename)
+
+    def open(self):
+        try:
+            self.archive.seek(0)
+            with zipfile.ZipFile(self.archive) as zf:
+                return SimpleUploadedFile(self.name, zf.read(self.info))
+        except (zipfile.BadZipFile, zipfile.LargeZipFile, OSError, EOFError):
+            raise serializers.ValidationError("This file could not be read from the archive.")
+
+
+class BatchPredictionUploadSerializer(serializers.Serializer):
+    """
+    Many photos in one request: repeated `images` fields and/or a zip `archive`.
+    validate() flattens both into `uploads` (zip members as ArchiveMember);
+    each photo is then opened and decoded on its own so one bad file fails
+    only its entry in the response.
+    """
+    images = serializers.ListField(child=serializers.FileField(), required=False)
+    archive = serializers.FileField(required=False)
+
+    def validate_archive(self, archive):
+        max_images = getattr(settings, 'PREDICTION_BATCH_MAX_IMAGES', 50)
+        max_bytes = getattr(settings, 'PREDICTION_MAX_UPLOAD_BYTES', 0)
+
+        try:
+            with zipfile.ZipFile(archive) as zf:
+                members = [
+                    info for info in zf.infolist()
+                    if not info.is_dir()
+                    and not info.filename.startswith('__MACOSX/')
+                    and not os.path.basename(info.filename).startswith('.')
+                    and os.path.splitext(info.filename)[1].lower() in IMAGE_EXTENSIONS
+                ]
+                if len(members) > max_images:
+                    raise serializers.ValidationError(
+                        f"The archive holds {len(members)} images. The limit is {max_images}.")
+
+                # Sizes from the zip directory: nothing oversized is inflated
+                for info in members:
+                    if max_bytes and info.file_size > max_bytes:
+                        raise serializers.ValidationError(f"{info.filename} is too large.")
+
+                return [ArchiveMember(archive, info) for info in members]
+        except (zipfile.BadZipFile, zipfile.LargeZipFile, OSError):
+            raise serializers.ValidationError("Upload a valid zip archive.")
+
+    def validate(self, attrs):
+        uploads = attrs.get('images', []) + attrs.get('archive', [])
+        if not uploads:
+            raise serializers.ValidationError("Upload one or more `images`, or a zip `archive` of photos.")
+
+        max_images = getattr(settings, 'PREDICTION_BATCH_MAX_IMAGES', 50)
+        if len(uploads) > max_images:
+            raise serializers.ValidationError(f"{len(uploads)} images sent. The limit is {max_images} per request.")
+
+        attrs['uploads'] = uploads
+        return attrs
+
+"""
+Where this is used
+POST /api/predict/batch/
+"""
@@ -0,0 +1,381 @@
+"""
+Prediction pipeline
+CLIP prefilter -> TFLite classifier -> Disease lookup -> Prediction row.
+Shared by the predict endpoint and the background prediction worker.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.utils import timezone
+
+from diseases.label_map import disease_map
+from ml.loaders import model_version
+from ml.phash import (
+    MAX_BAND_DISTANCE,
+    dhash,
+    from_signed64,
+    hamming_distance,
+    hash_bands,
+    is_informative,
+    to_signed64,
+)
+from ml.preprocessing import as_preprocessed, clip_presize, mobilenet_array
+from ml.quality import assess_quality
+from ml.utils import (
+    cascade_enabled,
+    is_maize_cascade,
+    is_maize_clip,
+    is_maize_clip_batch,
+    run_tflite_inference,
+    run_tflite_inference_batch,
+)
+
+from .models import Prediction
+from .signals import predictions_bulk_created
+from .storage import save_upload, track_saved_path
+
+# Speculative mode: the classifier runs here while the request thread runs CLIP.
+# Both release the GIL during compute; the interpreter pool bounds real concurrency.
+_speculation_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'ML_TFLITE_POOL_SIZE', 4),
+    thread_name_prefix="speculative-classify",
+)
+
+
+def fingerprint(image):
+    """Content hash and perceptual hash columns for a decoded image."""
+    if image is None:
+        return {}
+
+    prepared = as_preprocessed(image)
+    phash = prepared.cached("dhash", dhash)
+    fields = {
+        'content_hash': prepared.content_hash,
+        'perceptual_hash': to_signed64(phash),
+    }
+    fields.update({f'phash_band_{i}': band for i, band in enumerate(hash_bands(phash))})
+    return fields
+
+
+def create_prediction(user, image_path, predicted_label=None, scores=None, image=None, clip=None):
+    """
+    Insert the Prediction row for one model outcome.
+    `predicted_label=None` records a rejection: CLIP's, or the one in `scores`.
+    `image` (the decoded upload) supplies the content/perceptual hashes,
+    `clip` (the prefilter decision) the CLIP similarity when CLIP ran.
+    """
+    prediction = build_prediction(user, image_path, predicted_label, scores, image=image, clip=clip)
+    prediction.save()
+    return prediction
+
+
+def score_fields(predicted_label, scores, clip=None):
+    """Denormalized score columns of a Prediction (see the model) for one outcome."""
+    fields = {
+        'top_class': None,
+        'top_probability': None,
+        'is_maize': True,
+        # ClipDecision from ml.utils; a bare bool when the cascade gate decided alone
+        'clip_similarity': getattr(clip, 'similarity', None),
+    }
+    if predicted_label is None:
+        # Quality rejections never reached the prefilter
+        fields['is_maize'] = None if isinstance(scores, dict) and "quality" in scores else False
+    else:
+        fields['top_class'] = predicted_label
+        probability = scores.get(predicted_label) if isinstance(scores, dict) else None
+        fields['top_probability'] = float(probability) if probability is not None else None
+    return fields
+
+
+def build_prediction(user, image_path, predicted_label=None, scores=None, image=None, clip=None):
+    """Unsaved Prediction for one model outcome (see create_prediction)."""
+    if getattr(clip, 'failed', False) or (isinstance(scores, dict) and "quality" in scores):
+        # CLIP errored, or the photo was unusable: leave the row unhashed so the
+        # result caches never offer it (a sharper copy must reach the models)
+        image = None
+
+    if predicted_label is None:
+        # Save CLIP-rejected images (Recommended for ML systems) best ML engineering practice.
+        # `scores` may carry a structured rejection instead, e.g. {"quality": {...}}
+        return Prediction(
+            user=user,
+            image_path=image_path,
+            predicted_disease=None,  # null
+            prediction_scores=scores or {"is_maize": False},
+            explanation_image=None,
+            model_version=model_version(),
+            **score_fields(None, scores, clip),
+            **fingerprint(image),
+        )
+
+    # Link the predicted label to its Disease if one exists (in-memory map, no query)
+    disease_obj = disease_map.disease_for_label(predicted_label)
+
+    return Prediction(
+        user=user,
+        image_path=image_path,
+        predicted_disease=disease_obj,
+        prediction_scores=scores,
+        model_version=model_version(),
+        **score_fields(predicted_label, scores, clip),
+        **fingerprint(image),
+    )
+
+
+def check_quality(image):
+    """Quality rejection for an unusable photo, None when it is fine (see ml/quality.py)."""
+    if not getattr(settings, 'PREDICTION_QUALITY_CHECK', True):
+        return None
+    return as_preprocessed(image).cached("quality", assess_quality)
+
+
+def predict_image(image, user, image_path):
+    """Run both model stages on one decoded image and store the result."""
+    # Step 0: tiny, dark, overexposed or blurry photo: no model runs, tell the farmer why
+    quality = check_quality(image)
+    if quality is not None:
+        return create_prediction(user, image_path, None, {"quality": quality}, image=image)
+
+    # Near-duplicate of an earlier photo (recompressed/resized): reuse its scores
+    near_duplicate = find_near_duplicate(image)
+    if near_duplicate is not None:
+        prediction = copy_prediction(near_duplicate, user, image, image_path=image_path)
+        prediction.save()
+        return prediction
+
+    # Cascade: classifier first, the maize gate decides confident cases
+    # and only uncertain images go through CLIP (ml/gate.py)
+    if cascade_enabled():
+        predicted_label, scores = run_tflite_inference(image)
+        decision = is_maize_cascade([image], [scores])[0]
+        if not decision:
+            return create_prediction(user, image_path, image=image, clip=decision)
+        return create_prediction(user, image_path, predicted_label, scores, image=image, clip=decision)
+
+    # Speculative: classify alongside CLIP, drop the result if CLIP rejects.
+    # Same response as the sequential path, latency ~ max(CLIP, TFLite).
+    if getattr(settings, 'PREDICTION_SPECULATIVE_CLASSIFY', False):
+        classification = _speculation_executor.submit(run_tflite_inference, image)
+        decision = is_maize_clip(image)
+        if not decision:
+            return create_prediction(user, image_path, image=image, clip=decision)
+        predicted_label, scores = classification.result()
+        return create_prediction(user, image_path, predicted_label, scores, image=image, clip=decision)
+
+    # Step 1: CLIP prefilter
+    decision = is_maize_clip(image)
+    if not decision:
+        # stop here, do NOT run TFLite
+        return create_prediction(user, image_path, image=image, clip=decision)
+
+    # Step 2: Run TFLite disease classifier
+    predicted_label, scores = run_tflite_inference(image)
+
+    # Step 3: Link the label to a Disease and create the Prediction record
+    return create_prediction(user, image_path, predicted_label, scores, image=image, clip=decision)
+
+
+# ---------------------------
+# Result cache (re-submitted photos)
+# ---------------------------
+def find_cached_prediction(content_hash):
+    """
+    Most recent Prediction for the same bytes and the same model version,
+    within PREDICTION_CACHE_TTL seconds (0 = never expires), or None.
+    """
+    if not content_hash or not getattr(settings, 'PREDICTION_CACHE_ENABLED', True):
+        return None
+
+    matches = Prediction.objects.filter(content_hash=content_hash, model_version=model_version())
+
+    ttl = getattr(settings, 'PREDICTION_CACHE_TTL', 0)
+    if ttl:
+        matches = matches.filter(created_at__gte=timezone.now() - timedelta(seconds=ttl))
+
+    for cached in matches.order_by('-created_at')[:3]:
+        # The stored file may have been cleaned up since: only reuse what still exists
+        if default_storage.exists(cached.image_path.name):
+            return cached
+    return None
+
+
+def reuse_cached_prediction(image, user):
+    """
+    New Prediction (for this user) copying an earlier result for the same photo:
+    same stored file, scores and disease; no inference, no media write.
+    Returns None on a cache miss.
+    """
+    cached = find_cached_prediction(getattr(image, 'content_hash', None))
+    if cached is None:
+        return None
+
+    prediction = copy_prediction(cached, user, image)
+    prediction.save()
+    return prediction
+
+
+def copy_prediction(cached, user, image, image_path=None):
+    """
+    Unsaved copy of an earlier result for `user`, pointing at the same
+    stored file unless `image_path` is given (near-duplicates have their own).
+    """
+    return Prediction(
+        user=user,
+        image_path=image_path or cached.image_path.name,
+        predicted_disease_id=cached.predicted_disease_id,
+        prediction_scores=cached.prediction_scores,
+        model_version=cached.model_version,
+        top_class=cached.top_class,
+        top_probability=cached.top_probability,
+        is_maize=cached.is_maize,
+        clip_similarity=cached.clip_similarity,
+        **fingerprint(image),
+    )
+
+
+def find_near_duplicate(image):
+    """
+    Closest earlier Prediction whose perceptual hash is within
+    PREDICTION_PHASH_MAX_DISTANCE bits (same model version, within the cache TTL).
+    Returns None when disabled, on a miss, or for uninformative (flat) images.
+
+    Only the PREDICTION_PHASH_MAX_CANDIDATES most recent rows sharing a band
+    are compared: past that, an older match can be missed (a cache miss, the
+    models just run).
+    """
+    max_distance = getattr(settings, 'PREDICTION_PHASH_MAX_DISTANCE', 3)
+    if max_distance < 0 or not getattr(settings, 'PREDICTION_CACHE_ENABLED', True):
+        return None
+    # The band lookup cannot find anything further apart
+    max_distance = min(max_distance, MAX_BAND_DISTANCE)
+
+    phash = as_preprocessed(image).cached("dhash", dhash)
+    if not is_informative(phash):
+        return None
+
+    # Band lookup: every hash within MAX_BAND_DISTANCE shares at least one band exactly
+    same_band = Q()
+    for i, band in enumerate(hash_bands(phash)):
+        same_band |= Q(**{f'phash_band_{i}': band})
+
+    # is_maize null: a quality rejection (older rows were still hashed), never an answer for this photo
+    candidates = Prediction.objects.filter(same_band, model_version=model_version(), is_maize__isnull=False)
+
+    ttl = getattr(settings, 'PREDICTION_CACHE_TTL', 0)
+    if ttl:
+        candidates = candidates.filter(created_at__gte=timezone.now() - timedelta(seconds=ttl))
+
+    # Compare hashes only; the winning row is loaded once
+    limit = getattr(settings, 'PREDICTION_PHASH_MAX_CANDIDATES', 1000)
+    best_pk, best_distance = None, max_distance + 1
+    for pk, perceptual_hash in candidates.order_by('-created_at').values_list('pk', 'perceptual_hash')[:limit]:
+        distance = hamming_distance(phash, from_signed64(perceptual_hash))
+        if distance < best_distance:
+            best_pk, best_distance = pk, distance
+            if distance == 0:
+                break
+    return Prediction.objects.get(pk=best_pk) if best_pk is not None else None
+
+
+def classify_batch(images):
+    """
+    Run both model stages over many images as stacked batches.
+    Returns (predicted_label, scores, prefilter decision) per image:
+    (None, None, decision) for CLIP rejections and
+    (None, {"quality": ...}, None) for unusable photos.
+    """
+    quality = [check_quality(image) for image in images]
+    usable = [image for image, rejection in zip(images, quality) if rejection is None]
+    classified = iter(_classify_usable(usable) if usable else [])
+
+    return [next(classified) if rejection is None else (None, {"quality": rejection}, None) for rejection in quality]
+
+
+def _classify_usable(images):
+    if cascade_enabled():
+        classified = run_tflite_inference_batch(images)
+        maize = is_maize_cascade(images, [scores for _, scores in classified])
+        return [(*outcome, is_maize) if is_maize else (None, None, is_maize)
+                for outcome, is_maize in zip(classified, maize)]
+
+    maize = is_maize_clip_batch(images)
+
+    # Only images that pass the prefilter reach the classifier
+    passed = [image for image, is_maize in zip(images, maize) if is_maize]
+    classified = iter(run_tflite_inference_batch(passed) if passed else [])
+
+    return [(*next(classified), is_maize) if is_maize else (None, None, is_maize) for is_maize in maize]
+
+
+# ---------------------------
+# Batch uploads (POST /api/predict/batch/)
+# ---------------------------
+def release_full_resolution(image):
+    """
+    Build everything predict_batch reads from the full-resolution pixels
+    (MobileNet array, perceptual hash, quality verdict), then keep only a
+    CLIP-sized copy of them: CLIP's preprocess gives the same tensor from it.
+    Keeps many decoded photos in memory at a fraction of their size.
+    """
+    prepared = as_preprocessed(image)
+    prepared.cached("mobilenet", mobilenet_array)
+    prepared.cached("dhash", dhash)
+    check_quality(prepared)
+    prepared.image = clip_presize(prepared.image)
+    return prepared
+
+
+def predict_batch(images, user, filenames):
+    """
+    Batch counterpart of predict_image for many decoded uploads.
+    Re-submitted photos reuse their cached result; the rest are written to
+    media and run through both model stages as stacked batches. All rows are
+    inserted with a single bulk_create. Returns the Predictions in input order.
+    """
+    predictions = [None] * len(images)
+    fresh = []
+    for i, image in enumerate(images):
+        cached = find_cached_prediction(getattr(image, 'content_hash', None))
+        if cached is not None:
+            predictions[i] = copy_prediction(cached, user, image)
+        else:
+            fresh.append(i)
+
+    # Media writes run in the background while the models work
+    uploads = {i: save_upload(filenames[i], images[i].data) for i in fresh}
+    outcomes = classify_batch([images[i] for i in fresh]) if fresh else []
+
+    for i, (predicted_label, scores, decision) in zip(fresh, outcomes):
+        predictions[i] = build_prediction(user, uploads[i][0], predicted_label, scores,
+                                          image=images[i], clip=decision)
+
+    bulk_insert(predictions)
+    for i in fresh:
+        track_saved_path(predictions[i], *uploads[i])
+    return predictions
+
+
+def bulk_insert(predictions):
+    """
+    bulk_create that always leaves primary keys set, then sends
+    predictions_bulk_created (bulk_create itself sends no post_save).
+    MySQL does not return auto-increment ids from a bulk insert: the rows are
+    found again by stored path and creation time (set per row by bulk_create).
+    """
+    Prediction.objects.bulk_create(predictions)
+
+    missing = [prediction for prediction in predictions if prediction.pk is None]
+    if missing:
+        inserted = Prediction.objects.filter(
+            image_path__in={prediction.image_path.name for prediction in missing},
+            created_at__in={prediction.created_at for prediction in missing},
+        ).values_list('pk', 'image_path', 'created_at')
+        ids = {(path, created_at): pk for pk, path, created_at in inserted}
+        for prediction in missing:
+            prediction.pk = ids.get((prediction.image_path.name, prediction.created_at))
+
+    predictions_bulk_created.send(sender=Prediction, predictions=predictions)
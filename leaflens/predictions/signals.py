@@ -0,0 +1,9 @@
+"""
+Prediction signals
+bulk_create sends no post_save: services.bulk_insert sends predictions_bulk_created
+with the saved rows instead, so listeners (analytics rollups) see batch inserts too.
+"""
+from django.dispatch import Signal
+
+# kwargs: predictions (list of saved Prediction instances, primary keys set)
+predictions_bulk_created = Signal()
@@ -0,0 +1,55 @@
+"""
+Persist prediction uploads to media
+The write happens in the background so inference never waits on disk
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+
+# Small pool: media writes are I/O bound and short
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="media-writer")
+
+
+def save_upload(name, data):
+    """
+    Reserve a media path for the upload and write `data` to it.
+
+    Returns (reserved_path, future). The reserved path can be stored on the
+    Prediction right away; the future resolves to the path the storage
+    actually used, which only differs if another upload took the name first.
+    """
+    reserved_path = default_storage.get_available_name(f"predictions/{name}")
+
+    if getattr(settings, 'PREDICTION_MEDIA_ASYNC_WRITE', True):
+        return reserved_path, _executor.submit(_write, reserved_path, data)
+
+    # Synchronous mode (tests, debugging): same interface, already resolved
+    future = Future()
+    future.set_result(_write(reserved_path, data))
+    return reserved_path, future
+
+
+def track_saved_path(prediction, reserved_path, future):
+    """Point the prediction at the real file once the background write is done."""
+
+    def _update(done):
+        try:
+            saved_path = done.result()
+        except Exception as e:
+            print("Media write error:", e)
+            return
+
+        if saved_path != reserved_path:
+            # Runs on the writer thread: it needs its own healthy connection
+            close_old_connections()
+            type(prediction).objects.filter(pk=prediction.pk).update(image_path=saved_path)
+
+    # Runs immediately if the write already finished
+    future.add_done_callback(_update)
+
+
+def _write(path, data):
+    return default_storage.save(path, ContentFile(data))
@@ -1,16 +1,25 @@
 # predictions/tests/test_api.py
 
 import io
+import shutil
+import tempfile
 from unittest.mock import patch
 from PIL import Image
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.conf import settings
+from django.test import override_settings
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from django.contrib.auth.models import User
 from rest_framework import status
 from predictions.models import Prediction
+from diseases.label_map import disease_map
 from diseases.models import Disease
+from ml.utils import ClipDecision
 
 
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class PredictionAPITest(APITestCase):
     """
     Tests prediction endpoints end-to-end:
@@ -20,7 +29,16 @@ class PredictionAPITest(APITestCase):
     """
 
     # Creates a test user and fake diseases in the database.
+    @classmethod
+    def tearDownClass(cls):
+        # Uploads saved by these tests went to a throwaway MEDIA_ROOT
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
     def setUp(self):
+        # Throttle counters live in the cache; start every test with a clean slate
+        cache.clear()
+
         # Create a test user
         self.user = User.objects.create_user(
             username="farmeruno",
@@ -56,8 +74,8 @@ class PredictionAPITest(APITestCase):
         )
 
     # patch replaces the real functions temporarily
-    @patch("predictions.views.is_maize_clip", return_value=True)
-    @patch("predictions.views.run_tflite_inference")
+    @patch("predictions.services.is_maize_clip", return_value=True)
+    @patch("predictions.services.run_tflite_inference")
     def test_authenticated_user_can_predict(self, mock_inference, mock_is_maize):
         """
         Tests that an authenticated user can POST an image and get
@@ -91,8 +109,8 @@ class PredictionAPITest(APITestCase):
         self.assertEqual(response.data["prediction_scores"]["Common Rust"], 0.917859)
 
     # patch replaces the real functions temporarily
-    @patch("predictions.views.is_maize_clip", return_value=True)
-    @patch("predictions.views.run_tflite_inference")
+    @patch("predictions.services.is_maize_clip", return_value=True)
+    @patch("predictions.services.run_tflite_inference")
     def test_anonymous_user_can_predict(self, mock_inference, mock_is_maize):
         """
         Tests that an anonymous user can POST an image and get
@@ -116,8 +134,8 @@ class PredictionAPITest(APITestCase):
         self.assertIsNone(response.data["user"])  # user should be None for anonymous
 
     # patch replaces the real functions temporarily
-    @patch("predictions.views.is_maize_clip", return_value=True)
-    @patch("predictions.views.run_tflite_inference")
+    @patch("predictions.services.is_maize_clip", return_value=True)
+    @patch("predictions.services.run_tflite_inference")
     def test_authenticated_user_prediction_history(self, mock_inference, mock_is_maize):
         """
         Authenticated user can retrieve their own predictions
@@ -136,6 +154,355 @@ class PredictionAPITest(APITestCase):
         response = self.client.get("/api/predictions/")
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)  # two predictions returned
-        for pred in response.data:
+        self.assertEqual(len(response.data["results"]), 2)  # two predictions returned
+        for pred in response.data["results"]:
             self.assertEqual(pred["user"], self.user.id)  # all belong to logged-in user
+
+    @override_settings(DISEASE_VERSION_CHECK_INTERVAL=60)
+    def test_prediction_history_is_cursor_paginated(self):
+        """Newest first, fixed number of queries per page, ?cursor= for the next one"""
+        self.authenticate()
+        diseases = [self.blight, self.rust, self.gray, self.healthy]
+        for i in range(5):
+            Prediction.objects.create(user=self.user, image_path=f"predictions/{i}.jpg",
+                                      predicted_disease=diseases[i % 4], prediction_scores={})
+
+        # Disease payloads come from the label map once it is built
+        self.client.get("/api/predictions/?page_size=1")
+
+        # JWT user lookup + one query for the page
+        with self.assertNumQueries(2):
+            first = self.client.get("/api/predictions/?page_size=3")
+        second = self.client.get(first.data["next"])
+
+        ids = [p["id"] for p in first.data["results"] + second.data["results"]]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        self.assertEqual(len(ids), 5)
+        self.assertIsNone(second.data["next"])
+        self.assertEqual(first.data["results"][0]["predicted_disease"]["name"], "Blight")
+
+        # The label map is read once for the whole page, not once per row
+        with patch.object(disease_map, "payloads", wraps=disease_map.payloads) as mock_payloads:
+            self.client.get("/api/predictions/?page_size=5")
+        self.assertEqual(mock_payloads.call_count, 1)
+
+    @override_settings(PREDICTION_HISTORY_PAGE_SIZE=2)
+    def test_cursor_pages_split_timestamp_ties(self):
+        """Rows inserted together share created_at: pages still neither skip nor repeat any"""
+        self.authenticate()
+        for i in range(5):
+            Prediction.objects.create(user=self.user, image_path=f"predictions/{i}.jpg", prediction_scores={})
+        Prediction.objects.update(created_at=timezone.now())
+        expected = sorted(Prediction.objects.values_list("id", flat=True), reverse=True)
+
+        pages = [self.client.get("/api/predictions/")]
+        while pages[-1].data["next"]:
+            pages.append(self.client.get(pages[-1].data["next"]))
+        self.assertEqual([[p["id"] for p in page.data["results"]] for page in pages],
+                         [expected[0:2], expected[2:4], expected[4:]])
+
+        # And back again from the last page
+        previous = self.client.get(pages[-1].data["previous"])
+        self.assertEqual([p["id"] for p in previous.data["results"]], expected[2:4])
+
+        bad = self.client.get("/api/predictions/?cursor=garbage")
+        self.assertEqual(bad.status_code, status.HTTP_404_NOT_FOUND)
+
+    @patch("predictions.services.is_maize_clip")
+    @patch("predictions.services.run_tflite_inference")
+    def test_undecodable_image_is_rejected(self, mock_inference, mock_is_maize):
+        """
+        Upload validation decodes the image; garbage bytes get a 400
+        and never reach the model stages.
+        """
+        bad_image = SimpleUploadedFile(
+            name="broken.jpg",
+            content=b"not really a jpeg",
+            content_type="image/jpeg"
+        )
+
+        response = self.client.post(
+            "/api/predict/",
+            {"image": bad_image},
+            format="multipart"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("image", response.data)
+        mock_is_maize.assert_not_called()
+        mock_inference.assert_not_called()
+        self.assertEqual(Prediction.objects.count(), 0)
+
+    @patch("predictions.services.is_maize_clip", return_value=True)
+    @patch("predictions.services.run_tflite_inference")
+    def test_models_receive_decoded_image(self, mock_inference, mock_is_maize):
+        """Both model stages get the same in-memory decoded image, not a file path"""
+        mock_inference.return_value = ("Healthy", {"Healthy": 1.0})
+
+        self.client.post("/api/predict/", {"image": self.create_fake_image()}, format="multipart")
+
+        clip_arg = mock_is_maize.call_args[0][0]
+        tflite_arg = mock_inference.call_args[0][0]
+        self.assertIs(clip_arg, tflite_arg)
+        self.assertEqual(clip_arg.image.size, (10, 10))
+
+    @patch("predictions.services.is_maize_clip", return_value=True)
+    @patch("predictions.services.run_tflite_inference")
+    def test_resubmitted_photo_reuses_cached_result(self, mock_inference, mock_is_maize):
+        """Same bytes + same model version: no inference, same stored file and scores"""
+        mock_inference.return_value = ("Common Rust", {"Common Rust": 0.9, "Healthy": 0.1})
+        self.authenticate()
+
+        first = self.client.post("/api/predict/", {"image": self.create_fake_image()}, format="multipart")
+        second = self.client.post("/api/predict/", {"image": self.create_fake_image()}, format="multipart")
+
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(mock_inference.call_count, 1)
+        self.assertEqual(mock_is_maize.call_count, 1)
+        self.assertNotEqual(first.data["id"], second.data["id"])
+        self.assertEqual(first.data["image_path"], second.data["image_path"])
+        self.assertEqual(second.data["prediction_scores"], first.data["prediction_scores"])
+        self.assertEqual(second.data["predicted_disease"]["name"], "Common Rust")
+
+    @patch("predictions.services.run_tflite_inference")
+    def test_clip_errors_are_not_reused(self, mock_inference):
+        """A rejection caused by a CLIP failure is retried, not served from the cache"""
+        mock_inference.return_value = ("Common Rust", {"Common Rust": 0.9})
+        self.authenticate()
+
+        with patch("predictions.services.is_maize_clip", return_value=ClipDecision(False)):
+            failed = self.client.post("/api/predict/", {"image": self.create_fake_image()}, format="multipart")
+        with patch("predictions.services.is_maize_clip", return_value=ClipDecision(True, 0.31)) as mock_is_maize:
+            retried = self.client.post("/api/predict/", {"image": self.create_fake_image()}, format="multipart")
+
+        self.assertEqual(failed.data["prediction_scores"], {"is_maize": False})
+        mock_is_maize.assert_called_once()
+        self.assertEqual(retried.data["predicted_disease"]["name"], "Common Rust")
+
+    @patch("predictions.services.is_maize_clip", return_value=True)
+    @patch("predictions.services.run_tflite_inference")
+    def test_cache_is_keyed_by_model_version(self, mock_inference, mock_is_maize):
+        """Results from other models (or expired ones) are never reused"""
+        mock_inference.return_value = ("Blight", {"Blight": 1.0})
+        self.authenticate()
+
+        with self.settings(ML_MODEL_VERSION="old-model"):
+            self.client.post("/api/predict/", {"image": self.create_fake_image()}, format="multipart")
+        with self.settings(ML_MODEL_VERSION="new-model"):
+            self.client.post("/api/predict/", {"image": self.create_fake_image()}, format="multipart")
+
+        self.assertEqual(mock_inference.call_count, 2)
+        self.assertEqual(
+            set(Prediction.objects.values_list("model_version", flat=True)),
+            {"old-model", "new-model"}
+        )
+
+    @patch("predictions.services.is_maize_clip", return_value=True)
+    @patch("predictions.services.run_tflite_inference")
+    def test_recompressed_photo_reuses_scores(self, mock_inference, mock_is_maize):
+        """A resized, recompressed copy of an earlier photo skips the model stages"""
+        import numpy as np
+        mock_inference.return_value = ("Gray Leaf Spot", {"Gray Leaf Spot": 0.95})
+        self.authenticate()
+
+        coarse = np.random.default_rng(7).integers(0, 256, size=(6, 8, 3), dtype=np.uint8)
+        original = Image.fromarray(coarse, "RGB").resize((320, 240), Image.BICUBIC)
+
+        def upload(image, quality):
+            buffer = io.BytesIO()
+            image.save(buffer, format="JPEG", quality=quality)
+            return SimpleUploadedFile("leaf.jpg", buffer.getvalue(), content_type="image/jpeg")
+
+        first = self.client.post("/api/predict/", {"image": upload(original, 95)}, format="multipart")
+        copy = original.resize((160, 120), Image.BILINEAR)
+        second = self.client.post("/api/predict/", {"image": upload(copy, 40)}, format="multipart")
+
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(mock_inference.call_count, 1)
+        self.assertNotEqual(first.data["image_path"], second.data["image_path"])  # new file stored
+        self.assertEqual(second.data["prediction_scores"], {"Gray Leaf Spot": 0.95})
+
+    @patch("predictions.services.is_maize_clip", return_value=True)
+    @patch("predictions.services.run_tflite_inference")
+    def test_sharp_original_of_a_blurry_photo_runs_the_models(self, mock_inference, mock_is_maize):
+        """A quality rejection is never reused for a near-duplicate that passes the check"""
+        import numpy as np
+        from ml.phash import dhash, hamming_distance
+        from PIL import ImageFilter
+        mock_inference.return_value = ("Blight", {"Blight": 0.9})
+        self.authenticate()
+
+        coarse = np.random.default_rng(7).integers(0, 256, size=(6, 8, 3), dtype=np.uint8)
+        structure = np.asarray(Image.fromarray(coarse, "RGB").resize((320, 240), Image.BICUBIC), dtype=np.int16)
+        grain = np.random.default_rng(3).integers(-40, 40, size=(240, 320, 1))
+        sharp = Image.fromarray(np.clip(structure + grain, 0, 255).astype(np.uint8), "RGB")
+        blurred = sharp.filter(ImageFilter.GaussianBlur(4))
+        self.assertLessEqual(hamming_distance(dhash(sharp), dhash(blurred)), 3)
+
+        def upload(image):
+            buffer = io.BytesIO()
+            image.save(buffer, format="PNG")
+            return SimpleUploadedFile("leaf.png", buffer.getvalue(), content_type="image/png")
+
+        with override_settings(PREDICTION_QUALITY_CHECK=True):
+            rejected = self.client.post("/api/predict/", {"image": upload(blurred)}, format="multipart")
+            classified = self.client.post("/api/predict/", {"image": upload(sharp)}, format="multipart")
+
+        self.assertEqual(rejected.data["prediction_scores"]["quality"]["reason"], "blurry")
+        mock_inference.assert_called_once()
+        self.assertEqual(classified.data["predicted_disease"]["name"], "Blight")
+
+    def test_near_duplicate_distance_is_capped_by_the_bands(self):
+        """Beyond 3 bits a band lookup only finds some matches: larger settings are clamped"""
+        import numpy as np
+        from ml.phash import dhash, hash_bands, to_signed64
+        from predictions.services import find_near_duplicate
+
+        coarse = np.random.default_rng(7).integers(0, 256, size=(6, 8, 3), dtype=np.uint8)
+        image = Image.fromarray(coarse, "RGB").resize((320, 240), Image.BICUBIC)
+        phash = dhash(image)
+
+        def stored(flipped_bits, name):
+            other = phash ^ flipped_bits
+            bands = {f"phash_band_{i}": band for i, band in enumerate(hash_bands(other))}
+            return Prediction.objects.create(image_path=f"predictions/{name}.jpg", prediction_scores={},
+                                             model_version="v1", is_maize=True,
+                                             perceptual_hash=to_signed64(other), **bands)
+
+        # 4 bits apart, all in one band: the other three bands still match
+        stored(0b1111, "four")
+        with self.settings(ML_MODEL_VERSION="v1", PREDICTION_PHASH_MAX_DISTANCE=10):
+            self.assertIsNone(find_near_duplicate(image))
+            two = stored(0b11, "two")
+            self.assertEqual(find_near_duplicate(image), two)
+
+    @patch("ml.utils.is_maize_clip")
+    @patch("predictions.services.is_maize_clip")
+    @patch("predictions.services.run_tflite_inference")
+    def test_cascade_gate_skips_clip_for_confident_images(self, mock_inference, mock_is_maize, mock_gate_clip):
+        """With a maize gate configured, a confident classifier output is not sent to CLIP"""
+        import os
+        import tempfile
+        from django.test import override_settings
+        from ml.gate import MaizeGate
+        from ml.registry import registry
+
+        gate = MaizeGate([0, 0, 0, 0, 20, 0], -14, [0] * 6, [1] * 6, accept_above=0.98, reject_below=0.02)
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+            gate_path = f.name
+        gate.save(gate_path)
+        self.addCleanup(os.unlink, gate_path)
+        self.addCleanup(registry.reset, "gate")
+
+        mock_inference.return_value = ("Blight", {"Blight": 0.95, "Common Rust": 0.03,
+                                                  "Gray Leaf Spot": 0.01, "Healthy": 0.01})
+
+        with override_settings(ML_GATE_PATH=gate_path, ML_GATE_AUDIT_RATE=0.0):
+            registry.reset("gate")
+            response = self.client.post("/api/predict/", {"image": self.create_fake_image()}, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        mock_is_maize.assert_not_called()
+        mock_gate_clip.assert_not_called()
+        prediction = Prediction.objects.get()
+        self.assertEqual(prediction.predicted_disease, self.blight)
+        self.assertIn(f"+gate-{gate.identity}", prediction.model_version)
+
+    def test_speculative_mode_runs_both_stages_concurrently(self):
+        """The classifier starts before CLIP answers; a CLIP rejection still discards its result"""
+        import threading
+        from django.test import override_settings
+
+        classifier_started = threading.Event()
+        overlapped = []
+
+        def slow_clip(image):
+            # Only returns quickly if the classifier is already running on another thread
+            overlapped.append(classifier_started.wait(2))
+            return clip_answer
+
+        def classifier(image):
+            classifier_started.set()
+            return "Healthy", {"Blight": 0.01, "Common Rust": 0.01, "Gray Leaf Spot": 0.01, "Healthy": 0.97}
+
+        with override_settings(PREDICTION_SPECULATIVE_CLASSIFY=True), \
+                patch("predictions.services.is_maize_clip", side_effect=slow_clip), \
+                patch("predictions.services.run_tflite_inference", side_effect=classifier):
+            clip_answer = True
+            accepted = self.client.post("/api/predict/", {"image": self.create_fake_image()}, format="multipart")
+
+            classifier_started.clear()
+            clip_answer = False
+            other_image = io.BytesIO()
+            Image.new("RGB", (10, 10), color=(0, 0, 255)).save(other_image, format="JPEG")
+            upload = SimpleUploadedFile("other.jpg", other_image.getvalue(), content_type="image/jpeg")
+            rejected = self.client.post("/api/predict/", {"image": upload}, format="multipart")
+
+        self.assertEqual(overlapped, [True, True])
+        self.assertEqual(accepted.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(accepted.data["predicted_disease"]["name"], "Healthy")
+        self.assertEqual(rejected.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(rejected.data["prediction_scores"], {"is_maize": False})
+
+    @patch("predictions.services.is_maize_clip")
+    @patch("predictions.services.run_tflite_inference")
+    def test_unusable_photo_is_rejected_before_the_models(self, mock_inference, mock_is_maize):
+        """A tiny photo gets a structured quality rejection and no model runs"""
+        from django.test import override_settings
+
+        with override_settings(PREDICTION_QUALITY_CHECK=True):
+            response = self.client.post("/api/predict/", {"image": self.create_fake_image()}, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIsNone(response.data["predicted_disease"])
+        quality = response.data["prediction_scores"]["quality"]
+        self.assertEqual(quality["reason"], "too_small")
+        self.assertEqual(quality["metrics"]["width"], 10)
+        mock_is_maize.assert_not_called()
+        mock_inference.assert_not_called()
+
+    @patch("predictions.services.is_maize_clip")
+    @patch("predictions.services.run_tflite_inference")
+    def test_oversized_uploads_are_rejected(self, mock_inference, mock_is_maize):
+        """File size and header pixel count are checked before the image is decoded"""
+        from django.test import override_settings
+
+        with override_settings(PREDICTION_MAX_UPLOAD_BYTES=100):
+            too_big = self.client.post("/api/predict/", {"image": self.create_fake_image()}, format="multipart")
+        with override_settings(PREDICTION_MAX_MEGAPIXELS=0.00005):
+            too_many_pixels = self.client.post("/api/predict/", {"image": self.create_fake_image()}, format="multipart")
+
+        self.assertEqual(too_big.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("too large", str(too_big.data["image"][0]))
+        self.assertEqual(too_many_pixels.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("resolution", str(too_many_pixels.data["image"][0]))
+        mock_is_maize.assert_not_called()
+        mock_inference.assert_not_called()
+        self.assertEqual(Prediction.objects.count(), 0)
+
+    @patch("predictions.services.run_tflite_inference")
+    def test_score_columns_are_stored_and_filterable(self, mock_inference):
+        """Top class, confidence, prefilter decision and CLIP similarity are indexed columns"""
+
+        self.authenticate()
+        mock_inference.return_value = ("Common Rust", {"Blight": 0.35, "Common Rust": 0.55, "Healthy": 0.1})
+        with patch("predictions.services.is_maize_clip", return_value=ClipDecision(True, 0.31)):
+            uncertain = self.client.post("/api/predict/", {"image": self.create_fake_image()}, format="multipart")
+
+        self.assertEqual(uncertain.data["top_class"], "Common Rust")
+        self.assertEqual(uncertain.data["top_probability"], 0.55)
+        self.assertTrue(uncertain.data["is_maize"])
+        self.assertEqual(uncertain.data["clip_similarity"], 0.31)
+
+        image_file = io.BytesIO()
+        Image.new("RGB", (10, 10), color=(0, 0, 255)).save(image_file, format="JPEG")
+        with patch("predictions.services.is_maize_clip", return_value=ClipDecision(False, 0.12)):
+            self.client.post("/api/predict/", {"image": SimpleUploadedFile("sky.jpg", image_file.getvalue())},
+                             format="multipart")
+
+        low_confidence = self.client.get("/api/predictions/?max_confidence=0.6").data["results"]
+        rejected = self.client.get("/api/predictions/?is_maize=false").data["results"]
+        self.assertEqual([p["id"] for p in low_confidence], [uncertain.data["id"]])
+        self.assertEqual(len(rejected), 1)
+        self.assertEqual(rejected[0]["clip_similarity"], 0.12)
+        self.assertIsNone(rejected[0]["top_probability"])
@@ -0,0 +1,266 @@
+# predictions/tests/test_batch.py
+
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from unittest.mock import patch
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.conf import settings
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from django.contrib.auth.models import User
+from rest_framework import status
+from predictions.models import Prediction
+from diseases.models import Disease
+from ml.utils import CLASSES
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class BatchPredictionTest(APITestCase):
+    """
+    Tests POST /api/predict/batch/:
+    - several files or a zip archive in one request, stacked inference
+    - one result per image, bad files fail only their own entry
+    - registered users only
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        # Uploads saved by these tests went to a throwaway MEDIA_ROOT
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        # Throttle counters live in the cache; start every test with a clean slate
+        cache.clear()
+        self.user = User.objects.create_user(username="officer", password="password123")
+        self.rust = Disease.objects.create(name="Common Rust")
+        self.healthy = Disease.objects.create(name="Healthy")
+
+    def authenticate(self):
+        response = self.client.post("/api/auth/login/", {"username": "officer", "password": "password123"})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def jpeg_bytes(self, color):
+        image_file = io.BytesIO()
+        Image.new("RGB", (10, 10), color=color).save(image_file, format="JPEG")
+        return image_file.getvalue()
+
+    def create_fake_image(self, name, color):
+        return SimpleUploadedFile(name=name, content=self.jpeg_bytes(color), content_type="image/jpeg")
+
+    @patch("predictions.services.run_tflite_inference_batch")
+    @patch("predictions.services.is_maize_clip_batch")
+    def test_files_are_classified_in_one_batch(self, mock_is_maize_batch, mock_inference_batch):
+        self.authenticate()
+        mock_is_maize_batch.return_value = [True, False]
+        mock_inference_batch.return_value = [("Common Rust", {"Common Rust": 0.9, "Healthy": 0.1})]
+
+        broken = SimpleUploadedFile(name="broken.jpg", content=b"not really a jpeg", content_type="image/jpeg")
+        response = self.client.post(
+            "/api/predict/batch/",
+            {"images": [self.create_fake_image("a.jpg", (255, 0, 0)), broken,
+                        self.create_fake_image("b.jpg", (0, 0, 255))]},
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["count"], 2)
+        first, bad, second = response.data["results"]
+
+        self.assertEqual(first["filename"], "a.jpg")
+        self.assertEqual(first["prediction"]["predicted_disease"]["name"], "Common Rust")
+        self.assertEqual(first["prediction"]["user"], self.user.id)
+        self.assertIn("errors", bad)
+        self.assertEqual(second["prediction"]["prediction_scores"], {"is_maize": False})
+
+        # One stacked call per stage, every row saved with its id
+        self.assertEqual(len(mock_is_maize_batch.call_args[0][0]), 2)
+        self.assertEqual(len(mock_inference_batch.call_args[0][0]), 1)
+        self.assertEqual(Prediction.objects.count(), 2)
+        self.assertEqual(Prediction.objects.get(pk=first["prediction"]["id"]).predicted_disease, self.rust)
+
+    @patch("predictions.services.run_tflite_inference_batch")
+    @patch("predictions.services.is_maize_clip_batch")
+    def test_zip_archive(self, mock_is_maize_batch, mock_inference_batch):
+        self.authenticate()
+        mock_is_maize_batch.return_value = [True, True]
+        mock_inference_batch.return_value = [("Healthy", {"Healthy": 0.99}), ("Common Rust", {"Common Rust": 0.7})]
+
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("visit/leaf1.jpg", self.jpeg_bytes((0, 255, 0)))
+            zf.writestr("visit/leaf2.JPG", self.jpeg_bytes((0, 128, 0)))
+            zf.writestr("visit/notes.txt", "field 7")
+            zf.writestr("__MACOSX/visit/._leaf1.jpg", "resource fork")
+
+        response = self.client.post(
+            "/api/predict/batch/",
+            {"archive": SimpleUploadedFile("visit.zip", archive.getvalue(), content_type="application/zip")},
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([entry["filename"] for entry in response.data["results"]], ["leaf1.jpg", "leaf2.JPG"])
+        self.assertEqual(response.data["results"][1]["prediction"]["predicted_disease"]["name"], "Common Rust")
+
+    @override_settings(ML_BATCH_MAX_SIZE=2)
+    @patch("predictions.services.run_tflite_inference_batch")
+    @patch("predictions.services.is_maize_clip_batch")
+    def test_large_batches_run_in_chunks(self, mock_is_maize_batch, mock_inference_batch):
+        self.authenticate()
+        mock_is_maize_batch.side_effect = lambda images: [True] * len(images)
+        mock_inference_batch.side_effect = lambda images: [("Healthy", {"Healthy": 0.9})] * len(images)
+
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zf:
+            for i in range(3):
+                zf.writestr(f"leaf{i}.jpg", self.jpeg_bytes((0, 50 * i, 0)))
+
+        response = self.client.post(
+            "/api/predict/batch/",
+            {"archive": SimpleUploadedFile("visit.zip", archive.getvalue(), content_type="application/zip")},
+            format="multipart",
+        )
+
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual([entry["filename"] for entry in response.data["results"]],
+                         ["leaf0.jpg", "leaf1.jpg", "leaf2.jpg"])
+        self.assertEqual([len(call[0][0]) for call in mock_is_maize_batch.call_args_list], [2, 1])
+        # Only CLIP-sized pixels are kept once the model inputs are built
+        image = mock_inference_batch.call_args[0][0][0]
+        self.assertEqual(image.image.size, (224, 224))
+        self.assertEqual(image.cached("mobilenet", None).shape, (1, 224, 224, 3))
+
+    @patch("predictions.services.run_tflite_inference_batch")
+    @patch("predictions.services.is_maize_clip_batch")
+    @patch("predictions.services.is_maize_clip", return_value=True)
+    @patch("predictions.services.run_tflite_inference", return_value=("Healthy", {"Healthy": 0.95}))
+    def test_resubmitted_photo_reuses_cached_result(self, mock_inference, mock_is_maize,
+                                                    mock_is_maize_batch, mock_inference_batch):
+        self.authenticate()
+        self.client.post("/api/predict/", {"image": self.create_fake_image("a.jpg", (255, 0, 0))},
+                         format="multipart")
+        mock_is_maize_batch.return_value = [False]
+
+        response = self.client.post(
+            "/api/predict/batch/",
+            {"images": [self.create_fake_image("again.jpg", (255, 0, 0)),
+                        self.create_fake_image("new.jpg", (0, 0, 255))]},
+            format="multipart",
+        )
+
+        cached, new = response.data["results"]
+        self.assertEqual(cached["prediction"]["predicted_disease"]["name"], "Healthy")
+        self.assertEqual(len(mock_is_maize_batch.call_args[0][0]), 1)
+        mock_inference_batch.assert_not_called()
+        self.assertEqual(new["prediction"]["prediction_scores"], {"is_maize": False})
+
+    @override_settings(PREDICTION_BATCH_MAX_IMAGES=2)
+    def test_limits_and_authentication(self):
+        images = [self.create_fake_image(f"{i}.jpg", (i, 0, 0)) for i in range(3)]
+        anonymous = self.client.post("/api/predict/batch/", {"images": images}, format="multipart")
+        self.assertEqual(anonymous.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.authenticate()
+        images = [self.create_fake_image(f"{i}.jpg", (i, 0, 0)) for i in range(3)]
+        too_many = self.client.post("/api/predict/batch/", {"images": images}, format="multipart")
+        empty = self.client.post("/api/predict/batch/", {}, format="multipart")
+
+        self.assertEqual(too_many.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(empty.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Prediction.objects.count(), 0)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class PredictDirCommandTest(APITestCase):
+    """manage.py predict_dir: offline backfill in batches, resumable from its checkpoint"""
+
+    @classmethod
+    def tearDownClass(cls):
+        # Uploads saved by these tests went to a throwaway MEDIA_ROOT
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="officer", password="password123")
+        Disease.objects.create(name="Healthy")
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        os.makedirs(os.path.join(self.directory.name, "field-7"))
+        for i, name in enumerate(["a.jpg", "field-7/b.png", "field-7/c.jpg"]):
+            Image.new("RGB", (300, 200), color=(0, 40 * i, 0)).save(os.path.join(self.directory.name, name))
+        with open(os.path.join(self.directory.name, "field-7", "broken.jpg"), "wb") as f:
+            f.write(b"not really a jpeg")
+        with open(os.path.join(self.directory.name, "notes.txt"), "w") as f:
+            f.write("field 7")
+
+    def run_command(self, *args):
+        output = io.StringIO()
+        call_command("predict_dir", self.directory.name, "--user", "officer", *args, stdout=output)
+        return output.getvalue()
+
+    @patch("predictions.services.run_tflite_inference_batch")
+    @patch("predictions.services.is_maize_clip_batch")
+    def test_predicts_in_batches_and_resumes(self, mock_is_maize_batch, mock_inference_batch):
+        mock_is_maize_batch.side_effect = lambda images: [True] * len(images)
+        mock_inference_batch.side_effect = lambda images: [("Healthy", {"Healthy": 0.9})] * len(images)
+
+        output = self.run_command("--batch-size", "2", "--workers", "2")
+
+        self.assertIn("3 image(s) predicted, 1 unreadable", output)
+        self.assertIn("images/s", output)
+        self.assertEqual(Prediction.objects.filter(user=self.user, predicted_disease__name="Healthy").count(), 3)
+        # Decoded in the pool: CLIP gets the presized image, the classifier full-resolution inputs
+        images = mock_is_maize_batch.call_args_list[0][0][0]
+        self.assertEqual(images[0].image.size, (336, 224))
+        self.assertEqual(images[0].cached("mobilenet", None).shape, (1, 224, 224, 3))
+
+        # Everything is in the checkpoint: a second run has nothing left to do
+        mock_is_maize_batch.reset_mock()
+        output = self.run_command("--workers", "0")
+
+        self.assertIn("Resuming: 4 image(s)", output)
+        mock_is_maize_batch.assert_not_called()
+        self.assertEqual(Prediction.objects.count(), 3)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class FitMaizeGateCommandTest(APITestCase):
+    """manage.py fit_maize_gate: learns from decisions CLIP actually made"""
+
+    @classmethod
+    def tearDownClass(cls):
+        # Uploads saved by these tests went to a throwaway MEDIA_ROOT
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def stored(self, name, **columns):
+        buffer = io.BytesIO()
+        Image.new("RGB", (300, 200), color=(0, 120, 0)).save(buffer, format="JPEG")
+        default_storage.save(f"predictions/{name}.jpg", ContentFile(buffer.getvalue()))
+        Prediction.objects.create(image_path=f"predictions/{name}.jpg", prediction_scores={}, **columns)
+
+    @patch("predictions.management.commands.fit_maize_gate.fit_gate")
+    @patch("predictions.management.commands.fit_maize_gate.run_tflite_inference_batch")
+    def test_skips_rows_without_a_clip_similarity(self, mock_inference_batch, mock_fit_gate):
+        self.stored("accepted", is_maize=True, clip_similarity=0.31)
+        self.stored("rejected", is_maize=False, clip_similarity=0.12)
+        self.stored("clip-error", is_maize=False, clip_similarity=None)
+        self.stored("blurry", is_maize=None)
+        mock_inference_batch.side_effect = lambda images: [("Healthy", {name: 0.25 for name in CLASSES})] * len(images)
+        mock_fit_gate.side_effect = ValueError("stop here")
+
+        with tempfile.TemporaryDirectory() as directory, self.assertRaises(CommandError):
+            call_command("fit_maize_gate", "--output", os.path.join(directory, "gate.json"), stdout=io.StringIO())
+
+        labels = mock_fit_gate.call_args[0][1]
+        self.assertEqual(sorted(labels), [False, True])
@@ -0,0 +1,176 @@
+# predictions/tests/test_jobs.py
+
+import io
+import shutil
+import tempfile
+from unittest.mock import patch
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.utils import timezone
+from datetime import timedelta
+from django.conf import settings
+from django.db import DatabaseError
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from django.contrib.auth.models import User
+from rest_framework import status
+from ml.inference_server import InferenceServerUnavailable
+from predictions.jobs import claim_jobs, enqueue_job, requeue_stale_jobs
+from predictions.models import Prediction, PredictionJob
+from diseases.models import Disease
+
+
+@override_settings(PREDICTION_ASYNC_ENABLED=True, MEDIA_ROOT=tempfile.mkdtemp())
+class PredictionJobTest(APITestCase):
+    """
+    Tests the async prediction mode end-to-end:
+    - POST /api/predict/?async=true returns 202 + job id without running models
+    - the worker command processes queued jobs in a batch
+    - job status is visible to its owner only
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        # Uploads saved by these tests went to a throwaway MEDIA_ROOT
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        # Throttle counters live in the cache; start every test with a clean slate
+        cache.clear()
+        self.user = User.objects.create_user(username="farmeruno", password="password123")
+        self.rust = Disease.objects.create(name="Common Rust")
+
+    def authenticate(self, username="farmeruno", password="password123"):
+        response = self.client.post("/api/auth/login/", {"username": username, "password": password})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def create_fake_image(self):
+        image_file = io.BytesIO()
+        Image.new("RGB", (10, 10), color=(0, 255, 0)).save(image_file, format="JPEG")
+        return SimpleUploadedFile(name="leaf.jpg", content=image_file.getvalue(), content_type="image/jpeg")
+
+    @patch("predictions.services.is_maize_clip")
+    @patch("predictions.services.run_tflite_inference")
+    def test_async_request_returns_job_without_inference(self, mock_inference, mock_is_maize):
+        self.authenticate()
+
+        response = self.client.post("/api/predict/?async=true", {"image": self.create_fake_image()},
+                                    format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], "pending")
+        self.assertIsNone(response.data["prediction"])
+        mock_is_maize.assert_not_called()
+        mock_inference.assert_not_called()
+
+        job = PredictionJob.objects.get(pk=response.data["id"])
+        self.assertEqual(job.user, self.user)
+        self.assertEqual(Prediction.objects.count(), 0)
+
+    @patch("predictions.services.run_tflite_inference_batch")
+    @patch("predictions.services.is_maize_clip_batch")
+    def test_worker_processes_queued_jobs_in_one_batch(self, mock_is_maize_batch, mock_inference_batch):
+        self.authenticate()
+        ids = [
+            self.client.post("/api/predict/?async=true", {"image": self.create_fake_image()},
+                             format="multipart").data["id"]
+            for _ in range(3)
+        ]
+
+        # Second image is not maize: only two reach the classifier
+        mock_is_maize_batch.return_value = [True, False, True]
+        mock_inference_batch.return_value = [
+            ("Common Rust", {"Common Rust": 0.9}),
+            ("Common Rust", {"Common Rust": 0.8}),
+        ]
+
+        call_command("run_prediction_worker", "--once", stdout=io.StringIO())
+
+        self.assertEqual(mock_is_maize_batch.call_count, 1)
+        self.assertEqual(len(mock_is_maize_batch.call_args[0][0]), 3)
+        self.assertEqual(len(mock_inference_batch.call_args[0][0]), 2)
+
+        response = self.client.get(f"/api/predict/jobs/{ids[0]}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], "done")
+        self.assertEqual(response.data["prediction"]["predicted_disease"]["name"], "Common Rust")
+
+        rejected = self.client.get(f"/api/predict/jobs/{ids[1]}/").data
+        self.assertEqual(rejected["prediction"]["prediction_scores"], {"is_maize": False})
+
+    @patch("predictions.services.is_maize_clip", return_value=True)
+    @patch("predictions.services.run_tflite_inference", return_value=("Common Rust", {"Common Rust": 1.0}))
+    def test_sync_mode_unchanged_without_flag(self, mock_inference, mock_is_maize):
+        response = self.client.post("/api/predict/", {"image": self.create_fake_image()}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(PredictionJob.objects.count(), 0)
+
+    @override_settings(PREDICTION_JOB_MAX_ATTEMPTS=2)
+    def test_job_that_keeps_killing_workers_is_failed(self):
+        job = enqueue_job(self.user, "predictions/leaf.jpg")
+
+        for attempt in range(1, 3):
+            # Claimed, then the worker dies: the job is stuck in running
+            self.assertEqual([claimed.attempts for claimed in claim_jobs(4)], [attempt])
+            PredictionJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=1))
+            requeue_stale_jobs(600)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertIn("2 time(s)", job.error)
+        self.assertEqual(claim_jobs(4), [])
+
+    @patch("predictions.services.is_maize_clip_batch",
+           side_effect=InferenceServerUnavailable("cannot connect to /tmp/leaflens.sock"))
+    def test_jobs_are_requeued_while_inference_server_is_down(self, mock_is_maize_batch):
+        job = enqueue_job(self.user, "predictions/leaf.jpg")
+        with default_storage.open("predictions/leaf.jpg", "wb") as f:
+            f.write(self.create_fake_image().read())
+
+        call_command("run_prediction_worker", "--once", stdout=io.StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.started_at), ("pending", 0, None))
+
+    @patch("predictions.jobs.create_prediction")
+    @patch("predictions.services.run_tflite_inference_batch")
+    @patch("predictions.services.is_maize_clip_batch", return_value=[True, True])
+    def test_failed_save_fails_only_its_own_job(self, mock_is_maize_batch, mock_inference_batch,
+                                                 mock_create):
+        jobs = [enqueue_job(self.user, f"predictions/leaf{i}.jpg") for i in range(2)]
+        for job in jobs:
+            with default_storage.open(job.image_path.name, "wb") as f:
+                f.write(self.create_fake_image().read())
+        mock_inference_batch.return_value = [("Common Rust", {"Common Rust": 0.9})] * 2
+        saved = Prediction.objects.create(user=self.user, image_path="predictions/leaf1.jpg",
+                                          prediction_scores={}, is_maize=True)
+        mock_create.side_effect = [DatabaseError("deadlock"), saved]
+
+        call_command("run_prediction_worker", "--once", stdout=io.StringIO())
+
+        statuses = [PredictionJob.objects.get(pk=job.pk).status for job in jobs]
+        self.assertEqual(statuses, ["failed", "done"])
+
+    @override_settings(ML_INFERENCE_SOCKET="/tmp/leaflens-inference.sock")
+    @patch("predictions.management.commands.run_prediction_worker.time.sleep", side_effect=KeyboardInterrupt)
+    @patch("ml.registry.registry.load_all")
+    def test_worker_leaves_models_to_the_inference_server(self, mock_load_all, mock_sleep):
+        # Polls until the first sleep, which stops it here
+        with self.assertRaises(KeyboardInterrupt):
+            call_command("run_prediction_worker", stdout=io.StringIO())
+        mock_load_all.assert_not_called()
+
+    def test_other_users_cannot_see_job(self):
+        self.authenticate()
+        job_id = self.client.post("/api/predict/?async=true", {"image": self.create_fake_image()},
+                                  format="multipart").data["id"]
+
+        User.objects.create_user(username="other", password="password123")
+        self.authenticate("other", "password123")
+
+        response = self.client.get(f"/api/predict/jobs/{job_id}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
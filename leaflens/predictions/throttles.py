@@ -12,3 +12,7 @@ class PredictAnonThrottle(AnonRateThrottle):
 class PredictUserThrottle(UserRateThrottle):
     '''throttling is counted per user account (user_id)'''
     scope = "predict_user"
+
+class PredictBatchThrottle(UserRateThrottle):
+    '''one hit per batch request, counted per user account'''
+    scope = "predict_batch"
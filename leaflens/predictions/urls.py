@@ -1,5 +1,5 @@
 from django.urls import path, include
-from .views import PredictionViewSet, PredictAPIView
+from .views import PredictionViewSet, PredictAPIView, BatchPredictAPIView, PredictionJobViewSet
 
 # view set for drf
 from rest_framework.routers import DefaultRouter
@@ -8,6 +8,7 @@ from rest_framework.routers import DefaultRouter
 # Router automatically generates all the necessary URLs for each CRUD action:
 router = DefaultRouter()
 router.register(r'predictions', PredictionViewSet, basename='predictions')
+router.register(r'predict/jobs', PredictionJobViewSet, basename='prediction-jobs')
 
 
 # Define URL patterns
@@ -15,10 +16,14 @@ urlpatterns = [
     # ex: api/predict/ → PredictAPIView (ML + save prediction)
     path('predict/', PredictAPIView.as_view(), name='predict'),
 
+    # ex: api/predict/batch/ → BatchPredictAPIView (many images or a zip, one response)
+    path('predict/batch/', BatchPredictAPIView.as_view(), name='predict-batch'),
+
     # router handles all CRUD URLs
     # ex: /api/predictions/ → PredictionViewSet (list, retrieve, delete)
     # GET list → /api/predictions/
     # GET single → /api/predictions/<id>/
     # DELETE → /api/predictions/<id>/
+    # GET async job status → /api/predict/jobs/<id>/
     path('', include(router.urls)),
 ]
\ No newline at end of file
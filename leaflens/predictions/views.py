@@ -1,28 +1,29 @@
 from django.shortcuts import render
 
 # predict
-from rest_framework.generics import CreateAPIView
+from rest_framework.generics import CreateAPIView, GenericAPIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
 
 from rest_framework.parsers import MultiPartParser, FormParser
 
-from .models import Prediction
+from .models import Prediction, PredictionJob
 from .serializers import PredictionSerializer
 from rest_framework.exceptions import ValidationError
-from .serializers import PredictionUploadSerializer
-from diseases.models import Disease
-
+from .serializers import PredictionUploadSerializer, PredictionJobSerializer
+from .serializers import BatchPredictionUploadSerializer, DecodedImageField
+from django.conf import settings
 
-from ml.utils import is_maize_clip, run_tflite_inference
+from .services import predict_batch, predict_image, release_full_resolution, reuse_cached_prediction
+from .jobs import enqueue_job
 
-from .throttles import PredictAnonThrottle, PredictUserThrottle
+from .throttles import PredictAnonThrottle, PredictBatchThrottle, PredictUserThrottle
+from .storage import save_upload, track_saved_path
 
 # retrieve predictions
 from rest_framework import viewsets
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from django.db.models import Q
+from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from .models import Prediction
 from .serializers import PredictionSerializer
 
@@ -31,6 +32,7 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework import renderers
 from .filters import PredictionFilter
+from .pagination import PredictionCursorPagination
 
 
 # Create your views here.
@@ -61,46 +63,45 @@ class PredictAPIView(CreateAPIView):
         # Extract uploaded image from validated serializer data
         uploaded_image = serializer.validated_data["image"]
 
-        # Save the uploaded image temporarily in the media folder
-        saved_path = default_storage.save(f"predictions/{uploaded_image.name}",
-                                          ContentFile(uploaded_image.read()))
-
-        # Step 1: CLIP prefilter
-        if not is_maize_clip(default_storage.path(saved_path)):
-            # Save CLIP-rejected images (Recommended for ML systems) best ML engineering practice.
-            prediction = Prediction.objects.create(
-                user=self.request.user if self.request.user.is_authenticated else None,
-                image_path=saved_path,
-                predicted_disease=None,  # null
-                prediction_scores={"is_maize": False},
-                explanation_image=None
-            )
-
-            self.instance = prediction
-            return  # stop here, do NOT run TFLite
-
-        # Step 2: Run TFLite disease classifier
-        predicted_label, scores = run_tflite_inference(default_storage.path(saved_path))
-
-        # Step 3: Try to link predicted label to a Disease object in DB if exists
-        disease_obj = Disease.objects.filter(name__iexact=predicted_label).first()
-
-        # Step 4: Create the Prediction record in database
-        prediction = Prediction.objects.create(
-            user=self.request.user if self.request.user.is_authenticated else None,
-            image_path=saved_path,
-            predicted_disease=disease_obj,
-            prediction_scores=scores,
-        )
+        # Decoded once during validation; both model stages read it from memory
+        image = uploaded_image.preprocessed
+
+        # Write the upload to the media folder in the background (path reserved now)
+        saved_path, saved = save_upload(uploaded_image.name, image.data)
+
+        # CLIP prefilter -> TFLite classifier -> Prediction record
+        prediction = predict_image(image, self.request_user(), saved_path)
+        track_saved_path(prediction, saved_path, saved)
 
         # Save the instance for later serialization in create()
         self.instance = prediction  # Save for serializer
 
 
+    def perform_enqueue(self, serializer):
+        """Async mode: store the upload and queue a job for the prediction worker."""
+        uploaded_image = serializer.validated_data["image"]
+
+        # The worker reads the file, so wait for the write here
+        _, saved = save_upload(uploaded_image.name, uploaded_image.preprocessed.data)
+
+        return enqueue_job(self.request_user(), saved.result())
+
+
+    def request_user(self):
+        return self.request.user if self.request.user.is_authenticated else None
+
+
+    def wants_async(self):
+        """Opt-in per request with ?async=true, only when the server allows it."""
+        requested = self.request.query_params.get("async", "").lower() in ("1", "true", "yes")
+        return requested and getattr(settings, 'PREDICTION_ASYNC_ENABLED', False)
+
+
     def create(self, request, *args, **kwargs):
         """
         Override to return PredictionSerializer output
         returns serialized JSON with prediction info.
+        In async mode returns 202 with the queued job instead.
         """
         #  Deserialize input
         serializer = self.get_serializer(data=request.data)
@@ -108,8 +109,19 @@ class PredictAPIView(CreateAPIView):
         # Validate (raises 400 if image not submitted)
         serializer.is_valid(raise_exception=True)
 
-        # Run perform_create (image saved, ML inference, Prediction record created)
-        self.perform_create(serializer)
+        # Same photo already predicted by the same models: reuse that result
+        self.instance = reuse_cached_prediction(
+            serializer.validated_data["image"].preprocessed, self.request_user()
+        )
+
+        if self.instance is None:
+            # Async mode: accept now, the worker runs inference later
+            if self.wants_async():
+                job = self.perform_enqueue(serializer)
+                return Response(PredictionJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+            # Run perform_create (image saved, ML inference, Prediction record created)
+            self.perform_create(serializer)
 
         # Serialize full Prediction object for API response
         response_serializer = PredictionSerializer(self.instance)
@@ -119,6 +131,60 @@ class PredictAPIView(CreateAPIView):
 
 
 
+# several photos per request (e.g. one field visit)
+class BatchPredictAPIView(GenericAPIView):
+    """
+        Handles POST requests with many images (repeated `images` fields
+        and/or a zip `archive`): one throttle hit, then stacked inference and
+        one bulk insert per ML_BATCH_MAX_SIZE chunk, a result per image in upload order.
+    """
+    throttle_classes = [PredictBatchThrottle]
+    parser_classes = [MultiPartParser, FormParser]
+    serializer_class = BatchPredictionUploadSerializer
+
+    # extension officers: batches are for registered accounts
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return Response({"detail": "Use POST to upload images or a zip archive"}, status=200)
+
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        # A chunk at a time: decoded with the single-upload checks (failures stay per image),
+        # cut down to the model inputs, predicted and serialized before the next one is read
+        uploads = serializer.validated_data["uploads"]
+        chunk_size = getattr(settings, 'ML_BATCH_MAX_SIZE', 8)
+        results, count = [], 0
+        # One label map read for every serialized prediction of the request
+        context = {}
+        for start in range(0, len(uploads), chunk_size):
+            entries, images = [], []
+            for upload in uploads[start:start + chunk_size]:
+                entry = {"filename": upload.name}
+                try:
+                    image = DecodedImageField().run_validation(upload.open()).preprocessed
+                    images.append(release_full_resolution(image))
+                    entries.append(entry)
+                except ValidationError as e:
+                    entry["errors"] = e.detail
+                results.append(entry)
+
+            if images:
+                predictions = predict_batch(images, request.user, [entry["filename"] for entry in entries])
+                for entry, prediction in zip(entries, predictions):
+                    entry["prediction"] = PredictionSerializer(prediction, context=context).data
+                count += len(images)
+
+        if not count:
+            return Response({"count": 0, "results": results}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"count": count, "results": results}, status=status.HTTP_201_CREATED)
+
+
+
 
 
 # the "CRUD part" of predictions
@@ -139,16 +205,45 @@ class PredictionViewSet(viewsets.ModelViewSet):
     ]
 
     ordering_fields = ['created_at', 'id']
-    ordering = ['-created_at']
+    ordering = ['-created_at', '-id']
+
+    # cursor pages (?cursor=...): constant cost however deep the history goes
+    pagination_class = PredictionCursorPagination
 
 
     def get_queryset(self):
         user = self.request.user
         # If user is authenticated → return their predictions
+        # (disease joined in: the nested DiseaseSerializer needs no query per row)
         if user.is_authenticated:
-            return Prediction.objects.filter(user=user)
+            return Prediction.objects.filter(user=user).select_related('predicted_disease')
 
         # If anonymous → return none
         return Prediction.objects.none()
 
 
+
+# status of async prediction jobs
+class PredictionJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    GET /api/predict/jobs/<id>/ → status of one async prediction (poll until done/failed).
+    GET /api/predict/jobs/ → the authenticated user's jobs.
+    """
+    serializer_class = PredictionJobSerializer
+    renderer_classes = [renderers.JSONRenderer, renderers.BrowsableAPIRenderer]
+    filterset_fields = ['status']
+    ordering_fields = ['created_at']
+    ordering = ['-created_at']
+
+    def get_queryset(self):
+        user = self.request.user
+        jobs = PredictionJob.objects.select_related('prediction__predicted_disease')
+
+        # Listing: only your own jobs (anonymous users have nothing to list)
+        if self.action == 'list':
+            return jobs.filter(user=user) if user.is_authenticated else jobs.none()
+
+        # Retrieve by (unguessable) id: anonymous jobs, or your own
+        if user.is_authenticated:
+            return jobs.filter(Q(user__isnull=True) | Q(user=user))
+        return jobs.filter(user__isnull=True)